@@ -288,7 +288,8 @@ class NMMinerUDPListener:
     async def _save_telemetry(self, adapter: NMMinerAdapter, data: Dict):
         """Save NMMiner telemetry to database"""
         try:
-            from core.database import AsyncSessionLocal, Telemetry
+            from core.database import enqueue_telemetry
+            from core.high_diff_tracker import extract_best_diff
             
             # Create telemetry object
             telemetry = adapter.last_telemetry
@@ -300,20 +301,18 @@ class NMMinerUDPListener:
             if not miner_telemetry:
                 return
             
-            async with AsyncSessionLocal() as db:
-                db_telemetry = Telemetry(
-                    miner_id=adapter.miner_id,
-                    timestamp=miner_telemetry.timestamp,
-                    hashrate=miner_telemetry.hashrate,
-                    temperature=miner_telemetry.temperature,
-                    power_watts=miner_telemetry.power_watts,
-                    shares_accepted=miner_telemetry.shares_accepted,
-                    shares_rejected=miner_telemetry.shares_rejected,
-                    pool_in_use=miner_telemetry.pool_in_use,
-                    data=miner_telemetry.extra_data
-                )
-                db.add(db_telemetry)
-                await db.commit()
+            # Staged and written in batches by the telemetry flusher
+            enqueue_telemetry({
+                "miner_id": adapter.miner_id,
+                "timestamp": miner_telemetry.timestamp,
+                "hashrate": miner_telemetry.hashrate,
+                "temperature": miner_telemetry.temperature,
+                "power_watts": miner_telemetry.power_watts,
+                "shares_accepted": miner_telemetry.shares_accepted,
+                "shares_rejected": miner_telemetry.shares_rejected,
+                "pool_in_use": miner_telemetry.pool_in_use,
+                "best_diff": extract_best_diff("nmminer", miner_telemetry.extra_data)
+            }, miner_telemetry.extra_data)
         
         except Exception as e:
             print(f"❌ Failed to save NMMiner telemetry: {e}")
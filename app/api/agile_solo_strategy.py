@@ -3,7 +3,8 @@ Agile Solo Mining Strategy API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
@@ -125,22 +126,20 @@ async def save_agile_strategy_settings(
     
     strategy.updated_at = datetime.utcnow()
     
-    # Clear existing miner strategy entries
-    existing_result = await db.execute(select(MinerStrategy))
-    existing = existing_result.scalars().all()
+    # Replace miner strategy entries (unknown miners skipped, duplicates collapse on the unique miner_id)
+    await db.execute(delete(MinerStrategy))
     
-    for ms in existing:
-        await db.delete(ms)
-    
-    await db.flush()  # Ensure deletions are processed
-    
-    # Add new miner strategy entries
-    for miner_id in settings.miner_ids:
-        ms = MinerStrategy(
-            miner_id=miner_id,
-            strategy_enabled=True
-        )
-        db.add(ms)
+    if settings.miner_ids:
+        result = await db.execute(select(Miner.id).where(Miner.id.in_(settings.miner_ids)))
+        miner_ids = set(result.scalars().all())
+        rows = [
+            {"miner_id": miner_id, "strategy_enabled": True}
+            for miner_id in settings.miner_ids if miner_id in miner_ids
+        ]
+        if rows:
+            await db.execute(
+                sqlite_insert(MinerStrategy).values(rows).on_conflict_do_nothing(index_elements=["miner_id"])
+            )
     
     await db.commit()
     
@@ -11,7 +11,7 @@ from pydantic import BaseModel
 import io
 import csv
 
-from core.database import get_db, Miner, Telemetry, HealthScore
+from core.database import get_db, get_ro_db, Miner, Telemetry, TelemetryRollup, HealthScore
 from core.health import HealthScoringService
 
 
@@ -87,7 +87,7 @@ async def get_miner_health_trend(
 async def get_telemetry_stats(
     miner_id: int,
     hours: int = 24,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_ro_db)
 ):
     """Get aggregated telemetry statistics"""
     result = await db.execute(select(Miner).where(Miner.id == miner_id))
@@ -149,7 +149,7 @@ async def get_telemetry_timeseries(
     miner_id: int,
     hours: int = 24,
     metric: str = "hashrate",
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_ro_db)
 ):
     """Get time-series data for charts"""
     result = await db.execute(select(Miner).where(Miner.id == miner_id))
@@ -158,16 +158,6 @@ async def get_telemetry_timeseries(
     if not miner:
         raise HTTPException(status_code=404, detail="Miner not found")
     
-    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-    
-    result = await db.execute(
-        select(Telemetry)
-        .where(Telemetry.miner_id == miner_id)
-        .where(Telemetry.timestamp >= cutoff_time)
-        .order_by(Telemetry.timestamp.asc())
-    )
-    telemetry_data = result.scalars().all()
-    
     # Map metric to field
     metric_map = {
         "hashrate": "hashrate",
@@ -178,15 +168,39 @@ async def get_telemetry_timeseries(
     if metric not in metric_map:
         raise HTTPException(status_code=400, detail=f"Invalid metric. Choose from: {', '.join(metric_map.keys())}")
     
-    field = metric_map[metric]
+    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+    
+    if hours > 6:
+        # Longer windows read the 5-minute rollup instead of every raw sample
+        rollup_map = {
+            "hashrate": TelemetryRollup.avg_hashrate,
+            "temperature": TelemetryRollup.avg_temperature,
+            "power": TelemetryRollup.avg_power_watts
+        }
+        column = rollup_map[metric]
+        result = await db.execute(
+            select(TelemetryRollup.bucket_start, column)
+            .where(TelemetryRollup.miner_id == miner_id)
+            .where(TelemetryRollup.bucket_start >= cutoff_time)
+            .where(column.isnot(None))
+            .order_by(TelemetryRollup.bucket_start.asc())
+        )
+    else:
+        column = getattr(Telemetry, metric_map[metric])
+        result = await db.execute(
+            select(Telemetry.timestamp, column)
+            .where(Telemetry.miner_id == miner_id)
+            .where(Telemetry.timestamp >= cutoff_time)
+            .where(column.isnot(None))
+            .order_by(Telemetry.timestamp.asc())
+        )
     
     data_points = [
         {
-            "timestamp": t.timestamp.isoformat(),
-            "value": getattr(t, field)
+            "timestamp": timestamp.isoformat(),
+            "value": value
         }
-        for t in telemetry_data
-        if getattr(t, field) is not None
+        for timestamp, value in result.all()
     ]
     
     return {
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta, timezone
 import logging
 
 from core.database import get_db, Miner, Telemetry, EnergyPrice, Event, HighDiffShare, AgileStrategy
+from core.energy import price_lookup
 
 
 router = APIRouter()
@@ -168,11 +169,7 @@ async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
     energy_prices = result.scalars().all()
     
     # Create a lookup function for energy prices
-    def get_price_for_timestamp(ts):
-        for price in energy_prices:
-            if price.valid_from <= ts < price.valid_to:
-                return price.price_pence
-        return None
+    get_price_for_timestamp = price_lookup(energy_prices)
     
     # Calculate total 24h cost across all miners using actual telemetry + energy prices
     total_cost_pence = 0.0
@@ -656,7 +653,8 @@ async def get_dashboard_all(dashboard_type: str = "all", db: AsyncSession = Depe
     Args:
         dashboard_type: Filter by miner type - "asic" or "all"
     """
-    from core.database import Pool
+    from core.database import Pool, HealthScore
+    from core.utils import get_latest_telemetry_batch
     
     # Define miner type filters
     ASIC_TYPES = ["avalon_nano", "bitaxe", "nerdqaxe", "nmminer"]
@@ -707,11 +705,45 @@ async def get_dashboard_all(dashboard_type: str = "all", db: AsyncSession = Depe
     energy_prices = result.scalars().all()
     
     # Create a lookup function for energy prices
-    def get_price_for_timestamp(ts):
-        for price in energy_prices:
-            if price.valid_from <= ts < price.valid_to:
-                return price.price_pence
-        return None
+    get_price_for_timestamp = price_lookup(energy_prices)
+    
+    # Batch per-miner lookups up front (one query each instead of one per miner)
+    miner_ids = [m.id for m in miners]
+    
+    # Latest telemetry (last 5 minutes)
+    latest_by_miner = await get_latest_telemetry_batch(db, miner_ids, cutoff=cutoff_5min)
+    
+    # 24h power readings, in time order per miner
+    readings_by_miner = {miner_id: [] for miner_id in miner_ids}
+    result = await db.execute(
+        select(Telemetry.miner_id, Telemetry.power_watts, Telemetry.timestamp)
+        .where(Telemetry.miner_id.in_(miner_ids))
+        .where(Telemetry.timestamp > cutoff_24h)
+        .order_by(Telemetry.miner_id, Telemetry.timestamp)
+    )
+    for tel_miner_id, tel_power, tel_timestamp in result.all():
+        readings_by_miner[tel_miner_id].append((tel_power, tel_timestamp))
+    
+    # Latest health score per miner
+    health_by_miner = {}
+    try:
+        latest_health = (
+            select(HealthScore.miner_id, func.max(HealthScore.timestamp).label("max_timestamp"))
+            .where(HealthScore.miner_id.in_(miner_ids))
+            .group_by(HealthScore.miner_id)
+            .subquery()
+        )
+        result = await db.execute(
+            select(HealthScore.miner_id, HealthScore.overall_score)
+            .join(
+                latest_health,
+                (HealthScore.miner_id == latest_health.c.miner_id)
+                & (HealthScore.timestamp == latest_health.c.max_timestamp)
+            )
+        )
+        health_by_miner = dict(result.all())
+    except Exception:
+        pass
     
     miners_data = []
     total_hashrate = 0.0
@@ -722,14 +754,7 @@ async def get_dashboard_all(dashboard_type: str = "all", db: AsyncSession = Depe
     
     for miner in miners:
         # Get latest telemetry (last 5 minutes)
-        result = await db.execute(
-            select(Telemetry)
-            .where(Telemetry.miner_id == miner.id)
-            .where(Telemetry.timestamp > cutoff_5min)
-            .order_by(Telemetry.timestamp.desc())
-            .limit(1)
-        )
-        latest_telemetry = result.scalar_one_or_none()
+        latest_telemetry = latest_by_miner.get(miner.id)
         
         hashrate = 0.0
         hashrate_unit = "GH/s"  # Default for ASIC miners
@@ -777,13 +802,7 @@ async def get_dashboard_all(dashboard_type: str = "all", db: AsyncSession = Depe
         
         # Calculate accurate 24h cost using historical telemetry + energy prices (using cached prices)
         miner_cost_24h = 0.0
-        result = await db.execute(
-            select(Telemetry.power_watts, Telemetry.timestamp)
-            .where(Telemetry.miner_id == miner.id)
-            .where(Telemetry.timestamp > cutoff_24h)
-            .order_by(Telemetry.timestamp)
-        )
-        telemetry_records = result.all()
+        telemetry_records = readings_by_miner[miner.id]
         
         for i, (tel_power, tel_timestamp) in enumerate(telemetry_records):
             power = tel_power
@@ -845,30 +864,13 @@ async def get_dashboard_all(dashboard_type: str = "all", db: AsyncSession = Depe
                 total_kwh_consumed_24h += kwh
         
         # Get latest health score for this miner
-        health_score = None
-        try:
-            result = await db.execute(
-                select(HealthScore.overall_score)
-                .where(HealthScore.miner_id == miner.id)
-                .order_by(HealthScore.timestamp.desc())
-                .limit(1)
-            )
-            health_score = result.scalar()
-        except Exception:
-            pass
+        health_score = health_by_miner.get(miner.id)
         
         # Determine if miner is offline (no telemetry in last 5 minutes)
         is_offline = latest_telemetry is None
         
         # Get best session diff/share for tile display
-        best_diff = None
-        if latest_telemetry and latest_telemetry.data:
-            if miner.miner_type in ["bitaxe", "nerdqaxe"]:
-                best_diff = latest_telemetry.data.get("best_session_diff")
-            elif miner.miner_type in ["avalon_nano"]:
-                best_diff = latest_telemetry.data.get("best_share")
-            elif miner.miner_type == "nmminer":
-                best_diff = latest_telemetry.data.get("best_share_diff")
+        best_diff = latest_telemetry.best_diff if latest_telemetry else None
         
         miners_data.append({
             "id": miner.id,
@@ -9,18 +9,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from core.database import AsyncSessionLocal, Miner, HealthEvent, MinerBaseline, MinerHealthCurrent
+from core.database import get_db, Miner, HealthEvent, MinerBaseline, MinerHealthCurrent
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
-
-
 @router.get("/all")
 async def get_all_miners_health(db: AsyncSession = Depends(get_db)):
     """Get latest health status for all miners"""
@@ -8,7 +8,7 @@ from typing import Optional, List
 from pydantic import BaseModel
 from datetime import datetime
 
-from core.database import get_db, BlockFound
+from core.database import get_db, get_ro_db, BlockFound
 from core.high_diff_tracker import get_leaderboard
 
 router = APIRouter()
@@ -61,7 +61,7 @@ async def get_high_diff_leaderboard(
     days: int = Query(90, ge=1, le=365, description="Number of days to look back"),
     coin: Optional[str] = Query(None, description="Filter by coin (BTC/BCH/BC2/DGB)"),
     limit: int = Query(10, ge=1, le=50, description="Number of entries to return"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_ro_db)
 ):
     """
     Get high difficulty share leaderboard
@@ -201,7 +201,7 @@ async def debug_blocks_found(db: AsyncSession = Depends(get_db)):
 
 @router.get("/coin-hunter", response_model=CoinHunterResponse)
 async def get_coin_hunter_leaderboard(
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_ro_db)
 ):
     """
     Get Coin Hunter leaderboard - all-time blocks found with weighted scoring
@@ -460,10 +460,10 @@ async def validate_solopool_blocks(
     - **hours**: How many hours back to check (default 24)
     - **dry_run**: If true, only report discrepancies without fixing them (default true)
     """
-    from core.solopool_validator import run_validation_for_all_coins
+    from core.solopool_validator import run_validation_in_executor
     
     try:
-        results = run_validation_for_all_coins(hours=hours, dry_run=dry_run)
+        results = await run_validation_in_executor(hours=hours, dry_run=dry_run)
         
         # Format response
         summary = {
@@ -4,13 +4,14 @@ Miner management API endpoints
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
+from sqlalchemy.orm import selectinload
 from typing import List
 from pydantic import BaseModel
 from datetime import datetime
 import logging
 import copy
 
-from core.database import get_db, Miner, Pool, Telemetry
+from core.database import get_db, Miner, Pool, Telemetry, TelemetryExtras
 from adapters import create_adapter, get_supported_types
 
 
@@ -286,6 +287,7 @@ async def get_miner_telemetry(
     # Cached query - read from database
     result = await db.execute(
         select(Telemetry)
+        .options(selectinload(Telemetry.extras))
         .where(Telemetry.miner_id == miner_id)
         .order_by(desc(Telemetry.timestamp))
         .limit(1)
@@ -339,6 +341,7 @@ async def set_miner_mode(miner_id: int, mode: str, db: AsyncSession = Depends(ge
     telemetry = await adapter.get_telemetry()
     if telemetry and telemetry.power_watts:
         from core.database import Telemetry, EnergyPrice
+        from core.high_diff_tracker import extract_best_diff
         from sqlalchemy import select
         
         # Calculate energy cost if we have power data
@@ -370,7 +373,8 @@ async def set_miner_mode(miner_id: int, mode: str, db: AsyncSession = Depends(ge
             shares_rejected=telemetry.shares_rejected,
             pool_in_use=telemetry.pool_in_use,
             mode=miner.current_mode,
-            data=telemetry.extra_data
+            best_diff=extract_best_diff(miner.miner_type, telemetry.extra_data),
+            extras=TelemetryExtras(data=telemetry.extra_data) if telemetry.extra_data else None
         )
         db.add(db_telemetry)
         await db.commit()
@@ -519,6 +523,7 @@ async def get_miner_24h_cost(miner_id: int, db: AsyncSession = Depends(get_db)):
     from datetime import datetime, timedelta
     from core.database import Telemetry, EnergyPrice
     from core.config import app_config
+    from core.energy import price_lookup
     
     # Get miner
     result = await db.execute(select(Miner).where(Miner.id == miner_id))
@@ -531,27 +536,6 @@ async def get_miner_24h_cost(miner_id: int, db: AsyncSession = Depends(get_db)):
     now = datetime.utcnow()
     start_time = now - timedelta(hours=24)
     
-    # Get all telemetry records for this miner in the last 24 hours
-    result = await db.execute(
-        select(Telemetry)
-        .where(Telemetry.miner_id == miner_id)
-        .where(Telemetry.timestamp > start_time)
-        .order_by(Telemetry.timestamp)
-    )
-    telemetry_records = result.scalars().all()
-    
-    if not telemetry_records:
-        return {
-            "miner_id": miner_id,
-            "miner_name": miner.name,
-            "period_hours": 24,
-            "cost_pence": 0,
-            "cost_pounds": 0,
-            "avg_power_watts": 0,
-            "total_kwh": 0,
-            "message": "No telemetry data available"
-        }
-    
     # Pre-fetch all energy prices for the last 24 hours (same as dashboard)
     result = await db.execute(
         select(EnergyPrice)
@@ -561,19 +545,39 @@ async def get_miner_24h_cost(miner_id: int, db: AsyncSession = Depends(get_db)):
     energy_prices = result.scalars().all()
     
     # Create a lookup function for energy prices (same as dashboard)
-    def get_price_for_timestamp(ts):
-        for price in energy_prices:
-            if price.valid_from <= ts < price.valid_to:
-                return price.price_pence
-        return None
+    get_price_for_timestamp = price_lookup(energy_prices)
     
-    # Calculate total cost by matching telemetry records with energy prices
+    # Stream just the two columns needed for the last 24 hours; a day of 30s
+    # readings never has to be materialised as ORM objects
+    telemetry_rows = await db.stream(
+        select(Telemetry.timestamp, Telemetry.power_watts)
+        .where(Telemetry.miner_id == miner_id)
+        .where(Telemetry.timestamp > start_time)
+        .order_by(Telemetry.timestamp)
+        .execution_options(yield_per=500)
+    )
+    
+    # Cap duration at 10 minutes to prevent counting offline gaps
+    # Telemetry is recorded every 30s, so >10min gap = miner was offline
+    max_duration_hours = 10.0 / 60.0  # 10 minutes in hours
+    
+    # Calculate total cost by matching telemetry records with energy prices.
+    # A reading is costed once the next one arrives (same logic as dashboard),
+    # so the priced reading waiting for its duration is carried in pending.
     total_cost_pence = 0
     total_power_readings = 0
     total_power_sum = 0
-    
-    for i, telem in enumerate(telemetry_records):
-        power = telem.power_watts
+    pending = None  # (timestamp, power, price_pence)
+    has_telemetry = False
+    
+    async for timestamp, power in telemetry_rows:
+        has_telemetry = True
+        if pending:
+            pending_timestamp, pending_power, pending_price = pending
+            duration_hours = (timestamp - pending_timestamp).total_seconds() / 3600.0
+            duration_hours = min(duration_hours, max_duration_hours)
+            total_cost_pence += (pending_power / 1000) * duration_hours * pending_price
+            pending = None
         
         # Fallback to manual power if no auto-detected power
         if not power or power <= 0:
@@ -583,32 +587,30 @@ async def get_miner_24h_cost(miner_id: int, db: AsyncSession = Depends(get_db)):
                 continue
         
         # Find the energy price for this timestamp using cached lookup
-        price_pence = get_price_for_timestamp(telem.timestamp)
-        
+        price_pence = get_price_for_timestamp(timestamp)
         if price_pence:
-            # Calculate duration until next reading (same logic as dashboard)
-            if i < len(telemetry_records) - 1:
-                next_timestamp = telemetry_records[i + 1].timestamp
-                duration_seconds = (next_timestamp - telem.timestamp).total_seconds()
-                duration_hours = duration_seconds / 3600.0
-                
-                # Cap duration at 10 minutes to prevent counting offline gaps
-                # Telemetry is recorded every 30s, so >10min gap = miner was offline
-                max_duration_hours = 10.0 / 60.0  # 10 minutes in hours
-                if duration_hours > max_duration_hours:
-                    duration_hours = max_duration_hours
-            else:
-                # Last reading: assume 30 seconds
-                duration_hours = 30.0 / 3600.0
-            
-            # Calculate energy consumed during this period
-            energy_kwh = (power / 1000) * duration_hours
-            cost_pence = energy_kwh * price_pence
-            total_cost_pence += cost_pence
+            pending = (timestamp, power, price_pence)
         
         total_power_sum += power
         total_power_readings += 1
     
+    if pending:
+        # Last reading: assume 30 seconds
+        _, pending_power, pending_price = pending
+        total_cost_pence += (pending_power / 1000) * (30.0 / 3600.0) * pending_price
+    
+    if not has_telemetry:
+        return {
+            "miner_id": miner_id,
+            "miner_name": miner.name,
+            "period_hours": 24,
+            "cost_pence": 0,
+            "cost_pounds": 0,
+            "avg_power_watts": 0,
+            "total_kwh": 0,
+            "message": "No telemetry data available"
+        }
+    
     # Calculate averages
     avg_power_watts = total_power_sum / total_power_readings if total_power_readings > 0 else 0
     
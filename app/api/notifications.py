@@ -4,7 +4,9 @@ Notifications API endpoints
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typing import List, Optional
+from datetime import datetime
 from pydantic import BaseModel
 
 from core.database import get_db, NotificationConfig, AlertConfig, NotificationLog
@@ -191,30 +193,23 @@ async def get_alert_config(alert_type: str, db: AsyncSession = Depends(get_db)):
 @router.post("/alerts", response_model=AlertConfigResponse)
 async def create_alert_config(alert: AlertConfigCreate, db: AsyncSession = Depends(get_db)):
     """Create or update alert configuration"""
-    # Check if alert already exists
-    result = await db.execute(
-        select(AlertConfig).where(AlertConfig.alert_type == alert.alert_type)
-    )
-    existing = result.scalar_one_or_none()
-    
-    if existing:
-        # Update existing
-        existing.enabled = alert.enabled
-        existing.config = alert.config
-        await db.commit()
-        await db.refresh(existing)
-        return existing
-    
-    # Create new
-    db_alert = AlertConfig(
+    stmt = sqlite_insert(AlertConfig).values(
         alert_type=alert.alert_type,
         enabled=alert.enabled,
         config=alert.config
     )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["alert_type"],
+        set_={
+            "enabled": stmt.excluded.enabled,
+            "config": stmt.excluded.config,
+            "updated_at": datetime.utcnow()
+        }
+    ).returning(AlertConfig)
     
-    db.add(db_alert)
+    result = await db.execute(stmt, execution_options={"populate_existing": True})
+    db_alert = result.scalar_one()
     await db.commit()
-    await db.refresh(db_alert)
     
     return db_alert
 
@@ -3,7 +3,7 @@ Pool management API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from typing import List
 from pydantic import BaseModel
 
@@ -171,6 +171,50 @@ class PoolStrategyResponse(BaseModel):
         from_attributes = True
 
 
+async def _sync_strategy_members(db: AsyncSession, strategy):
+    """Rewrite the strategy_pools/strategy_miners rows to match the strategy's lists"""
+    from core.database import StrategyPool, StrategyMiner, Miner
+    
+    await db.execute(delete(StrategyPool).where(StrategyPool.strategy_id == strategy.id))
+    await db.execute(delete(StrategyMiner).where(StrategyMiner.strategy_id == strategy.id))
+    
+    # The JSON lists can still name deleted pools/miners; only mirror ids the FKs accept
+    pool_ids = list(dict.fromkeys(strategy.pool_ids or []))
+    miner_ids = set(strategy.miner_ids or [])
+    known_pools = set((await db.execute(select(Pool.id).where(Pool.id.in_(pool_ids)))).scalars())
+    known_miners = set((await db.execute(select(Miner.id).where(Miner.id.in_(miner_ids)))).scalars())
+    
+    db.add_all([
+        StrategyPool(strategy_id=strategy.id, pool_id=pool_id, position=position)
+        for position, pool_id in enumerate(pool_ids)
+        if pool_id in known_pools
+    ])
+    db.add_all([
+        StrategyMiner(strategy_id=strategy.id, miner_id=miner_id)
+        for miner_id in miner_ids
+        if miner_id in known_miners
+    ])
+
+
+async def _find_miner_conflict(db: AsyncSession, miner_ids: List[int], exclude_strategy_id: int | None = None):
+    """Return (strategy_name, miner_ids) for the first enabled strategy already using any of these miners"""
+    from core.database import PoolStrategy, StrategyMiner
+    
+    query = (
+        select(PoolStrategy.name, StrategyMiner.miner_id)
+        .join(StrategyMiner, StrategyMiner.strategy_id == PoolStrategy.id)
+        .where(PoolStrategy.enabled == True)
+        .where(StrategyMiner.miner_id.in_(miner_ids))
+    )
+    if exclude_strategy_id is not None:
+        query = query.where(PoolStrategy.id != exclude_strategy_id)
+    
+    conflicts = {}
+    for name, miner_id in (await db.execute(query)).all():
+        conflicts.setdefault(name, []).append(miner_id)
+    return next(iter(conflicts.items()), None)
+
+
 @router.get("/strategies", response_model=List[PoolStrategyResponse])
 async def list_strategies(db: AsyncSession = Depends(get_db)):
     """List all pool strategies"""
@@ -259,18 +303,13 @@ async def create_strategy(strategy: PoolStrategyCreate, db: AsyncSession = Depen
     
     # Check for miner conflicts with other enabled strategies
     if strategy.enabled and strategy.miner_ids:
-        result = await db.execute(select(PoolStrategy).where(PoolStrategy.enabled == True))
-        existing_strategies = result.scalars().all()
-        for existing in existing_strategies:
-            # Check if any miners overlap
-            existing_miner_ids = existing.miner_ids if existing.miner_ids else []
-            if existing_miner_ids:
-                overlap = set(strategy.miner_ids) & set(existing_miner_ids)
-                if overlap:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Miners {list(overlap)} are already assigned to strategy '{existing.name}'"
-                    )
+        conflict = await _find_miner_conflict(db, strategy.miner_ids)
+        if conflict:
+            existing_name, overlap = conflict
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Miners {overlap} are already assigned to strategy '{existing_name}'"
+            )
     
     new_strategy = PoolStrategy(
         name=strategy.name,
@@ -283,6 +322,8 @@ async def create_strategy(strategy: PoolStrategyCreate, db: AsyncSession = Depen
     )
     
     db.add(new_strategy)
+    await db.flush()
+    await _sync_strategy_members(db, new_strategy)
     await db.commit()
     await db.refresh(new_strategy)
     
@@ -352,18 +393,13 @@ async def update_strategy(
     # Check for miner conflicts if enabling or updating miner_ids
     is_enabling = strategy_update.enabled is not None and strategy_update.enabled
     if (is_enabling or strategy_update.miner_ids is not None) and updated_miner_ids:
-        result = await db.execute(select(PoolStrategy).where(PoolStrategy.enabled == True))
-        existing_strategies = result.scalars().all()
-        for existing in existing_strategies:
-            if existing.id != strategy_id:
-                existing_miner_ids = existing.miner_ids if existing.miner_ids else []
-                if existing_miner_ids:
-                    overlap = set(updated_miner_ids) & set(existing_miner_ids)
-                    if overlap:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Miners {list(overlap)} are already assigned to strategy '{existing.name}'"
-                        )
+        conflict = await _find_miner_conflict(db, updated_miner_ids, exclude_strategy_id=strategy_id)
+        if conflict:
+            existing_name, overlap = conflict
+            raise HTTPException(
+                status_code=400,
+                detail=f"Miners {overlap} are already assigned to strategy '{existing_name}'"
+            )
     
     if strategy_update.name is not None:
         strategy.name = strategy_update.name
@@ -383,6 +419,8 @@ async def update_strategy(
         strategy.config = strategy_update.config
     if strategy_update.enabled is not None:
         strategy.enabled = strategy_update.enabled
+    if strategy_update.pool_ids is not None or strategy_update.miner_ids is not None:
+        await _sync_strategy_members(db, strategy)
     
     await db.commit()
     await db.refresh(strategy)
@@ -403,7 +441,7 @@ async def update_strategy(
 @router.delete("/strategies/{strategy_id}")
 async def delete_strategy(strategy_id: int, db: AsyncSession = Depends(get_db)):
     """Delete strategy"""
-    from core.database import PoolStrategy
+    from core.database import PoolStrategy, StrategyPool, StrategyMiner
     
     result = await db.execute(select(PoolStrategy).where(PoolStrategy.id == strategy_id))
     strategy = result.scalar_one_or_none()
@@ -412,6 +450,8 @@ async def delete_strategy(strategy_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Strategy not found")
     
     await db.delete(strategy)
+    await db.execute(delete(StrategyPool).where(StrategyPool.strategy_id == strategy_id))
+    await db.execute(delete(StrategyMiner).where(StrategyMiner.strategy_id == strategy_id))
     await db.commit()
     
     return {"status": "deleted"}
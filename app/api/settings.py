@@ -4,6 +4,7 @@ Settings API endpoints
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import httpx
@@ -878,28 +879,29 @@ async def update_crypto_prices_cache():
     prices = await fetch_and_cache_crypto_prices()
     
     if prices["success"]:
-        # Store in database
+        # Store in database (one upsert keyed on the unique coin_id)
+        rows = [
+            {
+                "coin_id": coin_id,
+                "price_gbp": prices.get(coin_id, 0),
+                "source": prices["source"],
+                "updated_at": datetime.utcnow()
+            }
+            for coin_id in ["bitcoin", "bitcoin-cash", "bellscoin", "digibyte"]
+            if prices.get(coin_id, 0) > 0
+        ]
         async with AsyncSessionLocal() as session:
-            for coin_id in ["bitcoin", "bitcoin-cash", "bellscoin", "digibyte"]:
-                price_value = prices.get(coin_id, 0)
-                if price_value > 0:
-                    # Check if exists
-                    result = await session.execute(
-                        select(CryptoPrice).where(CryptoPrice.coin_id == coin_id)
-                    )
-                    cached_price = result.scalar_one_or_none()
-                    
-                    if cached_price:
-                        cached_price.price_gbp = price_value
-                        cached_price.source = prices["source"]
-                        cached_price.updated_at = datetime.utcnow()
-                    else:
-                        new_price = CryptoPrice(
-                            coin_id=coin_id,
-                            price_gbp=price_value,
-                            source=prices["source"]
-                        )
-                        session.add(new_price)
+            if rows:
+                stmt = sqlite_insert(CryptoPrice).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["coin_id"],
+                    set_={
+                        "price_gbp": stmt.excluded.price_gbp,
+                        "source": stmt.excluded.source,
+                        "updated_at": stmt.excluded.updated_at
+                    }
+                )
+                await session.execute(stmt)
             
             await session.commit()
             logger.info(f"Crypto price cache updated from {prices['source']}")
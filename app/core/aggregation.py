@@ -2,18 +2,100 @@
 Daily and monthly aggregation service for long-term analytics
 """
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from sqlalchemy import select, func, and_
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, func, and_, text, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 from core.database import (
-    Miner, Telemetry, PoolHealth, EnergyPrice, CryptoPrice,
-    DailyMinerStats, DailyPoolStats, MonthlyMinerStats, get_db
+    EpochDateTime, Miner, Telemetry, TelemetryRollup, PoolHealth, EnergyPrice, CryptoPrice,
+    DailyMinerStats, DailyPoolStats, MonthlyMinerStats, db_session
 )
 
 logger = logging.getLogger(__name__)
 
+# Bucket width for the telemetry rollup (charts read these instead of raw rows)
+ROLLUP_BUCKET_SECONDS = 300
+
+# How far back to build the rollup when the table is empty
+ROLLUP_BACKFILL_DAYS = 7
+
+# Buckets before the newest one that every refresh recomputes, so rows that land
+# late (slow polls, queued NMMiner pushes) are folded into their own bucket
+ROLLUP_LOOKBACK_BUCKETS = 2
+
+# telemetry.timestamp is unix seconds (EpochDateTime); buckets are formatted the
+# same way SQLAlchemy stores DateTime on SQLite so range comparisons against
+# bucket_start keep working
+_REFRESH_ROLLUP_SQL = text("""
+    INSERT INTO telemetry_rollup (
+        miner_id, bucket_start, bucket_seconds, avg_hashrate, hashrate_unit,
+        avg_temperature, max_temperature, avg_power_watts, sample_count,
+        min_hashrate, max_hashrate, hashrate_samples, min_temperature,
+        temperature_samples, power_samples, powered_samples,
+        shares_accepted, shares_rejected, price_bucket
+    )
+    SELECT
+        miner_id,
+        strftime('%Y-%m-%d %H:%M:%S',
+                 (timestamp / :bucket) * :bucket,
+                 'unixepoch') || '.000000' AS bucket,
+        :bucket,
+        AVG(hashrate),
+        MAX(hashrate_unit),
+        AVG(temperature),
+        MAX(temperature),
+        AVG(power_watts),
+        COUNT(*),
+        MIN(hashrate),
+        MAX(hashrate),
+        COUNT(hashrate),
+        MIN(temperature),
+        COUNT(temperature),
+        COUNT(power_watts),
+        COUNT(NULLIF(power_watts, 0)),
+        SUM(shares_accepted),
+        SUM(shares_rejected),
+        strftime('%Y-%m-%d %H:%M:%S',
+                 (MIN(timestamp) / 1800) * 1800,
+                 'unixepoch') || '.000000'
+    FROM telemetry
+    WHERE timestamp >= :since AND (:until IS NULL OR timestamp < :until)
+    GROUP BY miner_id, bucket
+    ON CONFLICT(miner_id, bucket_start) DO UPDATE SET
+        avg_hashrate = excluded.avg_hashrate,
+        hashrate_unit = excluded.hashrate_unit,
+        avg_temperature = excluded.avg_temperature,
+        max_temperature = excluded.max_temperature,
+        avg_power_watts = excluded.avg_power_watts,
+        sample_count = excluded.sample_count,
+        min_hashrate = excluded.min_hashrate,
+        max_hashrate = excluded.max_hashrate,
+        hashrate_samples = excluded.hashrate_samples,
+        min_temperature = excluded.min_temperature,
+        temperature_samples = excluded.temperature_samples,
+        power_samples = excluded.power_samples,
+        powered_samples = excluded.powered_samples,
+        shares_accepted = excluded.shares_accepted,
+        shares_rejected = excluded.shares_rejected,
+        price_bucket = excluded.price_bucket
+""").bindparams(bindparam("since", type_=EpochDateTime), bindparam("until", type_=EpochDateTime))
+
+
+async def _upsert(db: AsyncSession, model, rows: List[dict], key: List[str]):
+    """INSERT ... ON CONFLICT(key) DO UPDATE for a batch of stats rows"""
+    if not rows:
+        return
+    
+    stmt = sqlite_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key,
+        set_={name: stmt.excluded[name] for name in rows[0] if name not in key}
+    )
+    await db.execute(stmt, rows)
+
 
 async def aggregate_daily_stats(target_date: Optional[datetime] = None):
     """
@@ -29,7 +111,7 @@ async def aggregate_daily_stats(target_date: Optional[datetime] = None):
     
     logger.info(f"Starting daily aggregation for {target_date.date()}")
     
-    async for db in get_db():
+    async with db_session() as db:
         try:
             # Aggregate miner stats
             await _aggregate_daily_miner_stats(db, target_date)
@@ -47,8 +129,48 @@ async def aggregate_daily_stats(target_date: Optional[datetime] = None):
         except Exception as e:
             logger.error(f"Error during daily aggregation: {e}", exc_info=True)
             await db.rollback()
-        finally:
-            break  # Only need one db session
+
+
+# A reading is billed until the next one, but never for more than 10 minutes
+# (a longer gap means the miner was offline); the last reading gets one 30s interval
+MAX_READING_SECONDS = 600
+LAST_READING_SECONDS = 30
+
+
+def _integrate_energy(
+    readings: list,
+    origin: datetime,
+    price_starts: np.ndarray,
+    price_ends: np.ndarray,
+    price_values: np.ndarray,
+    fallback_power: Optional[float]
+) -> Tuple[float, float]:
+    """
+    kWh and cost in pence for one miner's time-ordered readings.
+    
+    Price slot bounds are seconds from origin, sorted by start. Readings without
+    power use fallback_power (or are skipped); readings outside every slot are skipped.
+    """
+    if not price_starts.size:
+        return 0.0, 0.0
+    
+    n = len(readings)
+    seconds = np.fromiter(((r.timestamp - origin).total_seconds() for r in readings), dtype=np.float64, count=n)
+    power = np.fromiter((r.power_watts or 0.0 for r in readings), dtype=np.float64, count=n)
+    
+    if fallback_power:
+        power[power <= 0] = fallback_power
+    
+    durations = np.minimum(np.diff(seconds, append=seconds[-1] + LAST_READING_SECONDS), MAX_READING_SECONDS)
+    
+    # Slot each reading falls in: the last start <= t, if t is before that slot's end
+    slot = np.searchsorted(price_starts, seconds, side="right") - 1
+    in_range = slot >= 0
+    slot = np.where(in_range, slot, 0)
+    billed = in_range & (seconds < price_ends[slot]) & (power > 0)
+    
+    kwh = np.where(billed, power / 1000.0 * durations / 3600.0, 0.0)
+    return float(kwh.sum()), float((kwh * price_values[slot]).sum())
 
 
 async def _aggregate_daily_miner_stats(db: AsyncSession, target_date: datetime):
@@ -60,103 +182,92 @@ async def _aggregate_daily_miner_stats(db: AsyncSession, target_date: datetime):
     result = await db.execute(select(Miner))
     miners = result.scalars().all()
     
-    for miner in miners:
-        # Get all telemetry for this miner on target date
-        telemetry_query = select(Telemetry).where(
+    # Per-miner averages/extremes/counts in one grouped pass over the day
+    # (served from the telemetry covering index, no ORM rows materialised)
+    stats_result = await db.execute(
+        select(
+            Telemetry.miner_id,
+            func.count(),
+            func.avg(Telemetry.hashrate),
+            func.min(Telemetry.hashrate),
+            func.max(Telemetry.hashrate),
+            func.avg(Telemetry.temperature),
+            func.max(Telemetry.temperature),
+            func.avg(Telemetry.power_watts),
+            func.coalesce(func.sum(Telemetry.shares_accepted), 0),
+            func.coalesce(func.sum(Telemetry.shares_rejected), 0)
+        )
+        .where(
             and_(
-                Telemetry.miner_id == miner.id,
                 Telemetry.timestamp >= start_time,
                 Telemetry.timestamp < end_time
             )
         )
-        telemetry_result = await db.execute(telemetry_query)
-        telemetry_data = telemetry_result.scalars().all()
-        
-        if not telemetry_data:
+        .group_by(Telemetry.miner_id)
+    )
+    day_stats = {row[0]: row[1:] for row in stats_result.all()}
+    
+    # Get energy prices for the day (same for every miner)
+    price_query = select(EnergyPrice).where(
+        and_(
+            EnergyPrice.valid_from >= start_time,
+            EnergyPrice.valid_from < end_time
+        )
+    )
+    price_result = await db.execute(price_query)
+    energy_prices = price_result.scalars().all()
+    
+    # Slot bounds and prices as arrays (seconds from the start of the day)
+    energy_prices = sorted(energy_prices, key=lambda price: price.valid_from)
+    price_starts = np.array([(price.valid_from - start_time).total_seconds() for price in energy_prices])
+    price_ends = np.array([(price.valid_to - start_time).total_seconds() for price in energy_prices])
+    price_values = np.array([price.price_pence for price in energy_prices])
+    
+    rows = []
+    for miner in miners:
+        if miner.id not in day_stats:
             logger.debug(f"No telemetry for miner {miner.name} on {target_date.date()}")
             continue
         
-        # Calculate aggregated stats
-        hashrates = [t.hashrate for t in telemetry_data if t.hashrate is not None]
-        temperatures = [t.temperature for t in telemetry_data if t.temperature is not None]
-        power_readings = [t.power_watts for t in telemetry_data if t.power_watts is not None]
+        (actual_points, avg_hashrate, min_hashrate, max_hashrate, avg_temperature,
+         max_temperature, avg_power, total_accepted, total_rejected) = day_stats[miner.id]
+        
+        # Only the columns the energy integration needs, in time order
+        readings_result = await db.execute(
+            select(Telemetry.timestamp, Telemetry.power_watts, Telemetry.hashrate_unit)
+            .where(
+                and_(
+                    Telemetry.miner_id == miner.id,
+                    Telemetry.timestamp >= start_time,
+                    Telemetry.timestamp < end_time
+                )
+            )
+            .order_by(Telemetry.timestamp)
+        )
+        sorted_telemetry = readings_result.all()
         
         # Get hashrate unit from telemetry
-        hashrate_unit = "GH/s"
-        if telemetry_data:
-            hashrate_unit = telemetry_data[0].hashrate_unit or "GH/s"
+        hashrate_unit = sorted_telemetry[0].hashrate_unit or "GH/s"
         
         # Calculate uptime (percentage of expected data points)
         # Expect ~2880 data points per day (30 second intervals)
         expected_points = 24 * 60 * 2  # 2880
-        actual_points = len(telemetry_data)
         uptime_percent = (actual_points / expected_points) * 100.0
         offline_minutes = ((expected_points - actual_points) * 30) // 60
         
         # Calculate shares
-        total_accepted = sum(t.shares_accepted for t in telemetry_data if t.shares_accepted is not None)
-        total_rejected = sum(t.shares_rejected for t in telemetry_data if t.shares_rejected is not None)
         reject_rate = (total_rejected / (total_accepted + total_rejected) * 100) if (total_accepted + total_rejected) > 0 else 0.0
         
         # Calculate power consumption (kWh) based on actual runtime with telemetry
         total_kwh = 0.0
         energy_cost_gbp = 0.0
         
-        if len(telemetry_data) > 1:
-            # Sort telemetry by timestamp
-            sorted_telemetry = sorted(telemetry_data, key=lambda t: t.timestamp)
-            
-            # Get energy prices for the day
-            price_query = select(EnergyPrice).where(
-                and_(
-                    EnergyPrice.valid_from >= start_time,
-                    EnergyPrice.valid_from < end_time
-                )
-            )
-            price_result = await db.execute(price_query)
-            energy_prices = price_result.scalars().all()
-            
-            def get_price_for_timestamp(ts):
-                """Get energy price active at a given timestamp"""
-                for price in energy_prices:
-                    if price.valid_from <= ts < price.valid_to:
-                        return price.price_pence
-                return None
-            
+        if len(sorted_telemetry) > 1:
             # Calculate cost using duration between readings (same logic as dashboard)
-            for i, telemetry in enumerate(sorted_telemetry):
-                power = telemetry.power_watts
-                
-                # Skip if no power data
-                if not power or power <= 0:
-                    if miner.manual_power_watts:
-                        power = miner.manual_power_watts
-                    else:
-                        continue
-                
-                # Get price for this timestamp
-                price_pence = get_price_for_timestamp(telemetry.timestamp)
-                if price_pence is None:
-                    continue
-                
-                # Calculate duration until next reading
-                if i < len(sorted_telemetry) - 1:
-                    next_timestamp = sorted_telemetry[i + 1].timestamp
-                    duration_seconds = (next_timestamp - telemetry.timestamp).total_seconds()
-                    duration_hours = duration_seconds / 3600.0
-                    
-                    # Cap duration at 10 minutes to prevent counting offline gaps
-                    max_duration_hours = 10.0 / 60.0
-                    if duration_hours > max_duration_hours:
-                        duration_hours = max_duration_hours
-                else:
-                    duration_hours = 30.0 / 3600.0
-                
-                # Calculate cost for this period
-                kwh = (power / 1000.0) * duration_hours
-                cost_pence = kwh * price_pence
-                total_kwh += kwh
-                energy_cost_gbp += cost_pence / 100.0  # Convert to pounds
+            total_kwh, cost_pence = _integrate_energy(
+                sorted_telemetry, start_time, price_starts, price_ends, price_values, miner.manual_power_watts
+            )
+            energy_cost_gbp = cost_pence / 100.0  # Convert to pounds
         
         # Calculate earnings (simplified - actual earnings depend on pool and coin)
         # TODO: Implement real earnings calculation from pool data
@@ -164,63 +275,32 @@ async def _aggregate_daily_miner_stats(db: AsyncSession, target_date: datetime):
         earnings_gbp = 0.0
         profit_gbp = earnings_gbp - energy_cost_gbp
         
-        # Create or update daily stats
-        existing_query = select(DailyMinerStats).where(
-            and_(
-                DailyMinerStats.miner_id == miner.id,
-                DailyMinerStats.date == target_date
-            )
-        )
-        existing_result = await db.execute(existing_query)
-        existing_stat = existing_result.scalar_one_or_none()
-        
-        if existing_stat:
-            # Update existing
-            existing_stat.avg_hashrate = sum(hashrates) / len(hashrates) if hashrates else None
-            existing_stat.min_hashrate = min(hashrates) if hashrates else None
-            existing_stat.max_hashrate = max(hashrates) if hashrates else None
-            existing_stat.hashrate_unit = hashrate_unit
-            existing_stat.avg_temperature = sum(temperatures) / len(temperatures) if temperatures else None
-            existing_stat.max_temperature = max(temperatures) if temperatures else None
-            existing_stat.avg_power = sum(power_readings) / len(power_readings) if power_readings else None
-            existing_stat.total_kwh = total_kwh
-            existing_stat.uptime_percent = uptime_percent
-            existing_stat.offline_minutes = offline_minutes
-            existing_stat.total_shares_accepted = total_accepted
-            existing_stat.total_shares_rejected = total_rejected
-            existing_stat.reject_rate_percent = reject_rate
-            existing_stat.energy_cost_gbp = energy_cost_gbp
-            existing_stat.earnings_gbp = earnings_gbp
-            existing_stat.profit_gbp = profit_gbp
-            existing_stat.data_points = actual_points
-        else:
-            # Create new
-            new_stat = DailyMinerStats(
-                miner_id=miner.id,
-                date=target_date,
-                avg_hashrate=sum(hashrates) / len(hashrates) if hashrates else None,
-                min_hashrate=min(hashrates) if hashrates else None,
-                max_hashrate=max(hashrates) if hashrates else None,
-                hashrate_unit=hashrate_unit,
-                avg_temperature=sum(temperatures) / len(temperatures) if temperatures else None,
-                max_temperature=max(temperatures) if temperatures else None,
-                avg_power=sum(power_readings) / len(power_readings) if power_readings else None,
-                total_kwh=total_kwh,
-                uptime_percent=uptime_percent,
-                offline_minutes=offline_minutes,
-                total_shares_accepted=total_accepted,
-                total_shares_rejected=total_rejected,
-                reject_rate_percent=reject_rate,
-                energy_cost_gbp=energy_cost_gbp,
-                earnings_gbp=earnings_gbp,
-                profit_gbp=profit_gbp,
-                data_points=actual_points
-            )
-            db.add(new_stat)
+        rows.append({
+            "miner_id": miner.id,
+            "date": target_date,
+            "avg_hashrate": avg_hashrate,
+            "min_hashrate": min_hashrate,
+            "max_hashrate": max_hashrate,
+            "hashrate_unit": hashrate_unit,
+            "avg_temperature": avg_temperature,
+            "max_temperature": max_temperature,
+            "avg_power": avg_power,
+            "total_kwh": total_kwh,
+            "uptime_percent": uptime_percent,
+            "offline_minutes": offline_minutes,
+            "total_shares_accepted": total_accepted,
+            "total_shares_rejected": total_rejected,
+            "reject_rate_percent": reject_rate,
+            "energy_cost_gbp": energy_cost_gbp,
+            "earnings_gbp": earnings_gbp,
+            "profit_gbp": profit_gbp,
+            "data_points": actual_points
+        })
         
         logger.debug(f"Aggregated {actual_points} data points for {miner.name} on {target_date.date()}")
     
-    await db.flush()
+    # Create or update daily stats (unique on miner_id + date)
+    await _upsert(db, DailyMinerStats, rows, ["miner_id", "date"])
 
 
 async def _aggregate_daily_pool_stats(db: AsyncSession, target_date: datetime):
@@ -246,6 +326,7 @@ async def _aggregate_daily_pool_stats(db: AsyncSession, target_date: datetime):
         pools_data[health.pool_id].append(health)
     
     # Aggregate for each pool
+    rows = []
     for pool_id, health_records in pools_data.items():
         latencies = [h.response_time_ms for h in health_records if h.response_time_ms is not None]
         health_scores = [h.health_score for h in health_records if h.health_score is not None]
@@ -262,39 +343,21 @@ async def _aggregate_daily_pool_stats(db: AsyncSession, target_date: datetime):
         actual_checks = len(health_records)
         uptime_percent = (actual_checks / expected_health_checks) * 100.0 if expected_health_checks > 0 else 100.0
         
-        # Create or update
-        existing_query = select(DailyPoolStats).where(
-            and_(
-                DailyPoolStats.pool_id == pool_id,
-                DailyPoolStats.date == target_date
-            )
-        )
-        existing_result = await db.execute(existing_query)
-        existing_stat = existing_result.scalar_one_or_none()
-        
-        if existing_stat:
-            existing_stat.blocks_found = blocks_found
-            existing_stat.total_shares_submitted = int(total_shares)
-            existing_stat.avg_luck_percent = sum(luck_values) / len(luck_values) if luck_values else None
-            existing_stat.avg_latency_ms = sum(latencies) / len(latencies) if latencies else None
-            existing_stat.avg_health_score = sum(health_scores) / len(health_scores) if health_scores else None
-            existing_stat.uptime_percent = uptime_percent
-        else:
-            new_stat = DailyPoolStats(
-                pool_id=pool_id,
-                date=target_date,
-                blocks_found=blocks_found,
-                total_shares_submitted=int(total_shares),
-                avg_luck_percent=sum(luck_values) / len(luck_values) if luck_values else None,
-                avg_latency_ms=sum(latencies) / len(latencies) if latencies else None,
-                avg_health_score=sum(health_scores) / len(health_scores) if health_scores else None,
-                uptime_percent=uptime_percent
-            )
-            db.add(new_stat)
+        rows.append({
+            "pool_id": pool_id,
+            "date": target_date,
+            "blocks_found": blocks_found,
+            "total_shares_submitted": int(total_shares),
+            "avg_luck_percent": sum(luck_values) / len(luck_values) if luck_values else None,
+            "avg_latency_ms": sum(latencies) / len(latencies) if latencies else None,
+            "avg_health_score": sum(health_scores) / len(health_scores) if health_scores else None,
+            "uptime_percent": uptime_percent
+        })
         
         logger.debug(f"Aggregated pool stats for pool_id={pool_id} on {target_date.date()}")
     
-    await db.flush()
+    # Create or update (unique on pool_id + date)
+    await _upsert(db, DailyPoolStats, rows, ["pool_id", "date"])
 
 
 async def _aggregate_monthly_stats(db: AsyncSession, year: int, month: int):
@@ -305,6 +368,7 @@ async def _aggregate_monthly_stats(db: AsyncSession, year: int, month: int):
     result = await db.execute(select(Miner))
     miners = result.scalars().all()
     
+    rows = []
     for miner in miners:
         # Get all daily stats for this month
         daily_query = select(DailyMinerStats).where(
@@ -334,48 +398,57 @@ async def _aggregate_monthly_stats(db: AsyncSession, year: int, month: int):
         total_earnings = sum(d.earnings_gbp for d in daily_stats)
         total_profit = sum(d.profit_gbp for d in daily_stats)
         
-        # Create or update
-        existing_query = select(MonthlyMinerStats).where(
-            and_(
-                MonthlyMinerStats.miner_id == miner.id,
-                MonthlyMinerStats.year == year,
-                MonthlyMinerStats.month == month
-            )
-        )
-        existing_result = await db.execute(existing_query)
-        existing_stat = existing_result.scalar_one_or_none()
-        
-        if existing_stat:
-            existing_stat.avg_hashrate = sum(hashrates) / len(hashrates) if hashrates else None
-            existing_stat.hashrate_unit = hashrate_unit
-            existing_stat.total_kwh = total_kwh
-            existing_stat.uptime_percent = avg_uptime
-            existing_stat.total_shares_accepted = total_accepted
-            existing_stat.total_shares_rejected = total_rejected
-            existing_stat.reject_rate_percent = reject_rate
-            existing_stat.total_energy_cost_gbp = total_energy_cost
-            existing_stat.total_earnings_gbp = total_earnings
-            existing_stat.total_profit_gbp = total_profit
-            existing_stat.days_active = len(daily_stats)
-        else:
-            new_stat = MonthlyMinerStats(
-                miner_id=miner.id,
-                year=year,
-                month=month,
-                avg_hashrate=sum(hashrates) / len(hashrates) if hashrates else None,
-                hashrate_unit=hashrate_unit,
-                total_kwh=total_kwh,
-                uptime_percent=avg_uptime,
-                total_shares_accepted=total_accepted,
-                total_shares_rejected=total_rejected,
-                reject_rate_percent=reject_rate,
-                total_energy_cost_gbp=total_energy_cost,
-                total_earnings_gbp=total_earnings,
-                total_profit_gbp=total_profit,
-                days_active=len(daily_stats)
-            )
-            db.add(new_stat)
+        rows.append({
+            "miner_id": miner.id,
+            "year": year,
+            "month": month,
+            "avg_hashrate": sum(hashrates) / len(hashrates) if hashrates else None,
+            "hashrate_unit": hashrate_unit,
+            "total_kwh": total_kwh,
+            "uptime_percent": avg_uptime,
+            "total_shares_accepted": total_accepted,
+            "total_shares_rejected": total_rejected,
+            "reject_rate_percent": reject_rate,
+            "total_energy_cost_gbp": total_energy_cost,
+            "total_earnings_gbp": total_earnings,
+            "total_profit_gbp": total_profit,
+            "days_active": len(daily_stats)
+        })
         
         logger.debug(f"Aggregated monthly stats for {miner.name} ({year}-{month:02d})")
     
-    await db.flush()
+    # Create or update (unique on miner_id + year + month)
+    await _upsert(db, MonthlyMinerStats, rows, ["miner_id", "year", "month"])
+
+
+async def refresh_telemetry_rollup(since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+    """
+    Refresh the 5-minute telemetry rollup incrementally.
+
+    Buckets from ROLLUP_LOOKBACK_BUCKETS before the newest existing bucket onwards
+    are recomputed, so the last (possibly partial) bucket is topped up and rows
+    that arrived after a later bucket existed still reach their own bucket. The
+    upsert makes recomputing a bucket safe. Pass since/until (bucket-aligned) to
+    rebuild a specific window from raw telemetry instead. Returns the number of
+    buckets written.
+    """
+    async with db_session() as db:
+        try:
+            if since is None:
+                result = await db.execute(select(func.max(TelemetryRollup.bucket_start)))
+                since = result.scalar()
+                if since is None:
+                    since = datetime.utcnow() - timedelta(days=ROLLUP_BACKFILL_DAYS)
+                else:
+                    since -= timedelta(seconds=ROLLUP_LOOKBACK_BUCKETS * ROLLUP_BUCKET_SECONDS)
+
+            result = await db.execute(
+                _REFRESH_ROLLUP_SQL,
+                {"bucket": ROLLUP_BUCKET_SECONDS, "since": since, "until": until}
+            )
+            await db.commit()
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"Error refreshing telemetry rollup: {e}", exc_info=True)
+            await db.rollback()
+            return 0
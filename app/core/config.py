@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     CONFIG_DIR: Path = Path("/config")
     CONFIG_FILE: Path = Path("/config/config.yaml")
     DB_PATH: Path = Path("/config/data.db")
+    ARCHIVE_DB_PATH: Path = Path("/config/telemetry_archive.db")  # Telemetry past retention
     LOG_DIR: Path = Path("/config/logs")
     
     class Config:
@@ -1,13 +1,104 @@
 """
 SQLite database setup and models
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import String, Integer, Float, DateTime, JSON, Boolean, Index
-from datetime import datetime
-from typing import Optional
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, async_scoped_session
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import String, Integer, SmallInteger, Float, DateTime, JSON, Boolean, Index, ForeignKey, FetchedValue, event, insert, delete, select, text, bindparam
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime, timezone
+from enum import IntEnum
+from typing import Optional, AsyncIterator
+import json
+import logging
+import asyncio
+from asyncio import current_task
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from itertools import islice
 from core.config import settings
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logging.warning("orjson not installed, falling back to stdlib json for JSON columns")
+
+
+class EpochDateTime(TypeDecorator):
+    """
+    Naive-UTC datetime stored as INTEGER unix seconds.
+    
+    Used for the high-volume timestamp columns: integer keys are smaller than
+    the ISO strings DateTime writes, so more index entries fit per page and range
+    comparisons are plain integer compares. Callers still see datetime objects.
+    """
+    impl = Integer
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Row written before the epoch migration
+            return datetime.fromisoformat(value)
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+class Unit(IntEnum):
+    """Storage codes for hashrate units"""
+    H = 0
+    KH = 1
+    MH = 2
+    GH = 3
+    TH = 4
+    PH = 5
+    
+    @property
+    def label(self) -> str:
+        return "H/s" if self is Unit.H else f"{self.name}/s"
+    
+    @classmethod
+    def from_label(cls, label: str) -> "Unit":
+        return cls[label.upper().replace("/S", "")]
+
+
+class HashrateUnit(TypeDecorator):
+    """
+    Hashrate unit label ("GH/s", "KH/s", ...) stored as a SMALLINT code.
+    
+    Written on every telemetry row but only a handful of distinct values, so
+    the code keeps rows narrow. Callers read and write the usual labels.
+    """
+    impl = SmallInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return int(Unit.from_label(value))
+        except KeyError:
+            # Unrecognised label from an adapter: keep it rather than lose the row
+            return value
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str) and not value.isdigit():
+            # Row written before the unit-code migration
+            return value
+        return Unit(int(value)).label
+
 
 class Base(DeclarativeBase):
     """Base class for all models"""
@@ -30,7 +121,10 @@ class Miner(Base):
     config: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     last_mode_change: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Track when mode was last changed
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class Pool(Base):
@@ -57,12 +151,12 @@ class HighDiffShare(Base):
     __tablename__ = "high_diff_shares"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)  # Indexed via idx_high_diff_miner_diff
     miner_name: Mapped[str] = mapped_column(String(100))  # Snapshot in case miner renamed
     miner_type: Mapped[str] = mapped_column(String(50))  # avalon_nano, bitaxe, nerdqaxe
     coin: Mapped[str] = mapped_column(String(10))  # BTC, BCH, BC2, DGB
     pool_name: Mapped[str] = mapped_column(String(100))  # Pool name at time of share
-    difficulty: Mapped[float] = mapped_column(Float, index=True)  # Share difficulty
+    difficulty: Mapped[float] = mapped_column(Float)  # Share difficulty
     network_difficulty: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Network difficulty at time
     was_block_solve: Mapped[bool] = mapped_column(Boolean, default=False)  # True if share_diff >= network_diff
     hashrate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Miner hashrate at time
@@ -71,7 +165,14 @@ class HighDiffShare(Base):
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     
     __table_args__ = (
-        Index('idx_difficulty_timestamp', 'difficulty', 'timestamp'),
+        # Leaderboard reads top-N by difficulty DESC; carries the display columns
+        Index(
+            'idx_high_diff_lb',
+            text('difficulty DESC'), text('timestamp DESC'),
+            'miner_name', 'miner_type', 'coin', 'pool_name'
+        ),
+        # Per-miner top-N (the top-30 prune and per-miner best shares) is an index range scan
+        Index('idx_high_diff_miner_diff', 'miner_id', text('difficulty DESC')),
     )
 
 
@@ -80,7 +181,7 @@ class BlockFound(Base):
     __tablename__ = "blocks_found"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)
     miner_name: Mapped[str] = mapped_column(String(100))  # Snapshot in case miner renamed
     miner_type: Mapped[str] = mapped_column(String(50))  # avalon_nano, bitaxe, nerdqaxe
     coin: Mapped[str] = mapped_column(String(10), index=True)  # BTC, BCH, BC2, DGB
@@ -96,6 +197,8 @@ class BlockFound(Base):
     
     __table_args__ = (
         Index('idx_miner_coin', 'miner_id', 'coin'),
+        # Block-solve dedupe probes by (miner_id, timestamp, difficulty)
+        Index('idx_blocks_found_miner_ts', 'miner_id', 'timestamp'),
     )
 
 
@@ -103,20 +206,17 @@ class MinerPoolSlot(Base):
     """Cached pool slot configuration for Avalon Nano miners (3 slots per miner)"""
     __tablename__ = "miner_pool_slots"
     
-    id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
-    slot_number: Mapped[int] = mapped_column(Integer)  # 0, 1, 2 for Avalon Nano
-    pool_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # References Pool.id if matched
+    miner_id: Mapped[int] = mapped_column(ForeignKey("miners.id", ondelete="CASCADE"), primary_key=True)
+    slot_number: Mapped[int] = mapped_column(Integer, primary_key=True)  # 0, 1, 2 for Avalon Nano
+    pool_id: Mapped[Optional[int]] = mapped_column(ForeignKey("pools.id", ondelete="SET NULL"), nullable=True)  # Pool.id if matched
     pool_url: Mapped[str] = mapped_column(String(255))
     pool_port: Mapped[int] = mapped_column(Integer)
     pool_user: Mapped[str] = mapped_column(String(255))
     is_active: Mapped[bool] = mapped_column(Boolean, default=False)  # Currently selected slot
     last_seen: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
-    # Unique constraint: one entry per miner per slot
-    __table_args__ = (
-        {'sqlite_autoincrement': True},
-    )
+    # One entry per miner per slot; clustered on the key (no separate rowid b-tree)
+    __table_args__ = {'sqlite_with_rowid': False}
 
 
 class Telemetry(Base):
@@ -124,10 +224,10 @@ class Telemetry(Base):
     __tablename__ = "telemetry"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)  # Added index for performance
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)  # Indexed via ix_telemetry_miner_ts_cover
+    timestamp: Mapped[datetime] = mapped_column(EpochDateTime, default=datetime.utcnow, index=True)
     hashrate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
-    hashrate_unit: Mapped[Optional[str]] = mapped_column(String(10), nullable=True, default="GH/s")  # KH/s, MH/s, GH/s, TH/s
+    hashrate_unit: Mapped[Optional[str]] = mapped_column(HashrateUnit, nullable=True, default="GH/s")  # KH/s, MH/s, GH/s, TH/s
     temperature: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     power_watts: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     energy_cost: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Cost in pence for this 1-minute period (power_watts / 60 / 1000 * agile_price)
@@ -135,12 +235,62 @@ class Telemetry(Base):
     shares_rejected: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     pool_in_use: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     mode: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)  # low/med/high/eco/turbo/oc captured at poll time
-    data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # Additional miner-specific data
+    best_diff: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Parsed best session/share diff (also kept in extras)
+    
+    # Miner-specific JSON lives in telemetry_extras so metric scans don't page it in.
+    # Load explicitly with selectinload(Telemetry.extras) where needed.
+    extras: Mapped[Optional["TelemetryExtras"]] = relationship(
+        primaryjoin="Telemetry.id == foreign(TelemetryExtras.telemetry_id)",
+        uselist=False,
+        lazy="raise"
+    )
     
-    # Composite index for common query pattern (miner_id + timestamp)
+    # Covering index for per-miner time ranges: chart/stat queries on hashrate,
+    # temperature and power never touch the table rows
     __table_args__ = (
-        Index('ix_telemetry_miner_timestamp', 'miner_id', 'timestamp'),
+        Index('ix_telemetry_miner_ts_cover', 'miner_id', 'timestamp', 'hashrate', 'temperature', 'power_watts'),
     )
+    
+    @property
+    def data(self) -> Optional[dict]:
+        """Additional miner-specific data (requires extras to be loaded)"""
+        return self.extras.data if self.extras else None
+
+
+class TelemetryExtras(Base):
+    """Wide, rarely-read telemetry payload split out of the hot telemetry table"""
+    __tablename__ = "telemetry_extras"
+    
+    telemetry_id: Mapped[int] = mapped_column(Integer, primary_key=True)  # Telemetry.id
+    data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # Additional miner-specific data
+
+
+class TelemetryRollup(Base):
+    """5-minute rollup of miner telemetry, refreshed incrementally for charts and hourly metrics"""
+    __tablename__ = "telemetry_rollup"
+
+    miner_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)  # Start of bucket (aligned to bucket_seconds)
+    bucket_seconds: Mapped[int] = mapped_column(Integer, default=300)
+    avg_hashrate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    hashrate_unit: Mapped[Optional[str]] = mapped_column(HashrateUnit, nullable=True, default="GH/s")
+    avg_temperature: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    max_temperature: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    avg_power_watts: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    sample_count: Mapped[int] = mapped_column(Integer, default=0)
+    # Sufficient statistics so buckets combine exactly into hourly metrics
+    # (weighted averages use the per-column sample counts)
+    min_hashrate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    max_hashrate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    hashrate_samples: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    min_temperature: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    temperature_samples: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    power_samples: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Non-null power readings
+    powered_samples: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Non-zero power readings
+    shares_accepted: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Sum over the bucket
+    shares_rejected: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Sum over the bucket
+    # Start of the half-hour energy price slot holding this bucket (equality join to EnergyPrice.valid_from)
+    price_bucket: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
 
 class TelemetryHourly(Base):
@@ -148,7 +298,7 @@ class TelemetryHourly(Base):
     __tablename__ = "telemetry_hourly"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)
     hour_start: Mapped[datetime] = mapped_column(DateTime, index=True)  # Start of hour (YYYY-MM-DD HH:00:00)
     uptime_minutes: Mapped[int] = mapped_column(Integer)  # Number of 1-minute records in this hour
     avg_hashrate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
@@ -174,7 +324,7 @@ class TelemetryDaily(Base):
     __tablename__ = "telemetry_daily"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)
     date: Mapped[datetime] = mapped_column(DateTime, index=True)  # Date (YYYY-MM-DD 00:00:00)
     uptime_minutes: Mapped[int] = mapped_column(Integer)  # Total minutes of uptime for the day
     uptime_percentage: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # % of 1440 minutes
@@ -202,11 +352,16 @@ class EnergyPrice(Base):
     __tablename__ = "energy_prices"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    region: Mapped[str] = mapped_column(String(1), index=True)
+    region: Mapped[str] = mapped_column(String(1))  # Indexed via idx_energy_prices_region_slot
     valid_from: Mapped[datetime] = mapped_column(DateTime, index=True)
     valid_to: Mapped[datetime] = mapped_column(DateTime)
     price_pence: Mapped[float] = mapped_column(Float)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    # Slot lookups are always region + time range (current price, forecasts, cost joins)
+    __table_args__ = (
+        Index('idx_energy_prices_region_slot', 'region', 'valid_from', 'valid_to'),
+    )
 
 
 class AgileForecastSlot(Base):
@@ -250,7 +405,7 @@ class Event(Base):
     __tablename__ = "events"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    timestamp: Mapped[datetime] = mapped_column(EpochDateTime, default=datetime.utcnow, index=True)
     event_type: Mapped[str] = mapped_column(String(50))  # info, warning, error, alert
     source: Mapped[str] = mapped_column(String(100))  # miner_id, automation_rule_id, system
     message: Mapped[str] = mapped_column(String(500))
@@ -265,7 +420,10 @@ class CryptoPrice(Base):
     coin_id: Mapped[str] = mapped_column(String(50), unique=True)  # bitcoin, bitcoin-cash, digibyte
     price_gbp: Mapped[float] = mapped_column(Float)
     source: Mapped[str] = mapped_column(String(50))  # coingecko, coincap, binance
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class NotificationConfig(Base):
@@ -277,7 +435,10 @@ class NotificationConfig(Base):
     enabled: Mapped[bool] = mapped_column(Boolean, default=False)
     config: Mapped[dict] = mapped_column(JSON)  # bot_token, chat_id for Telegram; webhook_url for Discord
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class AlertConfig(Base):
@@ -289,7 +450,10 @@ class AlertConfig(Base):
     enabled: Mapped[bool] = mapped_column(Boolean, default=True)
     config: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # thresholds, timeouts, etc.
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class NotificationLog(Base):
@@ -309,11 +473,13 @@ class AlertThrottle(Base):
     """Track alert sending to prevent spam"""
     __tablename__ = "alert_throttle"
     
-    id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
-    alert_type: Mapped[str] = mapped_column(String(50), index=True)
+    miner_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    alert_type: Mapped[str] = mapped_column(String(50), primary_key=True)
     last_sent: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     send_count: Mapped[int] = mapped_column(Integer, default=1)  # Track how many times sent
+    
+    # One throttle row per miner per alert type; clustered on the key (no separate rowid b-tree)
+    __table_args__ = {'sqlite_with_rowid': False}
 
 
 class HealthScore(Base):
@@ -321,14 +487,19 @@ class HealthScore(Base):
     __tablename__ = "health_scores"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)
+    timestamp: Mapped[datetime] = mapped_column(EpochDateTime, default=datetime.utcnow, index=True)
     overall_score: Mapped[float] = mapped_column(Float)  # 0-100
     uptime_score: Mapped[float] = mapped_column(Float)  # 0-100
     temperature_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # 0-100, nullable for miners without temp sensors
     hashrate_score: Mapped[float] = mapped_column(Float)  # 0-100
     reject_rate_score: Mapped[float] = mapped_column(Float)  # 0-100
     details: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    
+    # Covering index for score trends per miner
+    __table_args__ = (
+        Index('ix_health_scores_miner_ts_score', 'miner_id', 'timestamp', 'overall_score'),
+    )
 
 
 class PoolHealth(Base):
@@ -336,7 +507,7 @@ class PoolHealth(Base):
     __tablename__ = "pool_health"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    pool_id: Mapped[int] = mapped_column(Integer, index=True)
+    pool_id: Mapped[int] = mapped_column(Integer)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     response_time_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     is_reachable: Mapped[bool] = mapped_column(Boolean, default=True)
@@ -346,6 +517,11 @@ class PoolHealth(Base):
     health_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # 0-100
     luck_percentage: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Pool luck %
     error_message: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    
+    # Per-pool time range lookups (latest check, 24h windows)
+    __table_args__ = (
+        Index('ix_pool_health_pool_ts', 'pool_id', 'timestamp'),
+    )
 
 
 class PoolHealthHourly(Base):
@@ -353,7 +529,7 @@ class PoolHealthHourly(Base):
     __tablename__ = "pool_health_hourly"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    pool_id: Mapped[int] = mapped_column(Integer, index=True)
+    pool_id: Mapped[int] = mapped_column(Integer)
     hour_start: Mapped[datetime] = mapped_column(DateTime, index=True)  # Start of hour (YYYY-MM-DD HH:00:00)
     checks_count: Mapped[int] = mapped_column(Integer)  # Number of checks in this hour
     avg_response_time_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
@@ -376,7 +552,7 @@ class PoolHealthDaily(Base):
     __tablename__ = "pool_health_daily"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    pool_id: Mapped[int] = mapped_column(Integer, index=True)
+    pool_id: Mapped[int] = mapped_column(Integer)
     date: Mapped[datetime] = mapped_column(DateTime, index=True)  # Date (YYYY-MM-DD 00:00:00)
     checks_count: Mapped[int] = mapped_column(Integer)  # Total checks for the day
     avg_response_time_ms: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
@@ -518,7 +694,27 @@ class PoolStrategy(Base):
     current_pool_index: Mapped[int] = mapped_column(Integer, default=0)  # For round-robin
     last_switch: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
+
+
+class StrategyPool(Base):
+    """Pools in a pool strategy (indexed mirror of PoolStrategy.pool_ids)"""
+    __tablename__ = "strategy_pools"
+    
+    strategy_id: Mapped[int] = mapped_column(ForeignKey("pool_strategies.id", ondelete="CASCADE"), primary_key=True)
+    pool_id: Mapped[int] = mapped_column(ForeignKey("pools.id", ondelete="CASCADE"), primary_key=True, index=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)  # Order within pool_ids (round-robin order)
+
+
+class StrategyMiner(Base):
+    """Miners assigned to a pool strategy (indexed mirror of PoolStrategy.miner_ids)"""
+    __tablename__ = "strategy_miners"
+    
+    strategy_id: Mapped[int] = mapped_column(ForeignKey("pool_strategies.id", ondelete="CASCADE"), primary_key=True)
+    miner_id: Mapped[int] = mapped_column(ForeignKey("miners.id", ondelete="CASCADE"), primary_key=True, index=True)
 
 
 class PoolStrategyLog(Base):
@@ -561,7 +757,10 @@ class CustomDashboard(Base):
     description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     layout: Mapped[dict] = mapped_column(JSON)  # Grid layout configuration
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class DashboardWidget(Base):
@@ -569,12 +768,15 @@ class DashboardWidget(Base):
     __tablename__ = "dashboard_widgets"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    dashboard_id: Mapped[int] = mapped_column(Integer, index=True)
+    dashboard_id: Mapped[int] = mapped_column(ForeignKey("custom_dashboards.id", ondelete="CASCADE"), index=True)
     widget_type: Mapped[str] = mapped_column(String(50))  # miner_stats, energy_price, pool_health, chart, etc
     config: Mapped[dict] = mapped_column(JSON)  # Widget-specific configuration
     position: Mapped[dict] = mapped_column(JSON)  # {x, y, w, h} for grid layout
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class DailyMinerStats(Base):
@@ -582,7 +784,7 @@ class DailyMinerStats(Base):
     __tablename__ = "daily_miner_stats"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)
     date: Mapped[datetime] = mapped_column(DateTime, index=True)  # Date at midnight UTC
     
     # Hashrate stats
@@ -618,7 +820,10 @@ class DailyMinerStats(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
     # Unique constraint: one entry per miner per day
-    __table_args__ = ({'sqlite_autoincrement': True},)
+    __table_args__ = (
+        Index('idx_daily_miner_stats_unique', 'miner_id', 'date', unique=True),
+        {'sqlite_autoincrement': True},
+    )
 
 
 class DailyPoolStats(Base):
@@ -626,7 +831,7 @@ class DailyPoolStats(Base):
     __tablename__ = "daily_pool_stats"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    pool_id: Mapped[int] = mapped_column(Integer, index=True)
+    pool_id: Mapped[int] = mapped_column(Integer)
     date: Mapped[datetime] = mapped_column(DateTime, index=True)
     
     # Pool performance
@@ -641,7 +846,10 @@ class DailyPoolStats(Base):
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
-    __table_args__ = ({'sqlite_autoincrement': True},)
+    __table_args__ = (
+        Index('idx_daily_pool_stats_unique', 'pool_id', 'date', unique=True),
+        {'sqlite_autoincrement': True},
+    )
 
 
 class MonthlyMinerStats(Base):
@@ -649,7 +857,7 @@ class MonthlyMinerStats(Base):
     __tablename__ = "monthly_miner_stats"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(Integer)
     year: Mapped[int] = mapped_column(Integer, index=True)
     month: Mapped[int] = mapped_column(Integer, index=True)  # 1-12
     
@@ -671,7 +879,10 @@ class MonthlyMinerStats(Base):
     days_active: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
-    __table_args__ = ({'sqlite_autoincrement': True},)
+    __table_args__ = (
+        Index('idx_monthly_miner_stats_unique', 'miner_id', 'year', 'month', unique=True),
+        {'sqlite_autoincrement': True},
+    )
 
 
 class AgileStrategy(Base):
@@ -688,7 +899,10 @@ class AgileStrategy(Base):
     last_aggregation_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # When telemetry was last aggregated
     state_data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # Additional state tracking
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class AgileStrategyBand(Base):
@@ -696,7 +910,7 @@ class AgileStrategyBand(Base):
     __tablename__ = "agile_strategy_bands"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    strategy_id: Mapped[int] = mapped_column(Integer, index=True)  # FK to AgileStrategy
+    strategy_id: Mapped[int] = mapped_column(ForeignKey("agile_strategy.id", ondelete="CASCADE"), index=True)
     min_price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Minimum price (p/kWh), None for lowest band
     max_price: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # Maximum price (p/kWh), None for highest band
     target_coin: Mapped[str] = mapped_column(String(10))  # OFF, DGB, BCH, BTC
@@ -705,12 +919,14 @@ class AgileStrategyBand(Base):
     avalon_nano_mode: Mapped[str] = mapped_column(String(20))  # managed_externally, low, med, high
     sort_order: Mapped[int] = mapped_column(Integer, default=0)  # Display order (0-based)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
     
     # Ensure bands are unique per strategy and sort order
     __table_args__ = (
         Index('ix_strategy_bands_unique', 'strategy_id', 'sort_order', unique=True),
+        {"implicit_returning": False},
     )
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class MinerStrategy(Base):
@@ -718,7 +934,7 @@ class MinerStrategy(Base):
     __tablename__ = "miner_strategy"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    miner_id: Mapped[int] = mapped_column(Integer, index=True)
+    miner_id: Mapped[int] = mapped_column(ForeignKey("miners.id", ondelete="CASCADE"))
     strategy_enabled: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
@@ -728,20 +944,103 @@ class MinerStrategy(Base):
     )
 
 
+def _json_serializer(value) -> str:
+    """Serialize JSON columns without whitespace (smaller rows, fewer pages to scan)"""
+    if ORJSON_AVAILABLE:
+        # OPT_NON_STR_KEYS keeps stdlib behaviour for int-keyed dicts
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _json_deserializer(value):
+    """Parse JSON columns (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
 # Database engine and session
 DATABASE_URL = f"sqlite+aiosqlite:///{settings.DB_PATH}"
+
+# aiosqlite defaults to NullPool for file databases (reconnect + pragmas on every session);
+# keep a small pool of open connections instead
+_pool_args = {}
+if ":memory:" not in DATABASE_URL:
+    _pool_args = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_recycle": 3600
+    }
+
 engine = create_async_engine(
     DATABASE_URL, 
     echo=False,
+    json_serializer=_json_serializer,
+    json_deserializer=_json_deserializer,
     connect_args={
         "timeout": 30,  # 30 second timeout for database locks
         "check_same_thread": False
     },
-    pool_pre_ping=True  # Verify connections before using them
+    pool_pre_ping=True,  # Verify connections before using them
+    query_cache_size=1200,  # Room for every distinct query shape (default 500 churns)
+    **_pool_args
 )
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning (busy timeout is already set via connect_args)"""
+    cursor = dbapi_connection.cursor()
+    # auto_vacuum is not set here: changing it needs the write lock, so init_db sets it once
+    cursor.execute("PRAGMA foreign_keys=ON")  # Off by default in SQLite; enforces the ON DELETE rules
+    cursor.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+    cursor.execute("PRAGMA synchronous=NORMAL")  # fsync at checkpoints, not on every commit (safe with WAL)
+    cursor.execute("PRAGMA wal_autocheckpoint=2000")  # Fewer inline checkpoints; scheduler checkpoints the WAL
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped reads
+    cursor.close()
+
+
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# Read-only engine for heavy dashboard/chart reads: its own connection pool, so long
+# SELECTs never hold the connections writers need. WAL lets these read alongside the writer.
+if ":memory:" in DATABASE_URL:
+    read_engine = engine
+else:
+    read_engine = create_async_engine(
+        f"sqlite+aiosqlite:///file:{settings.DB_PATH}?mode=ro&uri=true",
+        echo=False,
+        json_serializer=_json_serializer,
+        json_deserializer=_json_deserializer,
+        connect_args={
+            "timeout": 30,
+            "check_same_thread": False
+        },
+        pool_pre_ping=True,
+        query_cache_size=1200,
+        **_pool_args
+    )
+    
+    @event.listens_for(read_engine.sync_engine, "connect")
+    def _set_sqlite_read_pragmas(dbapi_connection, connection_record):
+        """Per-connection tuning for the read-only engine (journal/vacuum pragmas need write access)"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-32000")  # 32 MB page cache
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+
+AsyncReadSession = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# One session per asyncio task, so everything handling a request shares a transaction and identity map
+ScopedSession = async_scoped_session(AsyncSessionLocal, scopefunc=current_task)
+
+
 class Metric(Base):
     """Pre-computed metrics for fast querying"""
     __tablename__ = "metrics"
@@ -755,8 +1054,21 @@ class Metric(Base):
     value_json: Mapped[dict] = mapped_column(JSON)  # Flexible metric-specific data
     computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)  # When calculated
     
+    # Numeric sufficient statistics, so rollups aggregate columns instead of parsing value_json
+    kwh: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # energy_cost
+    cost_pence: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # energy_cost
+    avg_price_pence: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # energy_cost
+    value_avg: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # hashrate, temperature
+    value_min: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # hashrate, temperature
+    value_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # hashrate, temperature
+    sample_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Telemetry records behind the value
+    shares_accepted: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # reject_rate
+    shares_rejected: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # reject_rate
+    
     __table_args__ = (
         Index('idx_metric_lookup', 'metric_type', 'entity_type', 'entity_id', 'period', 'timestamp'),
+        # System-wide rollups filter type/entity_type/period/timestamp with no entity_id
+        Index('idx_metric_period_ts', 'metric_type', 'entity_type', 'period', 'timestamp', 'entity_id'),
     )
 
 
@@ -777,7 +1089,10 @@ class HomeAssistantConfig(Base):
     last_test: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     last_test_success: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class HomeAssistantDevice(Base):
@@ -796,7 +1111,10 @@ class HomeAssistantDevice(Base):
     last_off_command_timestamp: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Track when OFF command was sent for reconciliation
     capabilities: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class MinerBaseline(Base):
@@ -811,11 +1129,13 @@ class MinerBaseline(Base):
     mad_value: Mapped[float] = mapped_column(Float)  # Median Absolute Deviation (robust spread)
     sample_count: Mapped[int] = mapped_column(Integer)  # Number of samples used
     window_hours: Mapped[int] = mapped_column(Integer)  # Rolling window size (24h or 168h)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
     
     __table_args__ = (
         Index('ix_baseline_miner_mode_metric', 'miner_id', 'mode', 'metric_name'),
+        {"implicit_returning": False},
     )
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class HealthEvent(Base):
@@ -849,16 +1169,309 @@ class MinerHealthCurrent(Base):
     reasons: Mapped[dict] = mapped_column(JSON, nullable=False)  # Array of structured reason objects
     suggested_actions: Mapped[dict] = mapped_column(JSON, nullable=False)  # Array of action enums
     mode: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_onupdate=FetchedValue())
+    
+    __table_args__ = {"implicit_returning": False}
+    __mapper_args__ = {"eager_defaults": True}
+
+
+# Bump whenever a model or core/migrations.py changes. Startup skips create_all and
+# migrations entirely when PRAGMA user_version already matches.
+SCHEMA_VERSION = 55
+
+
+async def get_schema_version() -> int:
+    """Read the schema version stamped in the database file"""
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql("PRAGMA user_version")
+        return result.scalar() or 0
+
+
+async def set_schema_version(version: int = SCHEMA_VERSION):
+    """Stamp the database file with a schema version"""
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+async def create_updated_at_trigger(conn, table) -> None:
+    """
+    Bump updated_at in SQL rather than via per-mapper onupdate callables.
+    
+    Explicit assignments are kept (the trigger only fires when updated_at is
+    untouched). Tables without an updated_at column are skipped. Rebuilding a
+    table drops its triggers, so call this again after recreating one.
+    
+    The models mark updated_at server_onupdate=FetchedValue() with eager_defaults,
+    so the ORM re-reads it after each UPDATE (sessions don't expire on commit).
+    They also turn off implicit RETURNING, which reports the row as it was before
+    AFTER triggers ran; the re-read is a plain SELECT instead.
+    """
+    if "updated_at" not in table.c:
+        return
+    await conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table.name}_updated_at
+        AFTER UPDATE ON {table.name}
+        FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE {table.name} SET updated_at = CURRENT_TIMESTAMP WHERE rowid = NEW.rowid;
+        END
+    """)
 
 
 async def init_db():
     """Initialize database tables"""
+    # Incremental auto-vacuum on a fresh file. The connect listener has already switched
+    # it to WAL, so the setting only sticks after a VACUUM (instant while it's empty).
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        table_count = (await conn.execute(text("SELECT count(*) FROM sqlite_master"))).scalar()
+        auto_vacuum = (await conn.execute(text("PRAGMA auto_vacuum"))).scalar()
+        if table_count == 0 and auto_vacuum != 2:
+            await conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+            await conn.execute(text("VACUUM"))
+    
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        
+        for table in Base.metadata.sorted_tables:
+            await create_updated_at_trigger(conn, table)
 
 
-async def get_db() -> AsyncSession:
-    """Get database session"""
-    async with AsyncSessionLocal() as session:
+async def analyze_db(full: bool = False):
+    """
+    Refresh query planner statistics.
+    
+    PRAGMA optimize only re-analyzes tables whose stats look stale, so it's cheap
+    enough to run nightly; full=True runs a complete ANALYZE (after schema changes).
+    """
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE" if full else "PRAGMA optimize"))
+
+
+async def checkpoint_wal(mode: str = "PASSIVE") -> tuple:
+    """
+    Checkpoint the WAL into the main file.
+    
+    PASSIVE copies what it can without waiting on the busy handler, so the
+    periodic job never stalls writers behind long read-only queries. TRUNCATE
+    waits for readers and resets the WAL to zero bytes; keep it for shutdown.
+    
+    Returns SQLite's (busy, wal_pages, checkpointed_pages) row; busy=1 means a
+    reader held the WAL and the checkpoint was partial.
+    """
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown WAL checkpoint mode: {mode}")
+    async with engine.connect() as conn:
+        result = await conn.execute(text(f"PRAGMA wal_checkpoint({mode})"))
+        return tuple(result.one())
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """
+    Get the database session for the current task.
+    
+    The first caller in a task owns the session and closes it; nested callers
+    reuse it instead of opening another connection.
+    """
+    scope = current_task()
+    owner = not ScopedSession.registry.has()
+    session = ScopedSession()
+    try:
         yield session
+    finally:
+        if owner:
+            await session.close()
+            # Drop by captured task: generator cleanup may run in another task
+            ScopedSession.registry.registry.pop(scope, None)
+
+
+# Same session handling for code outside FastAPI dependencies: `async with db_session() as db:`
+db_session = asynccontextmanager(get_db)
+
+
+async def get_ro_db() -> AsyncIterator[AsyncSession]:
+    """Dependency for read-only routes (charts, leaderboards); writes raise OperationalError"""
+    async with AsyncReadSession() as session:
+        yield session
+
+
+@lru_cache(maxsize=None)
+def _insert_stmt(model, returning=None):
+    """Build each bulk INSERT once; reusing the object skips construction and cache-key work per batch"""
+    stmt = insert(model)
+    if returning is not None:
+        stmt = stmt.returning(returning, sort_by_parameter_order=True)
+    return stmt
+
+
+async def bulk_insert(session: AsyncSession, model, rows: list[dict], returning=None) -> list:
+    """
+    Insert many rows with one executemany, skipping the ORM unit of work.
+    
+    Column defaults still apply. Pass returning=Model.id to get the new keys back
+    in the same order as rows.
+    """
+    if not rows:
+        return []
+    
+    result = await session.execute(_insert_stmt(model, returning), rows)
+    if returning is not None:
+        return result.scalars().all()
+    return []
+
+
+PRUNE_BATCH_SIZE = 5000
+
+
+async def prune_old(session: AsyncSession, model, column, cutoff, batch_size: int = PRUNE_BATCH_SIZE) -> int:
+    """
+    Delete rows where column < cutoff in id-bounded chunks, committing each one.
+    
+    Keeps each write transaction (and the WAL) small so collectors are never
+    blocked behind one huge DELETE. Returns the total number of rows deleted.
+    """
+    total = 0
+    while True:
+        chunk = select(model.id).where(column < cutoff).limit(batch_size)
+        result = await session.execute(delete(model).where(model.id.in_(chunk)))
+        await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+        # Let other tasks get a write in between chunks
+        await asyncio.sleep(0)
+
+
+async def archive_telemetry(cutoff: datetime) -> int:
+    """
+    Copy telemetry older than cutoff, with its telemetry_extras payloads, into the
+    cold archive database.
+    
+    The archive (settings.ARCHIVE_DB_PATH) is attached only for the copy, so the
+    live database and its indexes stay limited to the retention window. Rows keep
+    their ids, so re-running after an interrupted purge doesn't duplicate them.
+    Call before pruning the same range; returns the number of telemetry rows archived.
+    """
+    if ":memory:" in DATABASE_URL:
+        return 0
+    
+    expiring = "SELECT id FROM main.telemetry WHERE timestamp < :cutoff"
+    copies = (
+        (Telemetry.__table__, f"id IN ({expiring})"),
+        (TelemetryExtras.__table__, f"telemetry_id IN ({expiring})"),
+    )
+    
+    async with engine.connect() as conn:
+        await conn.execute(text("ATTACH DATABASE :path AS cold"), {"path": str(settings.ARCHIVE_DB_PATH)})
+        try:
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS cold.telemetry (id INTEGER PRIMARY KEY, "
+                f"{', '.join(c.name for c in Telemetry.__table__.columns if c.name != 'id')})"
+            ))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS cold.ix_telemetry_miner_ts ON telemetry (miner_id, timestamp)"
+            ))
+            await conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS cold.telemetry_extras (telemetry_id INTEGER PRIMARY KEY, data)"
+            ))
+            
+            archived = 0
+            for table, condition in copies:
+                columns = [c.name for c in table.columns]
+                column_list = ", ".join(columns)
+                
+                # Columns added to the live table since the archive was created
+                result = await conn.execute(text(f"PRAGMA cold.table_info({table.name})"))
+                archived_columns = {row[1] for row in result.fetchall()}
+                for column in columns:
+                    if column not in archived_columns:
+                        await conn.execute(text(f"ALTER TABLE cold.{table.name} ADD COLUMN {column}"))
+                
+                result = await conn.execute(
+                    text(f"""
+                        INSERT OR IGNORE INTO cold.{table.name} ({column_list})
+                        SELECT {column_list} FROM main.{table.name} WHERE {condition}
+                    """).bindparams(bindparam("cutoff", type_=EpochDateTime)),
+                    {"cutoff": cutoff}
+                )
+                if table is Telemetry.__table__:
+                    archived = result.rowcount
+            
+            await conn.commit()
+            return archived
+        finally:
+            await conn.rollback()
+            await conn.execute(text("DETACH DATABASE cold"))
+
+
+# SQLite has a single writer; high-volume writers queue here instead of spinning on SQLITE_BUSY
+write_lock = asyncio.Lock()
+
+
+@asynccontextmanager
+async def get_write_db() -> AsyncIterator[AsyncSession]:
+    """
+    Session for bulk writers (telemetry, events, high diff shares).
+    
+    Holds write_lock for the life of the session, so keep the work inside short
+    and don't open another get_write_db() from within it (the lock isn't re-entrant).
+    """
+    async with write_lock:
+        async with AsyncSessionLocal() as session:
+            yield session
+
+
+# Staging buffer for high-frequency telemetry writers (NMMiner UDP pushes).
+# Items are (telemetry row dict, extra_data); telemetry_flusher() drains it in batches.
+TELEMETRY_FLUSH_INTERVAL = 1.0  # seconds
+TELEMETRY_FLUSH_MAX_ROWS = 500
+telemetry_queue: deque = deque()
+
+
+def enqueue_telemetry(row: dict, extra_data: Optional[dict] = None) -> None:
+    """Stage a telemetry row for the next flush (rows should all carry the same keys)"""
+    telemetry_queue.append((row, extra_data))
+
+
+async def flush_telemetry_queue(max_rows: int = TELEMETRY_FLUSH_MAX_ROWS) -> int:
+    """
+    Write up to max_rows staged rows in one transaction. Returns rows written.
+    
+    Rows are only dequeued once the commit succeeds, so a failed write (e.g.
+    database is locked) leaves them at the front for the next flush.
+    """
+    batch = list(islice(telemetry_queue, max_rows))
+    if not batch:
+        return 0
+    
+    async with get_write_db() as db:
+        telemetry_ids = await bulk_insert(db, Telemetry, [row for row, _ in batch], returning=Telemetry.id)
+        await bulk_insert(db, TelemetryExtras, [
+            {"telemetry_id": telemetry_id, "data": data}
+            for telemetry_id, (_, data) in zip(telemetry_ids, batch)
+            if data
+        ])
+        await db.commit()
+    
+    # Only telemetry_flusher drains the queue and enqueues append on the right,
+    # so the committed rows are still the leftmost len(batch)
+    for _ in batch:
+        telemetry_queue.popleft()
+    return len(batch)
+
+
+async def telemetry_flusher():
+    """Background task: flush staged telemetry every TELEMETRY_FLUSH_INTERVAL seconds"""
+    while True:
+        try:
+            await asyncio.sleep(TELEMETRY_FLUSH_INTERVAL)
+            # Keep draining while full batches come back (burst catch-up)
+            while await flush_telemetry_queue() == TELEMETRY_FLUSH_MAX_ROWS:
+                pass
+        except asyncio.CancelledError:
+            # Final drain on shutdown so staged rows aren't lost
+            while await flush_telemetry_queue():
+                pass
+            raise
+        except Exception as e:
+            logging.error(f"Failed to flush staged telemetry: {e}", exc_info=True)
@@ -4,14 +4,21 @@ Scans local network for supported mining hardware
 """
 import asyncio
 import socket
+import struct
 import ipaddress
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Set, Tuple
 import aiohttp
 import json
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # Takes bytes directly; raises a JSONDecodeError subclass
+except ImportError:
+    _json_loads = json.loads
+
 
 class MinerDiscoveryService:
     """Service for discovering miners on the local network"""
@@ -25,14 +32,46 @@ class MinerDiscoveryService:
     # XMRig HTTP API port (default)
     XMRIG_PORT = 8080
     
+    # Upper bound on a raw HTTP probe response (system info JSON is a few KB)
+    MAX_HTTP_RESPONSE = 256 * 1024
+    
+    # Shared HTTP session for all probes (created lazily on the running loop)
+    _session: Optional[aiohttp.ClientSession] = None
+    
+    @classmethod
+    def _get_session(cls) -> aiohttp.ClientSession:
+        """Return the shared probe session, creating it on first use"""
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=512,
+                    limit_per_host=4,
+                    ttl_dns_cache=300,
+                    enable_cleanup_closed=True
+                )
+            )
+        return cls._session
+    
+    @classmethod
+    async def aclose(cls):
+        """Close the shared probe session (app shutdown)"""
+        if cls._session is not None and not cls._session.closed:
+            await cls._session.close()
+        cls._session = None
+    
     @staticmethod
-    async def discover_miners(network_cidr: str = None, timeout: float = 2.0) -> List[Dict[str, Any]]:
+    async def discover_miners(
+        network_cidr: str = None,
+        timeout: float = 2.0,
+        max_connections: int = 256
+    ) -> List[Dict[str, Any]]:
         """
         Discover miners on the network
         
         Args:
             network_cidr: Network CIDR (e.g., "192.168.1.0/24"). If None, auto-detect
             timeout: Timeout for each connection attempt in seconds
+            max_connections: Maximum number of hosts probed at once
             
         Returns:
             List of discovered miners with their details
@@ -48,68 +87,119 @@ class MinerDiscoveryService:
         discovered = []
         network = ipaddress.ip_network(network_cidr, strict=False)
         
-        # Scan hosts in batches to avoid overwhelming the network
-        batch_size = 50
-        hosts = list(network.hosts())
+        # Network and broadcast addresses are already excluded by _iter_hosts
+        skip = MinerDiscoveryService._get_skip_addresses()
+        hosts = (host for host in MinerDiscoveryService._iter_hosts(network) if host not in skip)
         
-        for i in range(0, len(hosts), batch_size):
-            batch = hosts[i:i + batch_size]
-            batch_tasks = [
-                MinerDiscoveryService._scan_host(str(host), timeout)
-                for host in batch
-            ]
-            
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            
-            for result in batch_results:
-                if isinstance(result, dict) and result:
+        # One rolling pool of max_connections workers pulling from the shared host
+        # iterator: a worker takes the next host as soon as its probe finishes, so
+        # dead IPs don't hold up a batch and a /16 never queues 65k tasks
+        async def worker():
+            for host in hosts:
+                try:
+                    result = await MinerDiscoveryService._scan_host(host, timeout)
+                except Exception as e:
+                    logger.debug(f"Error scanning {host}: {e}")
+                    continue
+                if result:
                     discovered.append(result)
         
+        await asyncio.gather(*(worker() for _ in range(max_connections)))
+        
         logger.info(f"Discovery complete. Found {len(discovered)} miners")
         return discovered
     
+    @staticmethod
+    def _iter_hosts(network) -> Iterator[str]:
+        """Usable host addresses as strings, counted as integers (no IPv4Address per host)"""
+        if network.version != 4 or network.prefixlen >= 31:
+            # Point-to-point and single-host nets have no network/broadcast to skip
+            yield from (str(host) for host in network.hosts())
+            return
+        
+        pack = struct.Struct('>I').pack
+        for n in range(int(network.network_address) + 1, int(network.broadcast_address)):
+            yield socket.inet_ntoa(pack(n))
+    
+    @staticmethod
+    async def _port_open(ip: str, port: int, timeout: float) -> bool:
+        """Cheap TCP connect probe, so dead hosts never get a full protocol handshake"""
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=timeout)
+            writer.close()
+            await writer.wait_closed()
+            return True
+        except (asyncio.TimeoutError, OSError):
+            return False
+    
     @staticmethod
     async def _scan_host(ip: str, timeout: float) -> Dict[str, Any]:
         """Scan a single host for mining hardware"""
+        ports = [MinerDiscoveryService.CGMINER_PORT] + MinerDiscoveryService.HTTP_PORTS
+        probes = await asyncio.gather(*[
+            MinerDiscoveryService._port_open(ip, port, timeout) for port in ports
+        ])
+        open_ports = {port for port, is_open in zip(ports, probes) if is_open}
+        
+        if not open_ports:
+            return {}
+        
+        # Run the protocol checks for the open ports concurrently, but keep the
+        # cgminer -> xmrig -> bitaxe priority: results are taken in that order and
+        # lower-priority checks are only cancelled once a higher one has matched
+        checks = []
         
-        # Try Avalon Nano (cgminer API)
-        avalon = await MinerDiscoveryService._check_cgminer(ip, timeout)
-        if avalon:
-            return avalon
+        # Avalon Nano (cgminer API)
+        if MinerDiscoveryService.CGMINER_PORT in open_ports:
+            checks.append(MinerDiscoveryService._check_cgminer(ip, timeout))
         
-        # Try XMRig (HTTP API on port 8080)
-        xmrig = await MinerDiscoveryService._check_xmrig(ip, timeout)
-        if xmrig:
-            return xmrig
+        # XMRig (HTTP API on port 8080)
+        if MinerDiscoveryService.XMRIG_PORT in open_ports:
+            checks.append(MinerDiscoveryService._check_xmrig(ip, timeout))
         
-        # Try Bitaxe/NerdQaxe (HTTP API)
+        # Bitaxe/NerdQaxe (HTTP API)
         for port in MinerDiscoveryService.HTTP_PORTS:
-            bitaxe = await MinerDiscoveryService._check_bitaxe(ip, port, timeout)
-            if bitaxe:
-                return bitaxe
+            if port in open_ports:
+                checks.append(MinerDiscoveryService._check_bitaxe(ip, port, timeout))
+        
+        tasks = [asyncio.create_task(check) for check in checks]
+        try:
+            for task in tasks:
+                try:
+                    result = await task
+                except Exception as e:
+                    logger.debug(f"Discovery check failed for {ip}: {e}")
+                    continue
+                if result:
+                    return result
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
         
         return {}
     
     @staticmethod
     async def _check_cgminer(ip: str, timeout: float) -> Dict[str, Any]:
         """Check if host is running cgminer API (Avalon Nano)"""
+        # One request/one reply, so use the loop's socket calls directly (no stream transport)
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
         try:
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(ip, MinerDiscoveryService.CGMINER_PORT),
+            await asyncio.wait_for(
+                loop.sock_connect(sock, (ip, MinerDiscoveryService.CGMINER_PORT)),
                 timeout=timeout
             )
             
             # Send 'version' command
-            command = json.dumps({"command": "version"}) + "\n"
-            writer.write(command.encode())
-            await writer.drain()
+            await loop.sock_sendall(sock, b'{"command": "version"}\n')
             
-            response = await asyncio.wait_for(reader.read(4096), timeout=timeout)
-            writer.close()
-            await writer.wait_closed()
+            response = await asyncio.wait_for(loop.sock_recv(sock, 4096), timeout=timeout)
             
             if response:
-                data = json.loads(response.decode().strip('\x00'))
+                data = _json_loads(response.strip(b'\x00'))
                 
                 # Check if it's an Avalon device - check PROD or MODEL fields
                 if 'VERSION' in data and len(data.get('VERSION', [])) > 0:
@@ -135,42 +225,118 @@ class MinerDiscoveryService:
             pass
         except Exception as e:
             logger.debug(f"Error checking cgminer at {ip}: {e}")
+        finally:
+            sock.close()
         
         return {}
     
+    @staticmethod
+    async def _http_get_raw(ip: str, port: int, path: str, timeout: float) -> Optional[bytes]:
+        """
+        Plain HTTP/1.0 GET in one TCP exchange; returns the body of a 200 response.
+        
+        Miner web UIs answer with a small JSON document, so this skips the client
+        session machinery entirely. Returns None for any non-200 status.
+        """
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=timeout)
+        try:
+            writer.write(
+                f"GET {path} HTTP/1.0\r\nHost: {ip}\r\nAccept: application/json\r\n"
+                f"Connection: close\r\n\r\n".encode()
+            )
+            await writer.drain()
+            return await asyncio.wait_for(MinerDiscoveryService._read_response(reader), timeout=timeout)
+        finally:
+            writer.close()
+    
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Optional[bytes]:
+        """
+        Read one HTTP response, returning the body of a 200 or None.
+        
+        The body is framed by Content-Length or chunked encoding when present, so
+        keep-alive firmware (ESP-IDF httpd) that ignores Connection: close doesn't
+        leave us waiting for EOF; only an unframed body is read to EOF.
+        """
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.rstrip(b"\r\n").split(b"\r\n")
+        parts = status_line.split()
+        if len(parts) < 2 or parts[1] != b"200":
+            return None
+        
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip().lower()
+        
+        if b"chunked" in headers.get(b"transfer-encoding", b""):
+            return await MinerDiscoveryService._read_chunked(reader)
+        
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            length = int(content_length)
+            if length > MinerDiscoveryService.MAX_HTTP_RESPONSE:
+                return None
+            return await reader.readexactly(length)
+        
+        # No framing: HTTP/1.0 + Connection: close - the server ends the body by closing
+        return await MinerDiscoveryService._read_to_eof(reader)
+    
+    @staticmethod
+    async def _read_to_eof(reader: asyncio.StreamReader) -> bytes:
+        """Read until the peer closes, up to MAX_HTTP_RESPONSE bytes"""
+        data = bytearray()
+        while len(data) < MinerDiscoveryService.MAX_HTTP_RESPONSE:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+    
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> Optional[bytes]:
+        """Read a chunked transfer-encoded body up to its terminating zero-size chunk"""
+        out = bytearray()
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";")[0], 16)
+            if size == 0:
+                return bytes(out)
+            if len(out) + size > MinerDiscoveryService.MAX_HTTP_RESPONSE:
+                return None
+            out += await reader.readexactly(size)
+            await reader.readexactly(2)  # CRLF after each chunk
+    
     @staticmethod
     async def _check_bitaxe(ip: str, port: int, timeout: float) -> Dict[str, Any]:
         """Check if host is running Bitaxe/NerdQaxe HTTP API"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Try to get system info
-                url = f"http://{ip}:{port}/api/system/info"
+            # Try to get system info
+            body = await MinerDiscoveryService._http_get_raw(ip, port, "/api/system/info", timeout)
+            if body:
+                data = _json_loads(body)
                 
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # Determine miner type from response
-                        device_model = data.get('ASICModel', '').lower()
-                        hostname = data.get('hostname', '').lower()
-                        
-                        miner_type = 'bitaxe'
-                        if 'nerd' in hostname or 'qaxe' in device_model:
-                            miner_type = 'nerdqaxe'
-                        
-                        return {
-                            'ip': ip,
-                            'port': port,
-                            'type': miner_type,
-                            'name': f"{data.get('hostname', miner_type.title())} ({ip})",
-                            'details': {
-                                'hostname': data.get('hostname'),
-                                'asic_model': data.get('ASICModel'),
-                                'version': data.get('version'),
-                                'mac': data.get('macAddr')
-                            }
-                        }
-        except (asyncio.TimeoutError, aiohttp.ClientError, json.JSONDecodeError):
+                # Determine miner type from response
+                device_model = data.get('ASICModel', '').lower()
+                hostname = data.get('hostname', '').lower()
+                
+                miner_type = 'bitaxe'
+                if 'nerd' in hostname or 'qaxe' in device_model:
+                    miner_type = 'nerdqaxe'
+                
+                return {
+                    'ip': ip,
+                    'port': port,
+                    'type': miner_type,
+                    'name': f"{data.get('hostname', miner_type.title())} ({ip})",
+                    'details': {
+                        'hostname': data.get('hostname'),
+                        'asic_model': data.get('ASICModel'),
+                        'version': data.get('version'),
+                        'mac': data.get('macAddr')
+                    }
+                }
+        except (asyncio.TimeoutError, OSError, ValueError, AttributeError):
             pass
         except Exception as e:
             logger.debug(f"Error checking HTTP API at {ip}:{port}: {e}")
@@ -183,34 +349,34 @@ class MinerDiscoveryService:
         port = MinerDiscoveryService.XMRIG_PORT
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Try XMRig summary endpoint
-                async with session.get(
-                    f"http://{ip}:{port}/1/summary",
-                    timeout=aiohttp.ClientTimeout(total=timeout)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
+            session = MinerDiscoveryService._get_session()
+            # Try XMRig summary endpoint
+            async with session.get(
+                f"http://{ip}:{port}/1/summary",
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status == 200:
+                    data = _json_loads(await response.read())
+                    
+                    # Check for XMRig-specific fields
+                    if 'version' in data and ('cpu' in data or 'algo' in data):
+                        version = data.get('version', 'Unknown')
+                        worker_id = data.get('worker_id', ip)
+                        algo = data.get('algo', 'RandomX')
+                        cpu_brand = data.get('cpu', {}).get('brand', 'Unknown CPU')
                         
-                        # Check for XMRig-specific fields
-                        if 'version' in data and ('cpu' in data or 'algo' in data):
-                            version = data.get('version', 'Unknown')
-                            worker_id = data.get('worker_id', ip)
-                            algo = data.get('algo', 'RandomX')
-                            cpu_brand = data.get('cpu', {}).get('brand', 'Unknown CPU')
-                            
-                            return {
-                                'ip': ip,
-                                'port': port,
-                                'type': 'xmrig',
-                                'name': f"XMRig {worker_id}",
-                                'details': {
-                                    'version': version,
-                                    'worker_id': worker_id,
-                                    'algo': algo,
-                                    'cpu': cpu_brand
-                                }
+                        return {
+                            'ip': ip,
+                            'port': port,
+                            'type': 'xmrig',
+                            'name': f"XMRig {worker_id}",
+                            'details': {
+                                'version': version,
+                                'worker_id': worker_id,
+                                'algo': algo,
+                                'cpu': cpu_brand
                             }
+                        }
         except (asyncio.TimeoutError, aiohttp.ClientError, json.JSONDecodeError):
             pass
         except Exception as e:
@@ -218,20 +384,86 @@ class MinerDiscoveryService:
         
         return {}
     
+    @staticmethod
+    def _get_default_route() -> Optional[Tuple[str, str]]:
+        """(interface, gateway IP) of the default route from /proc/net/route (Linux only)"""
+        try:
+            with open("/proc/net/route") as f:
+                next(f)  # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 2 and fields[1] == "00000000":
+                        # Gateway is hex in host (little-endian) byte order
+                        gateway = socket.inet_ntoa(struct.pack('<I', int(fields[2], 16)))
+                        return fields[0], gateway
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not read default route: {e}")
+        return None
+    
+    @staticmethod
+    def _get_netmask_prefix() -> Optional[int]:
+        """
+        Prefix length of the default-route interface (Linux only).
+        
+        Asks the kernel for the interface's netmask with SIOCGIFNETMASK.
+        Returns None where that isn't available.
+        """
+        route = MinerDiscoveryService._get_default_route()
+        if not route:
+            return None
+        
+        try:
+            import fcntl
+            
+            iface = route[0]
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                ifreq = fcntl.ioctl(s.fileno(), 0x891b, struct.pack('256s', iface[:15].encode()))  # SIOCGIFNETMASK
+            mask = ifreq[20:24]
+            return bin(int.from_bytes(mask, 'big')).count('1')
+        except Exception as e:
+            logger.debug(f"Could not read interface netmask: {e}")
+            return None
+    
+    @staticmethod
+    def _get_local_ip() -> Optional[str]:
+        """IP of the interface used for outbound traffic (no packet is sent)"""
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect(("8.8.8.8", 80))
+                return s.getsockname()[0]
+        except OSError as e:
+            logger.debug(f"Could not determine local IP: {e}")
+            return None
+    
+    @staticmethod
+    def _get_skip_addresses() -> Set[str]:
+        """This machine and the default gateway - never miners, so not worth a probe"""
+        skip = set()
+        local_ip = MinerDiscoveryService._get_local_ip()
+        if local_ip:
+            skip.add(local_ip)
+        route = MinerDiscoveryService._get_default_route()
+        if route and route[1] != "0.0.0.0":
+            skip.add(route[1])
+        return skip
+    
     @staticmethod
     def _get_local_network() -> str:
         """Auto-detect local network CIDR"""
         try:
             # Get local IP address
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
+            local_ip = MinerDiscoveryService._get_local_ip()
+            if not local_ip:
+                return None
+            
+            # Real prefix from the kernel; fall back to /24 (common for home networks).
+            # Never wider than /16 so a misconfigured mask can't queue millions of probes
+            prefix = MinerDiscoveryService._get_netmask_prefix() or 24
+            if prefix < 16:
+                logger.warning(f"Local netmask is /{prefix}; limiting discovery to /16")
+                prefix = 16
             
-            # Assume /24 subnet (common for home networks)
-            # More sophisticated detection could use netifaces library
-            ip_parts = local_ip.split('.')
-            network = f"{ip_parts[0]}.{ip_parts[1]}.{ip_parts[2]}.0/24"
+            network = str(ipaddress.ip_interface(f"{local_ip}/{prefix}").network)
             
             logger.info(f"Auto-detected local network: {network}")
             return network
@@ -1,15 +1,63 @@
 """
 Energy Optimization Service
 """
+import heapq
+import re
+from bisect import bisect_right
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from sqlalchemy import select
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Any
+from sqlalchemy import select, func, cast, and_, bindparam, Integer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import Miner, EnergyPrice, Telemetry, Pool
 from core.config import app_config
 
 
+# Statements built once at import; callers only bind values
+_CURRENT_PRICE_STMT = (
+    select(EnergyPrice)
+    .where(EnergyPrice.region == bindparam("region"))
+    .where(EnergyPrice.valid_from <= bindparam("now"))
+    .where(EnergyPrice.valid_to > bindparam("now"))
+    .limit(1)
+)
+
+_PRICE_FORECAST_STMT = (
+    select(EnergyPrice)
+    .where(EnergyPrice.region == bindparam("region"))
+    .where(EnergyPrice.valid_from >= bindparam("now"))
+    .where(EnergyPrice.valid_from < bindparam("end_time"))
+    .order_by(EnergyPrice.valid_from)
+)
+
+# Join each half-hour price slot to the miner's telemetry inside it; telemetry
+# timestamps are epoch seconds, so compare against the slot bounds converted.
+# Separate cutoff names because the two columns bind differently (DateTime vs epoch)
+_TELEMETRY_INTERVAL_HOURS = 30 / 3600  # 30 second telemetry interval
+_ENERGY_COST_STMT = (
+    select(func.coalesce(func.sum(
+        Telemetry.power_watts / 1000.0 * _TELEMETRY_INTERVAL_HOURS * EnergyPrice.price_pence
+    ), 0))
+    .select_from(EnergyPrice)
+    .join(Telemetry, and_(
+        Telemetry.miner_id == bindparam("miner_id"),
+        Telemetry.timestamp >= cast(func.strftime('%s', EnergyPrice.valid_from), Integer),
+        Telemetry.timestamp < cast(func.strftime('%s', EnergyPrice.valid_to), Integer)
+    ))
+    .where(EnergyPrice.region == bindparam("region"))
+    .where(EnergyPrice.valid_to > bindparam("slot_cutoff"))
+    .where(EnergyPrice.valid_from <= bindparam("now"))
+    .where(Telemetry.timestamp >= bindparam("telemetry_cutoff"))
+    .where(Telemetry.power_watts > 0)
+)
+
+
+# Current price per region; Agile slots are fixed once published, so an entry
+# stays good until its valid_to (one entry per region, replaced each slot)
+_price_cache: Dict[str, EnergyPrice] = {}
+
+
 async def get_current_energy_price(db: AsyncSession) -> Optional[EnergyPrice]:
     """
     Get the current energy price for the configured region
@@ -18,19 +66,43 @@ async def get_current_energy_price(db: AsyncSession) -> Optional[EnergyPrice]:
         db: Database session
     
     Returns:
-        Current EnergyPrice object or None if not available
+        Current EnergyPrice object (detached, read-only) or None if not available
     """
     region = app_config.get("octopus_agile.region", "H")
     now = datetime.utcnow()
     
-    result = await db.execute(
-        select(EnergyPrice)
-        .where(EnergyPrice.region == region)
-        .where(EnergyPrice.valid_from <= now)
-        .where(EnergyPrice.valid_to > now)
-        .limit(1)
-    )
-    return result.scalar_one_or_none()
+    cached = _price_cache.get(region)
+    if cached and cached.valid_from <= now < cached.valid_to:
+        return cached
+    
+    result = await db.execute(_CURRENT_PRICE_STMT, {"region": region, "now": now})
+    price = result.scalar_one_or_none()
+    
+    # Misses aren't cached: the slot may be published on the next price fetch.
+    # Detach so a later commit on this session can't expire the cached attributes
+    if price:
+        db.expunge(price)
+        _price_cache[region] = price
+    return price
+
+
+def price_lookup(prices: Iterable[EnergyPrice]) -> Callable[[datetime], Optional[float]]:
+    """
+    Build a timestamp -> price_pence lookup over a set of price slots.
+    
+    Bisects the slots' start times, so matching thousands of telemetry samples
+    costs O(log n) each instead of a scan of every slot. None if no slot covers ts.
+    """
+    slots = sorted(prices, key=attrgetter("valid_from"))
+    starts = [slot.valid_from for slot in slots]
+    
+    def lookup(ts: datetime) -> Optional[float]:
+        i = bisect_right(starts, ts) - 1
+        if i >= 0 and ts < slots[i].valid_to:
+            return slots[i].price_pence
+        return None
+    
+    return lookup
 
 
 class EnergyOptimizationService:
@@ -49,6 +121,9 @@ class EnergyOptimizationService:
         "pool.braiins.com": {"coin": "BTC", "algo": ALGO_SHA256, "block_reward": 3.125, "block_time": 600},
     }
     
+    # One compiled alternation over the pool domains (first match wins, in dict order)
+    _POOL_RE = re.compile("(" + "|".join(re.escape(domain) for domain in POOL_COINS) + ")")
+    
     @staticmethod
     async def calculate_profitability(
         miner_id: int,
@@ -75,26 +150,26 @@ class EnergyOptimizationService:
         if not miner:
             return {"error": "Miner not found"}
         
-        # Get telemetry
+        # Get latest telemetry in the period (only its pool is needed)
         cutoff = datetime.utcnow() - timedelta(hours=hours)
         result = await db.execute(
-            select(Telemetry)
+            select(Telemetry.pool_in_use)
             .where(Telemetry.miner_id == miner_id)
             .where(Telemetry.timestamp >= cutoff)
             .order_by(Telemetry.timestamp.desc())
+            .limit(1)
         )
-        telemetry_data = result.scalars().all()
+        latest = result.first()
         
-        if not telemetry_data:
+        if not latest:
             return {"error": "No telemetry data"}
         
         # Calculate energy cost
         energy_cost = await EnergyOptimizationService._calculate_energy_cost(
-            miner_id, db, hours, telemetry_data
+            miner_id, db, hours
         )
         
         # Get current pool
-        latest = telemetry_data[0]
         pool_in_use = latest.pool_in_use
         
         if not pool_in_use:
@@ -110,11 +185,8 @@ class EnergyOptimizationService:
             }
         
         # Determine coin being mined
-        coin_info = None
-        for pool_domain, info in EnergyOptimizationService.POOL_COINS.items():
-            if pool_domain in pool_in_use:
-                coin_info = info
-                break
+        match = EnergyOptimizationService._POOL_RE.search(pool_in_use)
+        coin_info = EnergyOptimizationService.POOL_COINS[match.group(1)] if match else None
         
         if not coin_info:
             return {
@@ -129,7 +201,13 @@ class EnergyOptimizationService:
             }
         
         # Calculate expected revenue
-        avg_hashrate = sum(t.hashrate for t in telemetry_data if t.hashrate) / len(telemetry_data)
+        result = await db.execute(
+            select(func.avg(Telemetry.hashrate))
+            .where(Telemetry.miner_id == miner_id)
+            .where(Telemetry.timestamp >= cutoff)
+            .where(Telemetry.hashrate.isnot(None))
+        )
+        avg_hashrate = result.scalar() or 0
         
         # For pool mining (Braiins), use historical rewards if available
         # For solo mining, calculate theoretical earnings
@@ -169,32 +247,21 @@ class EnergyOptimizationService:
     async def _calculate_energy_cost(
         miner_id: int,
         db: AsyncSession,
-        hours: int,
-        telemetry_data: List
+        hours: int
     ) -> float:
         """Calculate energy cost in GBP for given period"""
         region = app_config.get("octopus_agile.region", "H")
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=hours)
         
-        total_cost_pence = 0
-        
-        for telem in telemetry_data:
-            if not telem.power_watts or telem.power_watts <= 0:
-                continue
-            
-            # Find energy price for this timestamp
-            result = await db.execute(
-                select(EnergyPrice)
-                .where(EnergyPrice.region == region)
-                .where(EnergyPrice.valid_from <= telem.timestamp)
-                .where(EnergyPrice.valid_to > telem.timestamp)
-                .limit(1)
-            )
-            price = result.scalar_one_or_none()
-            
-            if price:
-                interval_hours = 30 / 3600  # 30 second telemetry interval
-                energy_kwh = (telem.power_watts / 1000) * interval_hours
-                total_cost_pence += energy_kwh * price.price_pence
+        result = await db.execute(_ENERGY_COST_STMT, {
+            "miner_id": miner_id,
+            "region": region,
+            "now": now,
+            "slot_cutoff": cutoff,
+            "telemetry_cutoff": cutoff
+        })
+        total_cost_pence = result.scalar()
         
         return total_cost_pence / 100  # Convert to GBP
     
@@ -209,11 +276,7 @@ class EnergyOptimizationService:
         end_time = now + timedelta(hours=hours_ahead)
         
         result = await db.execute(
-            select(EnergyPrice)
-            .where(EnergyPrice.region == region)
-            .where(EnergyPrice.valid_from >= now)
-            .where(EnergyPrice.valid_from < end_time)
-            .order_by(EnergyPrice.valid_from)
+            _PRICE_FORECAST_STMT, {"region": region, "now": now, "end_time": end_time}
         )
         prices = result.scalars().all()
         
@@ -250,15 +313,16 @@ class EnergyOptimizationService:
         if not forecast:
             return {"error": "No price forecast available"}
         
-        # Sort by price (cheapest first)
-        sorted_prices = sorted(forecast, key=lambda x: x["price_pence"])
-        
-        # Select cheapest slots
-        recommended_slots = sorted_prices[:target_hours * 2]  # *2 because 30min slots
+        # Cheapest / dearest slots without sorting the whole forecast (*2 because 30min slots)
+        slot_count = target_hours * 2
+        price = itemgetter("price_pence")
+        recommended_slots = heapq.nsmallest(slot_count, forecast, key=price)
+        expensive_slots = heapq.nlargest(slot_count, forecast, key=price)
         
         # Calculate savings
-        avg_expensive = sum(p["price_pence"] for p in sorted_prices[-target_hours * 2:]) / (target_hours * 2)
-        avg_cheap = sum(p["price_pence"] for p in recommended_slots) / len(recommended_slots)
+        avg_expensive = sum(map(price, expensive_slots)) / len(expensive_slots)
+        avg_cheap = sum(map(price, recommended_slots)) / len(recommended_slots)
+        avg_all = sum(map(price, forecast)) / len(forecast)
         savings_percent = ((avg_expensive - avg_cheap) / avg_expensive) * 100 if avg_expensive > 0 else 0
         
         return {
@@ -266,7 +330,7 @@ class EnergyOptimizationService:
             "target_hours": target_hours,
             "recommended_slots": recommended_slots,
             "avg_price_pence": round(avg_cheap, 2),
-            "vs_random_avg": round(sum(p["price_pence"] for p in forecast) / len(forecast), 2),
+            "vs_random_avg": round(avg_all, 2),
             "savings_percent": round(savings_percent, 2)
         }
     
@@ -297,13 +361,7 @@ class EnergyOptimizationService:
         now = datetime.utcnow()
         
         # Get current price
-        result = await db.execute(
-            select(EnergyPrice)
-            .where(EnergyPrice.region == region)
-            .where(EnergyPrice.valid_from <= now)
-            .where(EnergyPrice.valid_to > now)
-            .limit(1)
-        )
+        result = await db.execute(_CURRENT_PRICE_STMT, {"region": region, "now": now})
         current_price = result.scalar_one_or_none()
         
         if not current_price:
@@ -1,12 +1,96 @@
 """
 Health scoring system for miners
 """
+from bisect import bisect_right
 from datetime import datetime, timedelta
+from functools import lru_cache
+from math import sqrt
 from typing import Optional, Dict, Any
-from sqlalchemy import select
+from sqlalchemy import select, func, case, type_coerce, Integer
 from sqlalchemy.ext.asyncio import AsyncSession
+import logging
 
-from core.database import HealthScore, Telemetry, Miner
+from core.database import HealthScore, Telemetry, Miner, bulk_insert
+
+logger = logging.getLogger(__name__)
+
+
+def _aggregate_stmt(*criteria):
+    """
+    Per-miner aggregates the health scores are computed from, one row per miner.
+    
+    Window functions supply what the plain aggregates can't: the gap to the
+    previous sample, the first/last share counters, and the mean hashrate
+    for the deviation term.
+    """
+    # Raw epoch seconds, so the gap is integer subtraction rather than datetimes
+    ts = type_coerce(Telemetry.timestamp, Integer)
+    valid_hashrate = case((Telemetry.hashrate > 0, Telemetry.hashrate))
+    ordered = dict(partition_by=Telemetry.miner_id, order_by=Telemetry.timestamp)
+    whole = dict(ordered, rows=(None, None))
+    
+    windowed = (
+        select(
+            Telemetry.miner_id,
+            Telemetry.temperature,
+            valid_hashrate.label("hashrate"),
+            (ts - func.lag(ts).over(**ordered)).label("gap"),
+            func.avg(valid_hashrate).over(partition_by=Telemetry.miner_id).label("mean_hashrate"),
+            func.first_value(Telemetry.shares_accepted).over(**whole).label("first_accepted"),
+            func.last_value(Telemetry.shares_accepted).over(**whole).label("last_accepted"),
+            func.first_value(Telemetry.shares_rejected).over(**whole).label("first_rejected"),
+            func.last_value(Telemetry.shares_rejected).over(**whole).label("last_rejected"),
+        )
+        .where(*criteria)
+        .subquery()
+    )
+    c = windowed.c
+    deviation = c.hashrate - c.mean_hashrate
+    
+    return (
+        select(
+            c.miner_id,
+            func.count().label("data_points"),
+            func.count(case((c.gap > 60, 1))).label("gaps"),
+            func.count(c.temperature).label("temp_points"),
+            func.avg(c.temperature).label("avg_temp"),
+            func.max(c.temperature).label("max_temp"),
+            func.count(c.hashrate).label("hashrate_points"),
+            func.avg(c.hashrate).label("avg_hashrate"),
+            func.avg(deviation * deviation).label("hashrate_variance"),
+            # Window values are constant per miner; max() just carries them through
+            func.max(c.first_accepted).label("first_accepted"),
+            func.max(c.last_accepted).label("last_accepted"),
+            func.max(c.first_rejected).label("first_rejected"),
+            func.max(c.last_rejected).label("last_rejected"),
+        )
+        .group_by(c.miner_id)
+    )
+
+
+# Temperature scoring per miner family: (band upper bounds, (base, slope) per band,
+# spike limit). In a band the score is base - (temp - band lower bound) * slope.
+_TEMPERATURE_PROFILES = {
+    # Avalon Nano: <70°C = 100, 70-80°C = 90, 80-90°C = 75, 90-95°C = 60, 95+°C = 40
+    "avalon": ((70, 80, 90, 95), ((100, 0), (100, 1), (90, 1.5), (75, 3), (40, 2)), 100),
+    # Bitaxe: <55°C = 100, 55-65°C = 85, 65-70°C = 60, 70+°C = 40
+    "bitaxe": ((55, 65, 70), ((100, 0), (100, 1.5), (85, 5), (40, 2)), 75),
+    # NerdQaxe: <60°C = 100, 60-70°C = 85, 70-75°C = 60, 75+°C = 40
+    "nerdqaxe": ((60, 70, 75), ((100, 0), (100, 1.5), (85, 5), (40, 2)), 80),
+}
+# Generic fallback: <60°C = 100, 60-70°C = 80, 70-80°C = 60, 80+°C = 40
+_GENERIC_TEMPERATURE_PROFILE = ((60, 70, 80), ((100, 0), (100, 2), (80, 2), (40, 1)), 85)
+
+
+@lru_cache(maxsize=64)
+def _temperature_profile(miner_type: Optional[str]):
+    """Temperature profile for a miner type (first family named in it), resolved once per type"""
+    if miner_type:
+        miner_type = miner_type.lower()
+        for family, profile in _TEMPERATURE_PROFILES.items():
+            if family in miner_type:
+                return profile
+    return _GENERIC_TEMPERATURE_PROFILE
 
 
 class HealthScoringService:
@@ -16,41 +100,56 @@ class HealthScoringService:
     async def calculate_health_score(
         miner_id: int,
         db: AsyncSession,
-        hours: int = 24
+        hours: int = 24,
+        now: Optional[datetime] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Calculate comprehensive health score for a miner
         
+        Args:
+            now: End of the scoring period (defaults to the current time); batch
+                callers pass one value so every miner shares the same window
+        
         Returns:
             Dict with scores (0-100) for uptime, temperature, hashrate, reject_rate, and overall
         """
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        cutoff_time = (now or datetime.utcnow()) - timedelta(hours=hours)
         
-        # Get telemetry data
-        result = await db.execute(
-            select(Telemetry)
-            .where(Telemetry.miner_id == miner_id)
-            .where(Telemetry.timestamp >= cutoff_time)
-            .order_by(Telemetry.timestamp.asc())
-        )
-        telemetry_data = result.scalars().all()
+        # Get telemetry aggregates
+        result = await db.execute(_aggregate_stmt(
+            Telemetry.miner_id == miner_id,
+            Telemetry.timestamp >= cutoff_time
+        ))
+        stats = result.first()
         
-        if not telemetry_data:
+        if not stats:
             return None
         
         # Get miner type for temperature threshold
-        result = await db.execute(select(Miner).where(Miner.id == miner_id))
-        miner = result.scalar_one_or_none()
-        miner_type = miner.miner_type if miner else None
+        result = await db.execute(select(Miner.miner_type).where(Miner.id == miner_id))
+        miner_type = result.scalar_one_or_none()
         
+        return HealthScoringService._score_aggregates(stats, miner_type, hours)
+    
+    @staticmethod
+    def _score_aggregates(stats, miner_type: Optional[str], hours: int) -> Dict[str, Any]:
+        """Score one miner from its _aggregate_stmt row over the period"""
         # Calculate individual scores
-        uptime_score = HealthScoringService._calculate_uptime_score(telemetry_data, hours)
-        temperature_score = HealthScoringService._calculate_temperature_score(telemetry_data, miner_type)
-        hashrate_score = HealthScoringService._calculate_hashrate_score(telemetry_data)
-        reject_rate_score = HealthScoringService._calculate_reject_rate_score(telemetry_data)
+        uptime_score = HealthScoringService._calculate_uptime_score(stats.data_points, stats.gaps, hours)
+        temperature_score = HealthScoringService._calculate_temperature_score(
+            stats.avg_temp, stats.max_temp, miner_type
+        )
+        hashrate_score = HealthScoringService._calculate_hashrate_score(
+            stats.hashrate_points, stats.avg_hashrate, stats.hashrate_variance
+        )
+        reject_rate_score = HealthScoringService._calculate_reject_rate_score(
+            stats.data_points,
+            stats.first_accepted, stats.last_accepted,
+            stats.first_rejected, stats.last_rejected
+        )
         
         # Check if temperature data is available (some miners like XMRig may not report it)
-        has_temp_data = any(t.temperature is not None for t in telemetry_data)
+        has_temp_data = stats.temp_points > 0
         
         # Calculate weighted overall score
         # Adjust weights if temperature data is unavailable (XMRig, etc.)
@@ -77,7 +176,7 @@ class HealthScoringService:
             "uptime_score": round(uptime_score, 2),
             "hashrate_score": round(hashrate_score, 2),
             "reject_rate_score": round(reject_rate_score, 2),
-            "data_points": len(telemetry_data),
+            "data_points": stats.data_points,
             "period_hours": hours
         }
         
@@ -88,164 +187,101 @@ class HealthScoringService:
         return result
     
     @staticmethod
-    def _calculate_uptime_score(telemetry_data: list, expected_hours: int) -> float:
+    def _calculate_uptime_score(data_points: int, gaps: int, expected_hours: int) -> float:
         """
         Calculate uptime score based on data availability
         Score: 100 = perfect data coverage, 0 = no data
         """
-        if not telemetry_data:
+        if not data_points:
             return 0.0
         
         # Expected data points (one every 30 seconds)
         expected_points = expected_hours * 120  # 120 points per hour
-        actual_points = len(telemetry_data)
         
         # Calculate coverage percentage
-        coverage = min(actual_points / expected_points, 1.0) * 100
-        
-        # Check for gaps (offline periods)
-        gaps = 0
-        for i in range(1, len(telemetry_data)):
-            time_diff = (telemetry_data[i].timestamp - telemetry_data[i-1].timestamp).seconds
-            if time_diff > 60:  # Gap > 1 minute
-                gaps += 1
+        coverage = min(data_points / expected_points, 1.0) * 100
         
-        # Penalize for gaps
+        # Penalize for gaps (offline periods) > 1 minute
         gap_penalty = min(gaps * 2, 30)  # Max 30 point penalty
         
         return max(coverage - gap_penalty, 0)
     
     @staticmethod
-    def _calculate_temperature_score(telemetry_data: list, miner_type: str = None) -> float:
+    def _calculate_temperature_score(avg_temp: Optional[float], max_temp: Optional[float], miner_type: str = None) -> float:
         """
         Calculate temperature score
         Score: 100 = optimal, decreases as temp increases
         
-        Different thresholds for different miner types:
+        Different thresholds for different miner types (see _TEMPERATURE_PROFILES):
         - Avalon Nano: designed for up to 90°C
         - Others: optimal below 75°C
         
         Returns 100.0 (perfect score) if no temperature data available (XMRig, etc.)
         """
-        temps = [t.temperature for t in telemetry_data if t.temperature is not None]
-        
-        if not temps:
+        if avg_temp is None:
             return 100.0  # Perfect score if no data (don't penalize CPU miners)
         
-        avg_temp = sum(temps) / len(temps)
-        max_temp = max(temps)
-        
-        # Different temperature scales based on miner type
-        if miner_type and 'avalon' in miner_type.lower():
-            # Avalon Nano: <70°C = 100, 70-80°C = 90, 80-90°C = 75, 90-95°C = 60, 95+°C = 40
-            if avg_temp < 70:
-                score = 100
-            elif avg_temp < 80:
-                score = 100 - ((avg_temp - 70) * 1)
-            elif avg_temp < 90:
-                score = 90 - ((avg_temp - 80) * 1.5)
-            elif avg_temp < 95:
-                score = 75 - ((avg_temp - 90) * 3)
-            else:
-                score = max(40 - ((avg_temp - 95) * 2), 0)
-            
-            # Penalize for extreme spikes (>100°C)
-            if max_temp > 100:
-                score = score * 0.8
-        elif miner_type and 'bitaxe' in miner_type.lower():
-            # Bitaxe: <55°C = 100, 55-65°C = 85, 65-70°C = 60, 70+°C = 40
-            if avg_temp < 55:
-                score = 100
-            elif avg_temp < 65:
-                score = 100 - ((avg_temp - 55) * 1.5)
-            elif avg_temp < 70:
-                score = 85 - ((avg_temp - 65) * 5)
-            else:
-                score = max(40 - ((avg_temp - 70) * 2), 0)
-            
-            # Penalize for spikes (>75°C)
-            if max_temp > 75:
-                score = score * 0.8
-        elif miner_type and 'nerdqaxe' in miner_type.lower():
-            # NerdQaxe: <60°C = 100, 60-70°C = 85, 70-75°C = 60, 75+°C = 40
-            if avg_temp < 60:
-                score = 100
-            elif avg_temp < 70:
-                score = 100 - ((avg_temp - 60) * 1.5)
-            elif avg_temp < 75:
-                score = 85 - ((avg_temp - 70) * 5)
-            else:
-                score = max(40 - ((avg_temp - 75) * 2), 0)
-            
-            # Penalize for spikes (>80°C)
-            if max_temp > 80:
-                score = score * 0.8
-        else:
-            # Generic fallback: <60°C = 100, 60-70°C = 80, 70-80°C = 60, 80+°C = 40
-            if avg_temp < 60:
-                score = 100
-            elif avg_temp < 70:
-                score = 100 - ((avg_temp - 60) * 2)
-            elif avg_temp < 80:
-                score = 80 - ((avg_temp - 70) * 2)
-            else:
-                score = max(40 - ((avg_temp - 80) * 1), 0)
-            
-            # Penalize for spikes (>85°C)
-            if max_temp > 85:
-                score = score * 0.8
+        bounds, bands, spike_limit = _temperature_profile(miner_type)
+        
+        # Linear within the band the average falls in
+        band = bisect_right(bounds, avg_temp)
+        base, slope = bands[band]
+        score = base - (avg_temp - bounds[band - 1]) * slope if band else base
+        
+        # Penalize for spikes
+        if max_temp > spike_limit:
+            score = score * 0.8
         
         return max(score, 0)
     
     @staticmethod
-    def _calculate_hashrate_score(telemetry_data: list) -> float:
+    def _calculate_hashrate_score(points: int, avg_hashrate: Optional[float], variance: Optional[float]) -> float:
         """
-        Calculate hashrate stability score
+        Calculate hashrate stability score from the non-zero readings
         Score: 100 = very stable, decreases with variance
         """
-        hashrates = [t.hashrate for t in telemetry_data if t.hashrate is not None and t.hashrate > 0]
-        
-        if len(hashrates) < 5:
+        if points < 5:
             return 50.0  # Neutral if insufficient data
         
-        avg_hashrate = sum(hashrates) / len(hashrates)
-        
-        # Calculate coefficient of variation (CV)
-        variance = sum((h - avg_hashrate) ** 2 for h in hashrates) / len(hashrates)
-        std_dev = variance ** 0.5
-        cv = (std_dev / avg_hashrate) * 100 if avg_hashrate > 0 else 0
+        # Squared coefficient of variation (CV²) in %², compared against squared
+        # thresholds so the sqrt is only taken when the score interpolates on CV
+        variance = max(variance or 0.0, 0.0)
+        cv_sq = variance / (avg_hashrate * avg_hashrate) * 10000 if avg_hashrate > 0 else 0
         
         # Score based on stability
         # CV < 5% = excellent (100), 5-10% = good (80), 10-20% = fair (60), >20% = poor (40)
-        if cv < 5:
+        if cv_sq < 25:
             score = 100
-        elif cv < 10:
-            score = 100 - ((cv - 5) * 4)
-        elif cv < 20:
-            score = 80 - ((cv - 10) * 2)
+        elif cv_sq < 100:
+            score = 100 - ((sqrt(cv_sq) - 5) * 4)
+        elif cv_sq < 400:
+            score = 80 - ((sqrt(cv_sq) - 10) * 2)
         else:
-            score = max(60 - ((cv - 20) * 1), 20)
+            score = max(60 - ((sqrt(cv_sq) - 20) * 1), 20)
         
         return max(score, 0)
     
     @staticmethod
-    def _calculate_reject_rate_score(telemetry_data: list) -> float:
+    def _calculate_reject_rate_score(
+        data_points: int,
+        first_accepted: Optional[int],
+        last_accepted: Optional[int],
+        first_rejected: Optional[int],
+        last_rejected: Optional[int]
+    ) -> float:
         """
-        Calculate reject rate score
+        Calculate reject rate score from the first and last share counters
         Score: 100 = <1%, decreases as reject rate increases
         """
-        # Get first and last telemetry to calculate delta
-        if len(telemetry_data) < 2:
+        if data_points < 2:
             return 100.0  # Assume good if no data
         
-        first = telemetry_data[0]
-        last = telemetry_data[-1]
-        
-        if not first.shares_accepted or not last.shares_accepted:
+        # Missing or zero counters on either end: nothing to compare
+        if not first_accepted or not last_accepted:
             return 100.0
         
-        accepted_delta = last.shares_accepted - first.shares_accepted
-        rejected_delta = (last.shares_rejected or 0) - (first.shares_rejected or 0)
+        accepted_delta = last_accepted - first_accepted
+        rejected_delta = (last_rejected or 0) - (first_rejected or 0)
         
         if accepted_delta <= 0:
             return 100.0
@@ -307,24 +343,42 @@ async def record_health_scores(db: AsyncSession):
     result = await db.execute(select(Miner).where(Miner.enabled == True))
     miners = result.scalars().all()
     
+    if not miners:
+        return
+    
+    # All miners' aggregates for the period in one grouped query; one clock
+    # read gives the window and the timestamp every score is recorded with
+    hours = 24
+    now = datetime.utcnow()
+    cutoff_time = now - timedelta(hours=hours)
+    result = await db.execute(_aggregate_stmt(
+        Telemetry.miner_id.in_([miner.id for miner in miners]),
+        Telemetry.timestamp >= cutoff_time
+    ))
+    stats_by_miner = {row.miner_id: row for row in result.all()}
+    
+    rows = []
     for miner in miners:
         try:
-            score_data = await HealthScoringService.calculate_health_score(miner.id, db, hours=24)
+            stats = stats_by_miner.get(miner.id)
+            if not stats:
+                continue
+            
+            score_data = HealthScoringService._score_aggregates(stats, miner.miner_type, hours)
             
-            if score_data:
-                health_score = HealthScore(
-                    miner_id=miner.id,
-                    timestamp=datetime.utcnow(),
-                    overall_score=score_data["overall_score"],
-                    uptime_score=score_data["uptime_score"],
-                    temperature_score=score_data.get("temperature_score"),  # Optional for XMRig
-                    hashrate_score=score_data["hashrate_score"],
-                    reject_rate_score=score_data["reject_rate_score"],
-                    details={"period_hours": 24, "data_points": score_data["data_points"]}
-                )
-                db.add(health_score)
-        
-        except Exception as e:
-            print(f"❌ Failed to calculate health score for {miner.name}: {e}")
+            rows.append({
+                "miner_id": miner.id,
+                "timestamp": now,
+                "overall_score": score_data["overall_score"],
+                "uptime_score": score_data["uptime_score"],
+                "temperature_score": score_data.get("temperature_score"),  # Optional for XMRig
+                "hashrate_score": score_data["hashrate_score"],
+                "reject_rate_score": score_data["reject_rate_score"],
+                "details": {"period_hours": hours, "data_points": score_data["data_points"]}
+            })
+        
+        except Exception:
+            logger.warning("❌ Failed to calculate health score for %s (miner_id=%s)", miner.name, miner.id, exc_info=True)
     
+    await bulk_insert(db, HealthScore, rows)
     await db.commit()
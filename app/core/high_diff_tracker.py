@@ -1,21 +1,54 @@
 """
 High difficulty share tracking for leaderboard
 """
-from sqlalchemy import select, delete
+from sqlalchemy import select, insert, delete, update, func, and_, exists, lambda_stmt
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
+import asyncio
 import logging
+import time
 import aiohttp
 
 from core.database import HighDiffShare, BlockFound, Miner, AsyncSessionLocal, AlertConfig
 
 logger = logging.getLogger(__name__)
 
-# Cache network difficulties (TTL: 10 minutes)
-_network_diff_cache = {}
+# Solopool stats endpoint per coin
+DIFFICULTY_URLS = {
+    "BTC": "https://btc.solopool.org/api/stats",
+    "BCH": "https://bch.solopool.org/api/stats",
+    "BC2": "https://bc2.solopool.org/api/stats",
+    "DGB": "https://dgb-sha.solopool.org/api/stats",
+}
+
+# Cache network difficulties per 10-minute time bucket: coin -> (bucket, difficulty)
+_network_diff_cache: Dict[str, Tuple[int, float]] = {}
 _cache_ttl = 600  # seconds
 
+# Shared HTTP session for difficulty lookups (created lazily on the running loop)
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Return the shared session so repeat lookups reuse keep-alive TLS connections"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=5),
+            connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+        )
+    return _session
+
+
+async def close_session():
+    """Close the shared difficulty lookup session (app shutdown)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
 
 async def _send_block_found_notification(
     miner_name: str,
@@ -61,90 +94,126 @@ async def _send_block_found_notification(
         logger.error(f"Failed to send block found notification: {e}")
 
 
+async def _fetch_network_difficulty(coin: str) -> Optional[float]:
+    """Query the coin's Solopool stats API; None for unknown coins or bad responses"""
+    url = DIFFICULTY_URLS.get(coin)
+    if not url:
+        return None
+    
+    async with _get_session().get(url) as resp:
+        if resp.status != 200:
+            return None
+        data = await resp.json()
+    
+    diff = float(data.get("stats", {}).get("difficulty", 0))
+    return diff if diff > 0 else None
+
+
 async def get_network_difficulty(coin: str, force_fresh: bool = False) -> Optional[float]:
     """
     Fetch current network difficulty from blockchain APIs
     
     Args:
-        coin: BTC, BCH, or DGB
+        coin: BTC, BCH, BC2 or DGB
+        force_fresh: Skip the cache (the fresh value still replaces it)
     
     Returns:
         Network difficulty or None if unavailable
     """
     coin = coin.upper()
     
-    # Check cache first (unless force_fresh)
-    now = datetime.utcnow().timestamp()
-    if not force_fresh and coin in _network_diff_cache:
-        cached_diff, cache_time = _network_diff_cache[coin]
-        if now - cache_time < _cache_ttl:
-            return cached_diff
+    # Cached value is good until the 10-minute bucket rolls over
+    bucket = int(time.time()) // _cache_ttl
+    cached = _network_diff_cache.get(coin)
+    if not force_fresh and cached and cached[0] == bucket:
+        return cached[1]
     
     try:
-        async with aiohttp.ClientSession() as session:
-            if coin == "BTC":
-                # Use Solopool.org BTC API
-                async with session.get("https://btc.solopool.org/api/stats", timeout=5) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        diff = float(data.get("stats", {}).get("difficulty", 0))
-                        if diff > 0:
-                            _network_diff_cache[coin] = (diff, now)
-                            return diff
-            
-            elif coin == "BCH":
-                # Use Solopool.org BCH API
-                async with session.get("https://bch.solopool.org/api/stats", timeout=5) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        diff = float(data.get("stats", {}).get("difficulty", 0))
-                        if diff > 0:
-                            _network_diff_cache[coin] = (diff, now)
-                            return diff
-            
-            elif coin == "BC2":
-                # Use Solopool.org BC2 API
-                async with session.get("https://bc2.solopool.org/api/stats", timeout=5) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        diff = float(data.get("stats", {}).get("difficulty", 0))
-                        if diff > 0:
-                            _network_diff_cache[coin] = (diff, now)
-                            return diff
-            
-            elif coin == "DGB":
-                # Use Solopool.org DGB API
-                async with session.get("https://dgb-sha.solopool.org/api/stats", timeout=5) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        diff = float(data.get("stats", {}).get("difficulty", 0))
-                        if diff > 0:
-                            _network_diff_cache[coin] = (diff, now)
-                            return diff
-    
+        diff = await _fetch_network_difficulty(coin)
     except Exception as e:
         logger.warning(f"Failed to fetch network difficulty for {coin}: {e}")
+        return None
     
-    return None
+    # Failed lookups are not cached so the next call retries
+    if diff:
+        _network_diff_cache[coin] = (bucket, diff)
+    return diff
+
+
+# Telemetry extra_data key holding each miner type's best difficulty
+BEST_DIFF_KEYS = {
+    "bitaxe": "best_session_diff",
+    "nerdqaxe": "best_session_diff",
+    "avalon_nano": "best_share",
+    "nmminer": "best_share_diff",
+}
+
+
+def parse_difficulty(value) -> Optional[float]:
+    """
+    Parse a difficulty value that may carry a unit suffix (e.g. "130.46 k" = 130460)
+    
+    Raises ValueError/TypeError for unparseable values
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    
+    # Handle string values with unit suffixes
+    value_str = str(value).strip().lower()
+    multipliers = {
+        'k': 1_000,
+        'm': 1_000_000,
+        'g': 1_000_000_000,
+        't': 1_000_000_000_000
+    }
+    
+    for suffix, multiplier in multipliers.items():
+        if suffix in value_str:
+            # Extract numeric part and multiply
+            num_str = value_str.replace(suffix, '').strip()
+            return float(num_str) * multiplier
+    
+    # No suffix, just convert to float
+    return float(value_str)
+
+
+def extract_best_diff(miner_type: str, extra_data: Optional[dict]) -> Optional[float]:
+    """Parsed best difficulty from telemetry extra_data, or None if absent/unparseable"""
+    key = BEST_DIFF_KEYS.get(miner_type)
+    if not key or not extra_data:
+        return None
+    try:
+        return parse_difficulty(extra_data.get(key))
+    except (ValueError, TypeError):
+        return None
+
+
+# Pool name keywords per coin, in priority order: the first coin with any keyword
+# in the name wins. "BITCOIN CASH" / "BITCOIN II" already contain "BITCOIN", so they
+# resolve to BTC.
+_COIN_KEYWORDS = (
+    ("BTC", ("BTC", "BITCOIN", "SHA256")),
+    ("BCH", ("BCH",)),
+    ("BC2", ("BC2",)),
+    ("DGB", ("DGB", "DIGIBYTE")),
+)
 
 
+@lru_cache(maxsize=256)
 def extract_coin_from_pool_name(pool_name: str) -> str:
     """
     Extract coin symbol from pool name
     Examples: "Solopool BTC" → "BTC", "Solopool BCH" → "BCH", "Braiins Pool BTC" → "BTC"
     """
+    # Substring checks in priority order (overlaps like "DGBTC" resolve to BTC);
+    # pool names repeat, so results are cached
     pool_upper = pool_name.upper()
-    
-    if "BTC" in pool_upper or "BITCOIN" in pool_upper or "SHA256" in pool_upper:
-        return "BTC"
-    elif "BCH" in pool_upper or "BITCOIN CASH" in pool_upper:
-        return "BCH"
-    elif "BC2" in pool_upper or "BITCOIN II" in pool_upper:
-        return "BC2"
-    elif "DGB" in pool_upper or "DIGIBYTE" in pool_upper:
-        return "DGB"
-    else:
-        return "BTC"  # Default fallback
+    for coin, keywords in _COIN_KEYWORDS:
+        if any(keyword in pool_upper for keyword in keywords):
+            return coin
+    return "BTC"  # Default fallback
 
 
 async def track_high_diff_share(
@@ -270,19 +339,20 @@ async def track_high_diff_share(
         db.add(event)
     
     # Keep only top 30 shares per miner (prevent infinite growth)
-    # Delete older shares beyond the top 30
-    result = await db.execute(
-        select(HighDiffShare)
+    # One DELETE drops everything outside the top 30 (autoflush writes the new share first)
+    top_shares = (
+        select(HighDiffShare.id)
         .where(HighDiffShare.miner_id == miner_id)
         .order_by(HighDiffShare.difficulty.desc())
+        .limit(30)
+    )
+    await db.execute(
+        delete(HighDiffShare).where(
+            HighDiffShare.miner_id == miner_id,
+            HighDiffShare.id.notin_(top_shares)
+        ),
+        execution_options={"synchronize_session": False}
     )
-    all_shares = result.scalars().all()
-    
-    if len(all_shares) > 30:
-        # Keep top 30, delete the rest
-        shares_to_delete = all_shares[30:]
-        for share in shares_to_delete:
-            await db.delete(share)
     
     await db.commit()
     
@@ -309,12 +379,14 @@ async def get_leaderboard(
     """
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
-    query = select(HighDiffShare).where(HighDiffShare.timestamp >= cutoff_date)
+    # lambda_stmt caches the built statement per call shape; arguments become bound parameters
+    query = lambda_stmt(lambda: select(HighDiffShare).where(HighDiffShare.timestamp >= cutoff_date))
     
     if coin:
-        query = query.where(HighDiffShare.coin == coin.upper())
+        coin = coin.upper()
+        query += lambda s: s.where(HighDiffShare.coin == coin)
     
-    query = query.order_by(HighDiffShare.difficulty.desc()).limit(limit)
+    query += lambda s: s.order_by(HighDiffShare.difficulty.desc()).limit(limit)
     
     result = await db.execute(query)
     return result.scalars().all()
@@ -344,39 +416,52 @@ async def backfill_network_difficulty(db: AsyncSession):
     Backfill network difficulty for existing shares that don't have it
     This allows % of Block calculation for historical shares
     """
-    # Get all shares without network_difficulty
+    # Count shares without network_difficulty, per coin
     result = await db.execute(
-        select(HighDiffShare).where(HighDiffShare.network_difficulty.is_(None))
+        select(HighDiffShare.coin, func.count())
+        .where(HighDiffShare.network_difficulty.is_(None))
+        .group_by(HighDiffShare.coin)
     )
-    shares_to_update = result.scalars().all()
+    pending = dict(result.all())
+    total = sum(pending.values())
     
-    if not shares_to_update:
+    if not total:
         logger.info("✅ All shares already have network difficulty")
         return
     
-    logger.info(f"🔄 Backfilling network difficulty for {len(shares_to_update)} shares...")
+    logger.info(f"🔄 Backfilling network difficulty for {total} shares...")
+    
+    # Fetch current network difficulty once per coin, all coins concurrently
+    coins = list(pending)
+    network_diffs = dict(zip(coins, await asyncio.gather(*(get_network_difficulty(coin) for coin in coins))))
     
+    # Set-based updates per coin instead of one UPDATE per share
     updated_count = 0
-    for share in shares_to_update:
+    for coin, network_diff in network_diffs.items():
+        if not network_diff:
+            continue
         try:
-            # Fetch current network difficulty for this coin
-            network_diff = await get_network_difficulty(share.coin)
+            missing = and_(HighDiffShare.coin == coin, HighDiffShare.network_difficulty.is_(None))
             
-            if network_diff:
-                share.network_difficulty = network_diff
-                
-                # Mark as block solve if share difficulty >= network difficulty
-                # This handles shares that were found before we tracked network difficulty
-                if share.difficulty >= network_diff and not share.was_block_solve:
-                    share.was_block_solve = True
-                    logger.info(f"🏆 Marked share as block solve: {share.miner_name} ({share.coin}) - {share.difficulty:,.0f}")
-                
-                updated_count += 1
+            # Mark as block solve if share difficulty >= network difficulty
+            # This handles shares that were found before we tracked network difficulty
+            result = await db.execute(
+                update(HighDiffShare)
+                .where(missing, HighDiffShare.difficulty >= network_diff, HighDiffShare.was_block_solve == False)
+                .values(was_block_solve=True)
+            )
+            if result.rowcount:
+                logger.info(f"🏆 Marked {result.rowcount} {coin} share(s) as block solves")
+            
+            result = await db.execute(
+                update(HighDiffShare).where(missing).values(network_difficulty=network_diff)
+            )
+            updated_count += result.rowcount
         except Exception as e:
-            logger.warning(f"Failed to backfill network difficulty for share {share.id}: {e}")
+            logger.warning(f"Failed to backfill network difficulty for {coin} shares: {e}")
     
     await db.commit()
-    logger.info(f"✅ Backfilled network difficulty for {updated_count}/{len(shares_to_update)} shares")
+    logger.info(f"✅ Backfilled network difficulty for {updated_count}/{total} shares")
     
     # Sync block solves to blocks_found table
     await sync_block_solves_to_blocks_found(db)
@@ -387,49 +472,43 @@ async def sync_block_solves_to_blocks_found(db: AsyncSession):
     Sync shares marked as block solves to the blocks_found table
     Ensures Coin Hunter leaderboard includes all found blocks
     """
-    # Get all shares marked as block solves
-    result = await db.execute(
-        select(HighDiffShare).where(HighDiffShare.was_block_solve == True)
+    columns = [
+        "miner_id", "miner_name", "miner_type", "coin", "pool_name",
+        "difficulty", "network_difficulty", "hashrate", "hashrate_unit",
+        "miner_mode", "timestamp"
+    ]
+    
+    # One block per (miner, timestamp, difficulty) even if the share was recorded twice
+    first_share_ids = (
+        select(func.min(HighDiffShare.id))
+        .where(HighDiffShare.was_block_solve == True)
+        .group_by(HighDiffShare.miner_id, HighDiffShare.timestamp, HighDiffShare.difficulty)
+    )
+    already_synced = exists().where(
+        BlockFound.miner_id == HighDiffShare.miner_id,
+        BlockFound.timestamp == HighDiffShare.timestamp,
+        BlockFound.difficulty == HighDiffShare.difficulty
     )
-    block_shares = result.scalars().all()
     
-    if not block_shares:
+    # Copy unsynced block solves in a single INSERT ... SELECT
+    stmt = insert(BlockFound).from_select(
+        columns,
+        select(*(getattr(HighDiffShare, column) for column in columns)).where(
+            HighDiffShare.id.in_(first_share_ids),
+            ~already_synced
+        )
+    ).returning(BlockFound.miner_name, BlockFound.coin, BlockFound.difficulty)
+    
+    result = await db.execute(stmt)
+    synced = result.all()
+    await db.commit()
+    
+    if not synced:
         logger.info("✅ No block solves to sync")
         return
     
-    synced_count = 0
-    for share in block_shares:
-        # Check if block already exists in blocks_found
-        existing = await db.execute(
-            select(BlockFound).where(
-                BlockFound.miner_id == share.miner_id,
-                BlockFound.timestamp == share.timestamp,
-                BlockFound.difficulty == share.difficulty
-            )
-        )
-        
-        if existing.scalar_one_or_none():
-            continue  # Already exists
-        
-        # Create BlockFound entry
-        block = BlockFound(
-            miner_id=share.miner_id,
-            miner_name=share.miner_name,
-            miner_type=share.miner_type,
-            coin=share.coin,
-            pool_name=share.pool_name,
-            difficulty=share.difficulty,
-            network_difficulty=share.network_difficulty,
-            block_height=None,
-            block_reward=None,
-            hashrate=share.hashrate,
-            hashrate_unit=share.hashrate_unit,
-            miner_mode=share.miner_mode,
-            timestamp=share.timestamp
-        )
-        db.add(block)
-        synced_count += 1
-        logger.info(f"🏆 Synced block solve to Coin Hunter: {share.miner_name} ({share.coin}) - {share.difficulty:,.0f}")
+    for miner_name, coin, difficulty in synced:
+        logger.info(f"🏆 Synced block solve to Coin Hunter: {miner_name} ({coin}) - {difficulty:,.0f}")
     
-    await db.commit()
+    synced_count = len(synced)
     logger.info(f"✅ Synced {synced_count} block solves to Coin Hunter leaderboard")
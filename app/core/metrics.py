@@ -1,23 +1,37 @@
 """
 Unified Metrics System - Pre-compute and store metrics for fast querying
 """
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, case, lambda_stmt
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from core.database import Metric, Telemetry, Miner, Pool, EnergyPrice, PoolHealth
+from core.database import Metric, Telemetry, TelemetryRollup, Miner, Pool, EnergyPrice, PoolHealth, AsyncReadSession, bulk_insert, prune_old
 from core.config import app_config
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _json_field(field: str, metric=Metric):
+    """SQL expression for one field of value_json (SQLite JSON1); metric may be an alias"""
+    return func.json_extract(metric.value_json, f"$.{field}")
+
+
 class MetricsEngine:
     """Compute and store metrics for fast querying"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
+        # Enabled miners for the current run, loaded once by compute_*_metrics
+        self._enabled_miner_ids: List[int] = []
+    
+    async def _load_enabled_miners(self):
+        """Fetch the enabled miner ids every step of this run works from"""
+        result = await self.db.execute(select(Miner.id).where(Miner.enabled == True))
+        self._enabled_miner_ids = result.scalars().all()
     
     async def compute_hourly_metrics(self, hour: datetime):
         """
@@ -30,19 +44,30 @@ class MetricsEngine:
         
         logger.info(f"📊 Computing hourly metrics for {hour}")
         
-        # Compute per-miner energy costs
-        await self._compute_energy_cost_hourly(hour, hour_end)
+        await self._load_enabled_miners()
+        
+        # Per-miner metrics read the 5-minute telemetry rollup. Rebuild this hour's
+        # buckets from raw telemetry first, so rows that landed after the incremental
+        # refresh had moved past their bucket are counted too
+        from core.aggregation import refresh_telemetry_rollup
+        await refresh_telemetry_rollup(since=hour, until=hour_end)
         
-        # Compute per-miner performance
-        await self._compute_hashrate_hourly(hour, hour_end)
-        await self._compute_temperature_hourly(hour, hour_end)
-        await self._compute_reject_rate_hourly(hour, hour_end)
+        # Per-miner energy/performance and pool health read disjoint data, so
+        # they run concurrently; their rows are written here in one transaction
+        batches = await self._read_concurrently(
+            (MetricsEngine._compute_energy_cost_hourly, hour, hour_end),
+            (MetricsEngine._compute_hashrate_hourly, hour, hour_end),
+            (MetricsEngine._compute_temperature_hourly, hour, hour_end),
+            (MetricsEngine._compute_reject_rate_hourly, hour, hour_end),
+            (MetricsEngine._compute_pool_health_hourly, hour, hour_end)
+        )
         
-        # Compute pool health
-        await self._compute_pool_health_hourly(hour, hour_end)
+        # System-wide aggregates, totalled from the per-miner energy rows in hand
+        energy_metrics = batches[0]
+        batches.append(self._system_energy_metrics("hourly", hour, energy_metrics, digits=4))
         
-        # Compute system-wide aggregates
-        await self._compute_system_energy_hourly(hour, hour_end)
+        for metrics in batches:
+            await bulk_insert(self.db, Metric, metrics)
         
         await self.db.commit()
         logger.info(f"✅ Hourly metrics computed for {hour}")
@@ -58,528 +83,513 @@ class MetricsEngine:
         
         logger.info(f"📊 Computing daily metrics for {date.date()}")
         
+        await self._load_enabled_miners()
+        
         # Aggregate from hourly metrics
-        await self._compute_energy_cost_daily(date, date_end)
+        energy_metrics = await self._compute_energy_cost_daily(date, date_end)
+        await bulk_insert(self.db, Metric, energy_metrics)
         await self._compute_hashrate_daily(date, date_end)
         await self._compute_temperature_daily(date, date_end)
         await self._compute_reject_rate_daily(date, date_end)
         await self._compute_uptime_daily(date, date_end)
         
-        # System-wide aggregates
-        await self._compute_system_energy_daily(date, date_end)
+        # System-wide aggregates, totalled from the per-miner energy rows in hand
+        await bulk_insert(self.db, Metric, self._system_energy_metrics("daily", date, energy_metrics, digits=2))
         
         await self.db.commit()
         logger.info(f"✅ Daily metrics computed for {date.date()}")
     
+    async def _read_concurrently(self, *computations) -> List[List[Dict[str, Any]]]:
+        """
+        Run (compute_fn, *args) readers at once and return their metric rows.
+        
+        Each gets its own read-only session since an AsyncSession can't be shared
+        between concurrent tasks; nothing is written until the caller inserts.
+        """
+        async def run(compute, *args):
+            async with AsyncReadSession() as read_db:
+                reader = MetricsEngine(read_db)
+                reader._enabled_miner_ids = self._enabled_miner_ids
+                return await compute(reader, *args)
+        
+        return await asyncio.gather(*(run(compute, *args) for compute, *args in computations))
+    
+    async def _rollup_hourly(self, metric_type: str, date_start: datetime, date_end: datetime, *columns):
+        """
+        One row per enabled miner aggregating its hourly metrics of this type over the day.
+        
+        Rows carry entity_id, hours (number of hourly metrics) and the given columns.
+        """
+        result = await self.db.execute(
+            select(Metric.entity_id, func.count().label("hours"), *columns)
+            .where(Metric.metric_type == metric_type)
+            .where(Metric.entity_type == "miner")
+            .where(Metric.entity_id.in_(self._enabled_miner_ids))
+            .where(Metric.period == "hourly")
+            .where(Metric.timestamp >= date_start)
+            .where(Metric.timestamp < date_end)
+            .group_by(Metric.entity_id)
+        )
+        return result.all()
+    
     # Energy Cost Metrics
     
-    async def _compute_energy_cost_hourly(self, hour_start: datetime, hour_end: datetime):
+    async def _compute_energy_cost_hourly(self, hour_start: datetime, hour_end: datetime) -> List[Dict[str, Any]]:
         """Compute hourly energy costs per miner"""
+        metrics = []
         region = app_config.get("octopus_agile.region", "H")
         
-        # Get all enabled miners
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
-        )
-        miners = miners_result.scalars().all()
-        
-        # Fetch all prices for this hour once
-        prices_result = await self.db.execute(
-            select(EnergyPrice)
-            .where(EnergyPrice.region == region)
-            .where(EnergyPrice.valid_from >= hour_start)
-            .where(EnergyPrice.valid_from < hour_end)
-        )
-        prices = {p.valid_from: p.price_pence for p in prices_result.scalars().all()}
-        
-        for miner in miners:
-            # Get telemetry for this miner in this hour
-            telemetry_result = await self.db.execute(
-                select(Telemetry)
-                .where(Telemetry.miner_id == miner.id)
-                .where(Telemetry.timestamp >= hour_start)
-                .where(Telemetry.timestamp < hour_end)
-                .where(Telemetry.power_watts.isnot(None))
+        # Each 5-minute rollup bucket lies inside one half-hour price slot, so
+        # buckets are priced as a whole (equality join on the slot start stored
+        # at rollup time): bucket kWh is its summed power times the 30s sample
+        # interval. Outer join keeps unpriced buckets in the record count; they
+        # add no kWh or cost.
+        interval_hours = 30 / 3600  # 30 seconds
+        rollup = TelemetryRollup
+        priced = EnergyPrice.price_pence != 0
+        energy_kwh = case((priced, rollup.avg_power_watts * rollup.power_samples / 1000.0 * interval_hours))
+        
+        result = await self.db.execute(
+            select(
+                rollup.miner_id,
+                func.sum(energy_kwh).label("kwh"),
+                func.sum(energy_kwh * EnergyPrice.price_pence).label("cost_pence"),
+                (
+                    func.sum(case((priced, EnergyPrice.price_pence * rollup.powered_samples)))
+                    / func.sum(case((priced, rollup.powered_samples)))
+                ).label("avg_price_pence"),
+                func.sum(rollup.power_samples).label("records")
             )
-            telemetry = telemetry_result.scalars().all()
-            
-            if not telemetry:
-                continue
-            
-            # Calculate cost
-            total_cost_pence = 0
-            total_kwh = 0
-            price_sum = 0
-            price_count = 0
-            
-            for telem in telemetry:
-                # Find price for this timestamp
-                price_pence = None
-                for valid_from, pence in prices.items():
-                    if valid_from <= telem.timestamp < valid_from + timedelta(minutes=30):
-                        price_pence = pence
-                        break
-                
-                if price_pence and telem.power_watts:
-                    interval_hours = 30 / 3600  # 30 seconds
-                    energy_kwh = (telem.power_watts / 1000) * interval_hours
-                    total_cost_pence += energy_kwh * price_pence
-                    total_kwh += energy_kwh
-                    price_sum += price_pence
-                    price_count += 1
-            
-            if total_kwh > 0:
+            .select_from(rollup)
+            .outerjoin(EnergyPrice, and_(
+                EnergyPrice.region == region,
+                EnergyPrice.valid_from == rollup.price_bucket
+            ))
+            .where(rollup.miner_id.in_(self._enabled_miner_ids))
+            .where(rollup.bucket_start >= hour_start)
+            .where(rollup.bucket_start < hour_end)
+            .where(rollup.power_samples > 0)
+            .group_by(rollup.miner_id)
+        )
+        
+        for row in result.all():
+            if row.kwh and row.kwh > 0:
                 # Store metric
-                metric = Metric(
-                    metric_type="energy_cost",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="hourly",
-                    timestamp=hour_start,
-                    value_json={
-                        "kwh": round(total_kwh, 4),
-                        "cost_pence": round(total_cost_pence, 2),
-                        "cost_gbp": round(total_cost_pence / 100, 4),
-                        "avg_price_pence": round(price_sum / price_count, 2) if price_count > 0 else 0,
-                        "records": len(telemetry)
-                    }
-                )
-                self.db.add(metric)
+                metrics.append({
+                    "metric_type": "energy_cost",
+                    "entity_type": "miner",
+                    "entity_id": row.miner_id,
+                    "period": "hourly",
+                    "timestamp": hour_start,
+                    "value_json": {
+                        "kwh": round(row.kwh, 4),
+                        "cost_pence": round(row.cost_pence, 2),
+                        "cost_gbp": round(row.cost_pence / 100, 4),
+                        "avg_price_pence": round(row.avg_price_pence, 2),
+                        "records": row.records
+                    },
+                    "kwh": row.kwh,
+                    "cost_pence": row.cost_pence,
+                    "avg_price_pence": row.avg_price_pence,
+                    "sample_count": row.records
+                })
+        
+        return metrics
     
-    async def _compute_system_energy_hourly(self, hour_start: datetime, hour_end: datetime):
-        """Compute system-wide energy costs for this hour"""
-        # Aggregate from per-miner hourly metrics
-        result = await self.db.execute(
-            select(Metric)
-            .where(Metric.metric_type == "energy_cost")
-            .where(Metric.entity_type == "miner")
-            .where(Metric.period == "hourly")
-            .where(Metric.timestamp == hour_start)
-        )
-        miner_metrics = result.scalars().all()
+    def _system_energy_metrics(
+        self, period: str, timestamp: datetime, miner_metrics: List[Dict[str, Any]], digits: int
+    ) -> List[Dict[str, Any]]:
+        """System-wide energy cost row summed from this run's per-miner energy rows (none if empty)"""
+        if not miner_metrics:
+            return []
         
-        if miner_metrics:
-            total_kwh = sum(m.value_json["kwh"] for m in miner_metrics)
-            total_cost_pence = sum(m.value_json["cost_pence"] for m in miner_metrics)
-            
-            metric = Metric(
-                metric_type="energy_cost",
-                entity_type="system",
-                entity_id=None,
-                period="hourly",
-                timestamp=hour_start,
-                value_json={
-                    "total_kwh": round(total_kwh, 4),
-                    "total_cost_gbp": round(total_cost_pence / 100, 4),
-                    "miner_count": len(miner_metrics)
-                }
-            )
-            self.db.add(metric)
+        total_kwh = sum(m["kwh"] for m in miner_metrics)
+        total_cost_pence = sum(m["cost_pence"] for m in miner_metrics)
+        
+        return [{
+            "metric_type": "energy_cost",
+            "entity_type": "system",
+            "entity_id": None,
+            "period": period,
+            "timestamp": timestamp,
+            "value_json": {
+                "total_kwh": round(total_kwh, digits),
+                "total_cost_gbp": round(total_cost_pence / 100, digits),
+                "miner_count": len(miner_metrics)
+            },
+            "kwh": total_kwh,
+            "cost_pence": total_cost_pence
+        }]
     
-    async def _compute_energy_cost_daily(self, date_start: datetime, date_end: datetime):
+    async def _compute_energy_cost_daily(self, date_start: datetime, date_end: datetime) -> List[Dict[str, Any]]:
         """Aggregate daily energy costs from hourly metrics"""
+        metrics = []
         # Per-miner daily aggregates
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
-        )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            # Get all hourly metrics for this miner for this day
-            result = await self.db.execute(
-                select(Metric)
-                .where(Metric.metric_type == "energy_cost")
-                .where(Metric.entity_type == "miner")
-                .where(Metric.entity_id == miner.id)
-                .where(Metric.period == "hourly")
-                .where(Metric.timestamp >= date_start)
-                .where(Metric.timestamp < date_end)
-            )
-            hourly_metrics = result.scalars().all()
-            
-            if hourly_metrics:
-                total_kwh = sum(m.value_json["kwh"] for m in hourly_metrics)
-                total_cost_pence = sum(m.value_json["cost_pence"] for m in hourly_metrics)
-                avg_price = sum(m.value_json["avg_price_pence"] for m in hourly_metrics) / len(hourly_metrics)
-                
-                metric = Metric(
-                    metric_type="energy_cost",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="daily",
-                    timestamp=date_start,
-                    value_json={
-                        "kwh": round(total_kwh, 3),
-                        "cost_gbp": round(total_cost_pence / 100, 2),
-                        "avg_price_pence": round(avg_price, 2),
-                        "hours": len(hourly_metrics)
-                    }
-                )
-                self.db.add(metric)
-    
-    async def _compute_system_energy_daily(self, date_start: datetime, date_end: datetime):
-        """Aggregate system-wide daily energy costs"""
-        result = await self.db.execute(
-            select(Metric)
-            .where(Metric.metric_type == "energy_cost")
-            .where(Metric.entity_type == "miner")
-            .where(Metric.period == "daily")
-            .where(Metric.timestamp == date_start)
+        rows = await self._rollup_hourly(
+            "energy_cost", date_start, date_end,
+            func.sum(Metric.kwh).label("kwh"),
+            func.sum(Metric.cost_pence).label("cost_pence"),
+            func.avg(Metric.avg_price_pence).label("avg_price_pence"),
+            func.sum(Metric.sample_count).label("records")
         )
-        miner_metrics = result.scalars().all()
         
-        if miner_metrics:
-            total_kwh = sum(m.value_json["kwh"] for m in miner_metrics)
-            total_cost_gbp = sum(m.value_json["cost_gbp"] for m in miner_metrics)
-            
-            metric = Metric(
-                metric_type="energy_cost",
-                entity_type="system",
-                entity_id=None,
-                period="daily",
-                timestamp=date_start,
-                value_json={
-                    "total_kwh": round(total_kwh, 2),
-                    "total_cost_gbp": round(total_cost_gbp, 2),
-                    "miner_count": len(miner_metrics)
-                }
-            )
-            self.db.add(metric)
+        for row in rows:
+            metrics.append({
+                "metric_type": "energy_cost",
+                "entity_type": "miner",
+                "entity_id": row.entity_id,
+                "period": "daily",
+                "timestamp": date_start,
+                "value_json": {
+                    "kwh": round(row.kwh, 3),
+                    "cost_gbp": round(row.cost_pence / 100, 2),
+                    "avg_price_pence": round(row.avg_price_pence, 2),
+                    "hours": row.hours
+                },
+                "kwh": row.kwh,
+                "cost_pence": row.cost_pence,
+                "avg_price_pence": row.avg_price_pence,
+                "sample_count": row.records
+            })
+        
+        return metrics
     
     # Hashrate Metrics
     
-    async def _compute_hashrate_hourly(self, hour_start: datetime, hour_end: datetime):
+    async def _compute_hashrate_hourly(self, hour_start: datetime, hour_end: datetime) -> List[Dict[str, Any]]:
         """Compute hourly hashrate stats per miner"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
-        )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(
-                    func.avg(Telemetry.hashrate).label("avg"),
-                    func.min(Telemetry.hashrate).label("min"),
-                    func.max(Telemetry.hashrate).label("max"),
-                    func.count(Telemetry.id).label("count"),
-                    Telemetry.hashrate_unit
-                )
-                .where(Telemetry.miner_id == miner.id)
-                .where(Telemetry.timestamp >= hour_start)
-                .where(Telemetry.timestamp < hour_end)
-                .where(Telemetry.hashrate.isnot(None))
-                .group_by(Telemetry.hashrate_unit)
+        metrics = []
+        rollup = TelemetryRollup
+        result = await self.db.execute(
+            select(
+                rollup.miner_id,
+                (
+                    func.sum(rollup.avg_hashrate * rollup.hashrate_samples)
+                    / func.sum(rollup.hashrate_samples)
+                ).label("avg"),
+                func.min(rollup.min_hashrate).label("min"),
+                func.max(rollup.max_hashrate).label("max"),
+                func.sum(rollup.hashrate_samples).label("count"),
+                rollup.hashrate_unit
             )
-            row = result.first()
+            .where(rollup.miner_id.in_(self._enabled_miner_ids))
+            .where(rollup.bucket_start >= hour_start)
+            .where(rollup.bucket_start < hour_end)
+            .where(rollup.hashrate_samples > 0)
+            .group_by(rollup.miner_id, rollup.hashrate_unit)
+        )
+        
+        seen = set()
+        for row in result.all():
+            # One metric per miner: first unit group wins if the unit changed mid-hour
+            if row.miner_id in seen or row.count == 0:
+                continue
+            seen.add(row.miner_id)
             
-            if row and row.count > 0:
-                metric = Metric(
-                    metric_type="hashrate",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="hourly",
-                    timestamp=hour_start,
-                    value_json={
-                        "avg": round(row.avg, 2),
-                        "min": round(row.min, 2),
-                        "max": round(row.max, 2),
-                        "unit": row.hashrate_unit,
-                        "records": row.count
-                    }
-                )
-                self.db.add(metric)
+            metrics.append({
+                "metric_type": "hashrate",
+                "entity_type": "miner",
+                "entity_id": row.miner_id,
+                "period": "hourly",
+                "timestamp": hour_start,
+                "value_json": {
+                    "avg": round(row.avg, 2),
+                    "min": round(row.min, 2),
+                    "max": round(row.max, 2),
+                    "unit": row.hashrate_unit,
+                    "records": row.count
+                },
+                "value_avg": row.avg,
+                "value_min": row.min,
+                "value_max": row.max,
+                "sample_count": row.count
+            })
+        
+        return metrics
     
     async def _compute_hashrate_daily(self, date_start: datetime, date_end: datetime):
         """Aggregate daily hashrate from hourly metrics"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
+        metrics = []
+        # Unit reported by the miner's first hourly metric of the day
+        first_hour = aliased(Metric)
+        first_unit = (
+            select(_json_field("unit", first_hour))
+            .where(first_hour.metric_type == "hashrate")
+            .where(first_hour.entity_type == "miner")
+            .where(first_hour.entity_id == Metric.entity_id)
+            .where(first_hour.period == "hourly")
+            .where(first_hour.timestamp >= date_start)
+            .where(first_hour.timestamp < date_end)
+            .order_by(first_hour.timestamp)
+            .limit(1)
+            .scalar_subquery()
         )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(Metric)
-                .where(Metric.metric_type == "hashrate")
-                .where(Metric.entity_type == "miner")
-                .where(Metric.entity_id == miner.id)
-                .where(Metric.period == "hourly")
-                .where(Metric.timestamp >= date_start)
-                .where(Metric.timestamp < date_end)
-            )
-            hourly_metrics = result.scalars().all()
-            
-            if hourly_metrics:
-                avg_hashrate = sum(m.value_json["avg"] for m in hourly_metrics) / len(hourly_metrics)
-                min_hashrate = min(m.value_json["min"] for m in hourly_metrics)
-                max_hashrate = max(m.value_json["max"] for m in hourly_metrics)
-                unit = hourly_metrics[0].value_json["unit"]
-                
-                metric = Metric(
-                    metric_type="hashrate",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="daily",
-                    timestamp=date_start,
-                    value_json={
-                        "avg": round(avg_hashrate, 2),
-                        "min": round(min_hashrate, 2),
-                        "max": round(max_hashrate, 2),
-                        "unit": unit,
-                        "hours": len(hourly_metrics)
-                    }
-                )
-                self.db.add(metric)
+        
+        rows = await self._rollup_hourly(
+            "hashrate", date_start, date_end,
+            func.avg(Metric.value_avg).label("avg"),
+            func.min(Metric.value_min).label("min"),
+            func.max(Metric.value_max).label("max"),
+            func.sum(Metric.sample_count).label("records"),
+            first_unit.label("unit")
+        )
+        
+        for row in rows:
+            metrics.append({
+                "metric_type": "hashrate",
+                "entity_type": "miner",
+                "entity_id": row.entity_id,
+                "period": "daily",
+                "timestamp": date_start,
+                "value_json": {
+                    "avg": round(row.avg, 2),
+                    "min": round(row.min, 2),
+                    "max": round(row.max, 2),
+                    "unit": row.unit,
+                    "hours": row.hours
+                },
+                "value_avg": row.avg,
+                "value_min": row.min,
+                "value_max": row.max,
+                "sample_count": row.records
+            })
+        
+        await bulk_insert(self.db, Metric, metrics)
     
     # Temperature Metrics
     
-    async def _compute_temperature_hourly(self, hour_start: datetime, hour_end: datetime):
+    async def _compute_temperature_hourly(self, hour_start: datetime, hour_end: datetime) -> List[Dict[str, Any]]:
         """Compute hourly temperature stats per miner"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
-        )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(
-                    func.avg(Telemetry.temperature).label("avg"),
-                    func.min(Telemetry.temperature).label("min"),
-                    func.max(Telemetry.temperature).label("max"),
-                    func.count(Telemetry.id).label("count")
-                )
-                .where(Telemetry.miner_id == miner.id)
-                .where(Telemetry.timestamp >= hour_start)
-                .where(Telemetry.timestamp < hour_end)
-                .where(Telemetry.temperature.isnot(None))
+        metrics = []
+        rollup = TelemetryRollup
+        result = await self.db.execute(
+            select(
+                rollup.miner_id,
+                (
+                    func.sum(rollup.avg_temperature * rollup.temperature_samples)
+                    / func.sum(rollup.temperature_samples)
+                ).label("avg"),
+                func.min(rollup.min_temperature).label("min"),
+                func.max(rollup.max_temperature).label("max"),
+                func.sum(rollup.temperature_samples).label("count")
             )
-            row = result.first()
-            
-            if row and row.count > 0:
-                metric = Metric(
-                    metric_type="temperature",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="hourly",
-                    timestamp=hour_start,
-                    value_json={
+            .where(rollup.miner_id.in_(self._enabled_miner_ids))
+            .where(rollup.bucket_start >= hour_start)
+            .where(rollup.bucket_start < hour_end)
+            .where(rollup.temperature_samples > 0)
+            .group_by(rollup.miner_id)
+        )
+        
+        for row in result.all():
+            if row.count > 0:
+                metrics.append({
+                    "metric_type": "temperature",
+                    "entity_type": "miner",
+                    "entity_id": row.miner_id,
+                    "period": "hourly",
+                    "timestamp": hour_start,
+                    "value_json": {
                         "avg": round(row.avg, 1),
                         "min": round(row.min, 1),
                         "max": round(row.max, 1),
                         "records": row.count
-                    }
-                )
-                self.db.add(metric)
+                    },
+                    "value_avg": row.avg,
+                    "value_min": row.min,
+                    "value_max": row.max,
+                    "sample_count": row.count
+                })
+        
+        return metrics
     
     async def _compute_temperature_daily(self, date_start: datetime, date_end: datetime):
         """Aggregate daily temperature from hourly metrics"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
+        metrics = []
+        rows = await self._rollup_hourly(
+            "temperature", date_start, date_end,
+            func.avg(Metric.value_avg).label("avg"),
+            func.min(Metric.value_min).label("min"),
+            func.max(Metric.value_max).label("max"),
+            func.sum(Metric.sample_count).label("records")
         )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(Metric)
-                .where(Metric.metric_type == "temperature")
-                .where(Metric.entity_type == "miner")
-                .where(Metric.entity_id == miner.id)
-                .where(Metric.period == "hourly")
-                .where(Metric.timestamp >= date_start)
-                .where(Metric.timestamp < date_end)
-            )
-            hourly_metrics = result.scalars().all()
-            
-            if hourly_metrics:
-                avg_temp = sum(m.value_json["avg"] for m in hourly_metrics) / len(hourly_metrics)
-                min_temp = min(m.value_json["min"] for m in hourly_metrics)
-                max_temp = max(m.value_json["max"] for m in hourly_metrics)
-                
-                metric = Metric(
-                    metric_type="temperature",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="daily",
-                    timestamp=date_start,
-                    value_json={
-                        "avg": round(avg_temp, 1),
-                        "min": round(min_temp, 1),
-                        "max": round(max_temp, 1),
-                        "hours": len(hourly_metrics)
-                    }
-                )
-                self.db.add(metric)
+        
+        for row in rows:
+            metrics.append({
+                "metric_type": "temperature",
+                "entity_type": "miner",
+                "entity_id": row.entity_id,
+                "period": "daily",
+                "timestamp": date_start,
+                "value_json": {
+                    "avg": round(row.avg, 1),
+                    "min": round(row.min, 1),
+                    "max": round(row.max, 1),
+                    "hours": row.hours
+                },
+                "value_avg": row.avg,
+                "value_min": row.min,
+                "value_max": row.max,
+                "sample_count": row.records
+            })
+        
+        await bulk_insert(self.db, Metric, metrics)
     
     # Reject Rate Metrics
     
-    async def _compute_reject_rate_hourly(self, hour_start: datetime, hour_end: datetime):
+    async def _compute_reject_rate_hourly(self, hour_start: datetime, hour_end: datetime) -> List[Dict[str, Any]]:
         """Compute hourly reject rate per miner"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
-        )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(
-                    func.sum(Telemetry.shares_accepted).label("accepted"),
-                    func.sum(Telemetry.shares_rejected).label("rejected")
-                )
-                .where(Telemetry.miner_id == miner.id)
-                .where(Telemetry.timestamp >= hour_start)
-                .where(Telemetry.timestamp < hour_end)
+        metrics = []
+        result = await self.db.execute(
+            select(
+                TelemetryRollup.miner_id,
+                func.sum(TelemetryRollup.shares_accepted).label("accepted"),
+                func.sum(TelemetryRollup.shares_rejected).label("rejected")
             )
-            row = result.first()
-            
-            if row and row.accepted:
+            .where(TelemetryRollup.miner_id.in_(self._enabled_miner_ids))
+            .where(TelemetryRollup.bucket_start >= hour_start)
+            .where(TelemetryRollup.bucket_start < hour_end)
+            .group_by(TelemetryRollup.miner_id)
+        )
+        
+        for row in result.all():
+            if row.accepted:
                 total_shares = (row.accepted or 0) + (row.rejected or 0)
-                reject_rate = (row.rejected / total_shares * 100) if total_shares > 0 else 0
+                reject_rate = ((row.rejected or 0) / total_shares * 100) if total_shares > 0 else 0
                 
-                metric = Metric(
-                    metric_type="reject_rate",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="hourly",
-                    timestamp=hour_start,
-                    value_json={
+                metrics.append({
+                    "metric_type": "reject_rate",
+                    "entity_type": "miner",
+                    "entity_id": row.miner_id,
+                    "period": "hourly",
+                    "timestamp": hour_start,
+                    "value_json": {
                         "reject_rate": round(reject_rate, 2),
                         "shares_accepted": row.accepted or 0,
                         "shares_rejected": row.rejected or 0
-                    }
-                )
-                self.db.add(metric)
+                    },
+                    "shares_accepted": row.accepted or 0,
+                    "shares_rejected": row.rejected or 0
+                })
+        
+        return metrics
     
     async def _compute_reject_rate_daily(self, date_start: datetime, date_end: datetime):
         """Aggregate daily reject rate from hourly metrics"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
+        metrics = []
+        rows = await self._rollup_hourly(
+            "reject_rate", date_start, date_end,
+            func.sum(Metric.shares_accepted).label("accepted"),
+            func.sum(Metric.shares_rejected).label("rejected")
         )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(Metric)
-                .where(Metric.metric_type == "reject_rate")
-                .where(Metric.entity_type == "miner")
-                .where(Metric.entity_id == miner.id)
-                .where(Metric.period == "hourly")
-                .where(Metric.timestamp >= date_start)
-                .where(Metric.timestamp < date_end)
-            )
-            hourly_metrics = result.scalars().all()
+        
+        for row in rows:
+            total_shares = row.accepted + row.rejected
+            reject_rate = (row.rejected / total_shares * 100) if total_shares > 0 else 0
             
-            if hourly_metrics:
-                total_accepted = sum(m.value_json["shares_accepted"] for m in hourly_metrics)
-                total_rejected = sum(m.value_json["shares_rejected"] for m in hourly_metrics)
-                total_shares = total_accepted + total_rejected
-                reject_rate = (total_rejected / total_shares * 100) if total_shares > 0 else 0
-                
-                metric = Metric(
-                    metric_type="reject_rate",
-                    entity_type="miner",
-                    entity_id=miner.id,
-                    period="daily",
-                    timestamp=date_start,
-                    value_json={
-                        "reject_rate": round(reject_rate, 2),
-                        "shares_accepted": total_accepted,
-                        "shares_rejected": total_rejected
-                    }
-                )
-                self.db.add(metric)
+            metrics.append({
+                "metric_type": "reject_rate",
+                "entity_type": "miner",
+                "entity_id": row.entity_id,
+                "period": "daily",
+                "timestamp": date_start,
+                "value_json": {
+                    "reject_rate": round(reject_rate, 2),
+                    "shares_accepted": row.accepted,
+                    "shares_rejected": row.rejected
+                },
+                "shares_accepted": row.accepted,
+                "shares_rejected": row.rejected
+            })
+        
+        await bulk_insert(self.db, Metric, metrics)
     
     # Pool Health Metrics
     
-    async def _compute_pool_health_hourly(self, hour_start: datetime, hour_end: datetime):
+    async def _compute_pool_health_hourly(self, hour_start: datetime, hour_end: datetime) -> List[Dict[str, Any]]:
         """Compute hourly pool health averages"""
-        pools_result = await self.db.execute(
-            select(Pool).where(Pool.enabled == True)
-        )
-        pools = pools_result.scalars().all()
-        
-        for pool in pools:
-            result = await self.db.execute(
-                select(
-                    func.avg(PoolHealth.health_score).label("avg_score"),
-                    func.avg(PoolHealth.response_time_ms).label("avg_response"),
-                    func.avg(PoolHealth.reject_rate).label("avg_reject"),
-                    func.count(PoolHealth.id).label("count")
-                )
-                .where(PoolHealth.pool_id == pool.id)
-                .where(PoolHealth.timestamp >= hour_start)
-                .where(PoolHealth.timestamp < hour_end)
+        metrics = []
+        # One grouped query across all enabled pools
+        result = await self.db.execute(
+            select(
+                PoolHealth.pool_id,
+                func.avg(PoolHealth.health_score).label("avg_score"),
+                func.avg(PoolHealth.response_time_ms).label("avg_response"),
+                func.avg(PoolHealth.reject_rate).label("avg_reject"),
+                func.count(PoolHealth.id).label("count")
             )
-            row = result.first()
-            
-            if row and row.count > 0:
-                metric = Metric(
-                    metric_type="pool_health",
-                    entity_type="pool",
-                    entity_id=pool.id,
-                    period="hourly",
-                    timestamp=hour_start,
-                    value_json={
+            .where(PoolHealth.pool_id.in_(select(Pool.id).where(Pool.enabled == True)))
+            .where(PoolHealth.timestamp >= hour_start)
+            .where(PoolHealth.timestamp < hour_end)
+            .group_by(PoolHealth.pool_id)
+        )
+        
+        for row in result.all():
+            if row.count > 0:
+                metrics.append({
+                    "metric_type": "pool_health",
+                    "entity_type": "pool",
+                    "entity_id": row.pool_id,
+                    "period": "hourly",
+                    "timestamp": hour_start,
+                    "value_json": {
                         "health_score": round(row.avg_score, 1) if row.avg_score is not None else 0,
                         "response_time_ms": round(row.avg_response, 1) if row.avg_response is not None else 0,
                         "reject_rate": round(row.avg_reject, 2) if row.avg_reject is not None else 0,
                         "checks": row.count
                     }
-                )
-                self.db.add(metric)
+                })
+        
+        return metrics
     
     # Uptime Metrics
     
     async def _compute_uptime_daily(self, date_start: datetime, date_end: datetime):
         """Compute daily uptime per miner"""
-        miners_result = await self.db.execute(
-            select(Miner).where(Miner.enabled == True)
+        metrics = []
+        result = await self.db.execute(
+            select(Telemetry.miner_id, func.count(Telemetry.id))
+            .where(Telemetry.miner_id.in_(self._enabled_miner_ids))
+            .where(Telemetry.timestamp >= date_start)
+            .where(Telemetry.timestamp < date_end)
+            .group_by(Telemetry.miner_id)
         )
-        miners = miners_result.scalars().all()
-        
-        for miner in miners:
-            result = await self.db.execute(
-                select(func.count(Telemetry.id))
-                .where(Telemetry.miner_id == miner.id)
-                .where(Telemetry.timestamp >= date_start)
-                .where(Telemetry.timestamp < date_end)
-            )
-            record_count = result.scalar()
+        counts = dict(result.all())
+        
+        # Every enabled miner gets a row; no telemetry means 0%
+        for miner_id in self._enabled_miner_ids:
+            record_count = counts.get(miner_id, 0)
             
             # Expected: 2 records/min × 60 min × 24 hours = 2880 records
             expected_records = 2880
             uptime_percent = (record_count / expected_records * 100) if expected_records > 0 else 0
             
-            metric = Metric(
-                metric_type="uptime",
-                entity_type="miner",
-                entity_id=miner.id,
-                period="daily",
-                timestamp=date_start,
-                value_json={
+            metrics.append({
+                "metric_type": "uptime",
+                "entity_type": "miner",
+                "entity_id": miner_id,
+                "period": "daily",
+                "timestamp": date_start,
+                "value_json": {
                     "uptime_percent": round(uptime_percent, 2),
                     "telemetry_records": record_count,
                     "expected_records": expected_records
                 }
-            )
-            self.db.add(metric)
+            })
+        
+        await bulk_insert(self.db, Metric, metrics)
     
     # Cleanup
     
-    async def cleanup_old_metrics(self, days: int = 365):
-        """Delete metrics older than specified days"""
+    async def cleanup_old_metrics(self, days: int = 365) -> int:
+        """Delete metrics older than specified days, returning how many were removed"""
         cutoff = datetime.utcnow() - timedelta(days=days)
         
-        result = await self.db.execute(
-            select(func.count(Metric.id))
-            .where(Metric.timestamp < cutoff)
-        )
-        count = result.scalar()
+        # Chunked deletes commit as they go, keeping each transaction small
+        count = await prune_old(self.db, Metric, Metric.timestamp, cutoff)
         
         if count > 0:
-            await self.db.execute(
-                Metric.__table__.delete().where(Metric.timestamp < cutoff)
-            )
-            await self.db.commit()
             logger.info(f"🗑️ Deleted {count} metrics older than {days} days")
+        return count
 
 
 # Helper functions for querying metrics
@@ -593,14 +603,20 @@ async def get_metric(
     entity_id: Optional[int] = None
 ) -> Optional[Dict[str, Any]]:
     """Get a single metric"""
-    result = await db.execute(
-        select(Metric)
-        .where(Metric.metric_type == metric_type)
-        .where(Metric.period == period)
-        .where(Metric.timestamp == timestamp)
-        .where(Metric.entity_type == entity_type if entity_type else True)
-        .where(Metric.entity_id == entity_id if entity_id else True)
+    # lambda_stmt caches the built statement per call shape; arguments become bound parameters
+    query = lambda_stmt(lambda: select(Metric))
+    query += lambda s: s.where(
+        Metric.metric_type == metric_type,
+        Metric.period == period,
+        Metric.timestamp == timestamp
     )
+    
+    if entity_type is not None:
+        query += lambda s: s.where(Metric.entity_type == entity_type)
+    if entity_id is not None:
+        query += lambda s: s.where(Metric.entity_id == entity_id)
+    
+    result = await db.execute(query)
     metric = result.scalar_one_or_none()
     return metric.value_json if metric else None
 
@@ -615,21 +631,20 @@ async def get_metrics_range(
     entity_id: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """Get metrics for a time range"""
-    query = select(Metric).where(
-        and_(
-            Metric.metric_type == metric_type,
-            Metric.period == period,
-            Metric.timestamp >= start,
-            Metric.timestamp < end
-        )
+    query = lambda_stmt(lambda: select(Metric))
+    query += lambda s: s.where(
+        Metric.metric_type == metric_type,
+        Metric.period == period,
+        Metric.timestamp >= start,
+        Metric.timestamp < end
     )
     
-    if entity_type:
-        query = query.where(Metric.entity_type == entity_type)
-    if entity_id:
-        query = query.where(Metric.entity_id == entity_id)
+    if entity_type is not None:
+        query += lambda s: s.where(Metric.entity_type == entity_type)
+    if entity_id is not None:
+        query += lambda s: s.where(Metric.entity_id == entity_id)
     
-    query = query.order_by(Metric.timestamp)
+    query += lambda s: s.order_by(Metric.timestamp)
     
     result = await db.execute(query)
     metrics = result.scalars().all()
@@ -2,43 +2,38 @@
 Database migrations for schema changes
 """
 from sqlalchemy import text
-from core.database import engine
+from core.database import engine, Base, create_updated_at_trigger
+
+
+async def _add_column(conn, table: str, column: str, definition: str) -> bool:
+    """
+    Add a column unless it is already there, returning True if it was added.
+    
+    Checks PRAGMA table_info first instead of letting SQLite raise a
+    duplicate-column error on every startup. A table that doesn't exist yet
+    is skipped (create_all builds it with the column).
+    """
+    result = await conn.execute(text(f"PRAGMA table_info({table})"))
+    columns = {row[1] for row in result.fetchall()}
+    if not columns or column in columns:
+        return False
+    await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return True
 
 
 async def run_migrations():
     """Run all pending migrations"""
     async with engine.begin() as conn:
         # Migration 1: Add last_executed_at and last_execution_context to automation_rules
-        try:
-            await conn.execute(text("""
-                ALTER TABLE automation_rules 
-                ADD COLUMN last_executed_at DATETIME
-            """))
+        if await _add_column(conn, "automation_rules", "last_executed_at", "DATETIME"):
             print("✓ Added last_executed_at column to automation_rules")
-        except Exception:
-            # Column already exists
-            pass
         
-        try:
-            await conn.execute(text("""
-                ALTER TABLE automation_rules 
-                ADD COLUMN last_execution_context JSON
-            """))
+        if await _add_column(conn, "automation_rules", "last_execution_context", "JSON"):
             print("✓ Added last_execution_context column to automation_rules")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 2: Add firmware_version column to miners
-        try:
-            await conn.execute(text("""
-                ALTER TABLE miners 
-                ADD COLUMN firmware_version VARCHAR(100)
-            """))
+        if await _add_column(conn, "miners", "firmware_version", "VARCHAR(100)"):
             print("✓ Added firmware_version column to miners")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 3: Create tuning_profiles table
         try:
@@ -79,15 +74,8 @@ async def run_migrations():
         # pool_failover and health_prediction alert types removed
         
         # Migration 6: Add luck_percentage column to pool_health
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pool_health 
-                ADD COLUMN luck_percentage REAL
-            """))
+        if await _add_column(conn, "pool_health", "luck_percentage", "REAL"):
             print("✓ Added luck_percentage column to pool_health")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 7: Create pool_strategies table
         try:
@@ -127,26 +115,12 @@ async def run_migrations():
             pass
         
         # Migration 9: Add priority column to pools
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pools 
-                ADD COLUMN priority INTEGER DEFAULT 0
-            """))
+        if await _add_column(conn, "pools", "priority", "INTEGER DEFAULT 0"):
             print("✓ Added priority column to pools")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 9.5: Add miner_id column to homeassistant_devices
-        try:
-            await conn.execute(text("""
-                ALTER TABLE homeassistant_devices 
-                ADD COLUMN miner_id INTEGER
-            """))
+        if await _add_column(conn, "homeassistant_devices", "miner_id", "INTEGER"):
             print("✓ Added miner_id column to homeassistant_devices")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 10: Create miner_pool_slots table for Avalon Nano pool caching
         try:
@@ -169,15 +143,8 @@ async def run_migrations():
             pass
         
         # Migration 11: Add miner_ids column to pool_strategies
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pool_strategies 
-                ADD COLUMN miner_ids JSON DEFAULT '[]'
-            """))
+        if await _add_column(conn, "pool_strategies", "miner_ids", "JSON DEFAULT '[]'"):
             print("✓ Added miner_ids column to pool_strategies")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 12: Create audit_logs table
         try:
@@ -283,15 +250,8 @@ async def run_migrations():
             pass
         
         # Migration 15: Add hashrate_unit column to telemetry for CPU miners (XMRig)
-        try:
-            await conn.execute(text("""
-                ALTER TABLE telemetry 
-                ADD COLUMN hashrate_unit VARCHAR(10) DEFAULT 'GH/s'
-            """))
+        if await _add_column(conn, "telemetry", "hashrate_unit", "VARCHAR(10) DEFAULT 'GH/s'"):
             print("✓ Added hashrate_unit column to telemetry (default: GH/s for ASIC miners, KH/s for CPU)")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 16: Create daily_miner_stats table for long-term analytics
         try:
@@ -320,9 +280,6 @@ async def run_migrations():
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_daily_miner_stats_miner_id ON daily_miner_stats(miner_id)
-            """))
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_daily_miner_stats_date ON daily_miner_stats(date)
             """))
@@ -350,9 +307,6 @@ async def run_migrations():
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_daily_pool_stats_pool_id ON daily_pool_stats(pool_id)
-            """))
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_daily_pool_stats_date ON daily_pool_stats(date)
             """))
@@ -386,9 +340,6 @@ async def run_migrations():
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_monthly_miner_stats_miner_id ON monthly_miner_stats(miner_id)
-            """))
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_monthly_miner_stats_year ON monthly_miner_stats(year)
             """))
@@ -404,15 +355,8 @@ async def run_migrations():
             pass
         
         # Migration 19: Add last_mode_change column to miners for tracking mode changes
-        try:
-            await conn.execute(text("""
-                ALTER TABLE miners 
-                ADD COLUMN last_mode_change DATETIME
-            """))
+        if await _add_column(conn, "miners", "last_mode_change", "DATETIME"):
             print("✓ Added last_mode_change column to miners")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 20: Create p2pool_transactions table for Monero wallet tracking
         try:
@@ -444,75 +388,25 @@ async def run_migrations():
 
         
         # Migration: Add network_difficulty columns to pools table for CKPool
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pools 
-                ADD COLUMN network_difficulty FLOAT
-            """))
+        if await _add_column(conn, "pools", "network_difficulty", "FLOAT"):
             print("✓ Added network_difficulty column to pools")
-        except Exception:
-            pass
         
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pools 
-                ADD COLUMN network_difficulty_updated_at DATETIME
-            """))
+        if await _add_column(conn, "pools", "network_difficulty_updated_at", "DATETIME"):
             print("✓ Added network_difficulty_updated_at column to pools")
-        except Exception:
-            pass
         
         # Migration: Add best_share tracking columns to pools table for CKPool
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pools 
-                ADD COLUMN best_share FLOAT
-            """))
+        if await _add_column(conn, "pools", "best_share", "FLOAT"):
             print("✓ Added best_share column to pools")
-        except Exception:
-            pass
         
-        try:
-            await conn.execute(text("""
-                ALTER TABLE pools 
-                ADD COLUMN best_share_updated_at DATETIME
-            """))
+        if await _add_column(conn, "pools", "best_share_updated_at", "DATETIME"):
             print("✓ Added best_share_updated_at column to pools")
-        except Exception:
-            pass
-        
-        # Migration 19: Add indexes to telemetry table for performance optimization
-        # These indexes eliminate N+1 query problems and speed up common query patterns
-        try:
-            # Add single-column index on miner_id (for filtering by miner)
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS ix_telemetry_miner_id 
-                ON telemetry(miner_id)
-            """))
-            print("✓ Added index on telemetry.miner_id")
-        except Exception as e:
-            print(f"⚠️  Index on telemetry.miner_id may already exist: {e}")
         
-        try:
-            # Add composite index on (miner_id, timestamp) for efficient latest telemetry queries
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS ix_telemetry_miner_timestamp 
-                ON telemetry(miner_id, timestamp)
-            """))
-            print("✓ Added composite index on telemetry(miner_id, timestamp)")
-        except Exception as e:
-            print(f"⚠️  Composite index on telemetry(miner_id, timestamp) may already exist: {e}")
+        # Migration 19: telemetry(miner_id) and telemetry(miner_id, timestamp) indexes superseded by
+        # the covering index in Migration 43 (Migration 48 drops the single-column one)
         
         # Migration 20: Add manual_power_watts to miners for XMRig/NMMiner power tracking (2026-01-02)
-        try:
-            await conn.execute(text("""
-                ALTER TABLE miners 
-                ADD COLUMN manual_power_watts INTEGER
-            """))
+        if await _add_column(conn, "miners", "manual_power_watts", "INTEGER"):
             print("✓ Added manual_power_watts column to miners")
-        except Exception:
-            # Column already exists
-            pass
         
         # Migration 21: Create ckpool_block_metrics table for 12-month analytics (2026-01-02)
         try:
@@ -705,36 +599,12 @@ async def run_migrations():
             pass
         
         # Migration: Add pool_id to monero_solo_settings
-        try:
-            await conn.execute(text("""
-                ALTER TABLE monero_solo_settings 
-                ADD COLUMN pool_id INTEGER
-            """))
+        if await _add_column(conn, "monero_solo_settings", "pool_id", "INTEGER"):
             print("✓ Added pool_id column to monero_solo_settings")
-        except Exception as e:
-            # Column already exists - that's ok
-            if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
-                pass  # Column exists, that's fine
-            else:
-                # Unexpected error - log it
-                print(f"⚠️  Could not add pool_id to monero_solo_settings: {e}")
-                raise  # Re-raise unexpected errors
         
         # Migration: Add last_block_check_height to monero_solo_settings
-        try:
-            await conn.execute(text("""
-                ALTER TABLE monero_solo_settings 
-                ADD COLUMN last_block_check_height INTEGER DEFAULT 0
-            """))
+        if await _add_column(conn, "monero_solo_settings", "last_block_check_height", "INTEGER DEFAULT 0"):
             print("✓ Added last_block_check_height column to monero_solo_settings")
-        except Exception as e:
-            # Column already exists - that's ok
-            if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
-                pass  # Column exists, that's fine
-            else:
-                # Unexpected error - log it
-                print(f"⚠️  Could not add last_block_check_height to monero_solo_settings: {e}")
-                raise  # Re-raise unexpected errors
         
         # Migration: Create agile_strategy table
         try:
@@ -794,14 +664,12 @@ async def run_migrations():
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_high_diff_miner_id ON high_diff_shares(miner_id)
             """))
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_high_diff_difficulty ON high_diff_shares(difficulty)
-            """))
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_high_diff_timestamp ON high_diff_shares(timestamp)
             """))
             await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_difficulty_timestamp ON high_diff_shares(difficulty, timestamp)
+                CREATE INDEX IF NOT EXISTS idx_high_diff_lb 
+                ON high_diff_shares(difficulty DESC, timestamp DESC, miner_name, miner_type, coin, pool_name)
             """))
             print("✓ Created high_diff_shares table")
         except Exception:
@@ -827,9 +695,6 @@ async def run_migrations():
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
-            await conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_blocks_found_miner_id ON blocks_found(miner_id)
-            """))
             await conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_blocks_found_coin ON blocks_found(coin)
             """))
@@ -907,14 +772,8 @@ async def run_migrations():
             print(f"⚠️  Failed to initialize agile strategy bands: {e}")
         
         # Migration: Add energy_cost column to telemetry table
-        try:
-            await conn.execute(text("""
-                ALTER TABLE telemetry 
-                ADD COLUMN energy_cost REAL
-            """))
+        if await _add_column(conn, "telemetry", "energy_cost", "REAL"):
             print("✓ Added energy_cost column to telemetry")
-        except Exception:
-            pass
         
         # Migration: Create telemetry_hourly table
         try:
@@ -938,7 +797,6 @@ async def run_migrations():
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_telemetry_hourly_miner_id ON telemetry_hourly(miner_id)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_telemetry_hourly_hour_start ON telemetry_hourly(hour_start)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_telemetry_hourly_miner_hour ON telemetry_hourly(miner_id, hour_start)"))
             print("✓ Created telemetry_hourly table")
@@ -969,7 +827,6 @@ async def run_migrations():
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_telemetry_daily_miner_id ON telemetry_daily(miner_id)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_telemetry_daily_date ON telemetry_daily(date)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_telemetry_daily_miner_date ON telemetry_daily(miner_id, date)"))
             print("✓ Created telemetry_daily table")
@@ -977,11 +834,9 @@ async def run_migrations():
             pass
 
         # Migration: Add last_aggregation_time to agile_strategy
-        try:
-            await conn.execute(text("ALTER TABLE agile_strategy ADD COLUMN last_aggregation_time DATETIME"))
+        if await _add_column(conn, "agile_strategy", "last_aggregation_time", "DATETIME"):
             print("✓ Added last_aggregation_time to agile_strategy")
-        except Exception:
-            pass    
+    
     # Migration: Create pool_health_hourly table
     async with engine.begin() as conn:
         try:
@@ -1009,7 +864,6 @@ async def run_migrations():
     # Migration: Add indexes to pool_health_hourly
     async with engine.begin() as conn:
         try:
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pool_health_hourly_pool_id ON pool_health_hourly(pool_id)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pool_health_hourly_hour_start ON pool_health_hourly(hour_start)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pool_health_hourly_pool_hour ON pool_health_hourly(pool_id, hour_start)"))
             print("✓ Created indexes on pool_health_hourly")
@@ -1044,7 +898,6 @@ async def run_migrations():
     # Migration: Add indexes to pool_health_daily
     async with engine.begin() as conn:
         try:
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pool_health_daily_pool_id ON pool_health_daily(pool_id)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pool_health_daily_date ON pool_health_daily(date)"))
             await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_pool_health_daily_pool_date ON pool_health_daily(pool_id, date)"))
             print("✓ Created indexes on pool_health_daily")
@@ -1160,34 +1013,16 @@ async def run_migrations():
     
     # Migration 29: Add mode column to telemetry table (26 Jan 2026 - mode tracking)
     async with engine.begin() as conn:
-        try:
-            await conn.execute(text("""
-                ALTER TABLE telemetry 
-                ADD COLUMN mode VARCHAR(20)
-            """))
+        if await _add_column(conn, "telemetry", "mode", "VARCHAR(20)"):
             print("✓ Added mode column to telemetry")
-        except Exception:
-            pass  # Column already exists
     
     # Migration 30: Add mode_changes and mode_distribution to hourly_miner_analytics (26 Jan 2026 - mode tracking)
     async with engine.begin() as conn:
-        try:
-            await conn.execute(text("""
-                ALTER TABLE hourly_miner_analytics 
-                ADD COLUMN mode_changes INTEGER
-            """))
+        if await _add_column(conn, "hourly_miner_analytics", "mode_changes", "INTEGER"):
             print("✓ Added mode_changes column to hourly_miner_analytics")
-        except Exception:
-            pass  # Column already exists
         
-        try:
-            await conn.execute(text("""
-                ALTER TABLE hourly_miner_analytics 
-                ADD COLUMN mode_distribution TEXT
-            """))
+        if await _add_column(conn, "hourly_miner_analytics", "mode_distribution", "TEXT"):
             print("✓ Added mode_distribution column to hourly_miner_analytics")
-        except Exception:
-            pass  # Column already exists
     
     # Migration 31: Phase A - Create miner_baselines table (26 Jan 2026)
     async with engine.begin() as conn:
@@ -1246,34 +1081,16 @@ async def run_migrations():
     
     # Migration 33: Phase B - Add anomaly_score to health_events (26 Jan 2026)
     async with engine.begin() as conn:
-        try:
-            await conn.execute(text("""
-                ALTER TABLE health_events 
-                ADD COLUMN anomaly_score REAL
-            """))
+        if await _add_column(conn, "health_events", "anomaly_score", "REAL"):
             print("✓ Added anomaly_score column to health_events")
-        except Exception:
-            pass  # Column already exists
     
     # Migration 34: Phase C - Add status and suggested_actions to health_events (26 Jan 2026)
     async with engine.begin() as conn:
-        try:
-            await conn.execute(text("""
-                ALTER TABLE health_events 
-                ADD COLUMN status TEXT DEFAULT 'warning'
-            """))
+        if await _add_column(conn, "health_events", "status", "TEXT DEFAULT 'warning'"):
             print("✓ Added status column to health_events")
-        except Exception:
-            pass  # Column already exists
         
-        try:
-            await conn.execute(text("""
-                ALTER TABLE health_events 
-                ADD COLUMN suggested_actions TEXT
-            """))
+        if await _add_column(conn, "health_events", "suggested_actions", "TEXT"):
             print("✓ Added suggested_actions column to health_events")
-        except Exception:
-            pass  # Column already exists
     
     # Migration 35: Phase C - Create miner_health_current table (26 Jan 2026)
     async with engine.begin() as conn:
@@ -1315,23 +1132,443 @@ async def run_migrations():
         pass
     
     # Migration 37: Add last_off_command_timestamp to homeassistant_devices for reconciliation (29 Jan 2026)
+    async with engine.begin() as conn:
+        if await _add_column(conn, "homeassistant_devices", "last_off_command_timestamp", "DATETIME"):
+            print("✓ Added last_off_command_timestamp column to homeassistant_devices")
+    
+    # Migration 38: Add current_band_sort_order to agile_strategy for proper band transition detection (29 Jan 2026)
+    async with engine.begin() as conn:
+        if await _add_column(conn, "agile_strategy", "current_band_sort_order", "INTEGER"):
+            print("✓ Added current_band_sort_order column to agile_strategy")
+    
+    # Migration 39: Enforce one row per (miner, slot) and (miner, alert type) so writers can UPSERT (Oct 2026)
+    # Only applies to the old rowid layout; Migration 42 rebuilds both tables keyed on these columns
+    async with engine.begin() as conn:
+        try:
+            result = await conn.execute(text("PRAGMA table_info(miner_pool_slots)"))
+            if "id" in [row[1] for row in result.fetchall()]:
+                await conn.execute(text("""
+                    DELETE FROM miner_pool_slots WHERE id NOT IN (
+                        SELECT MAX(id) FROM miner_pool_slots GROUP BY miner_id, slot_number
+                    )
+                """))
+                await conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_miner_slot 
+                    ON miner_pool_slots(miner_id, slot_number)
+                """))
+                print("✓ Created unique index on miner_pool_slots(miner_id, slot_number)")
+        except Exception as e:
+            print(f"⚠️  Could not create unique index on miner_pool_slots: {e}")
+        
+        try:
+            result = await conn.execute(text("PRAGMA table_info(alert_throttle)"))
+            if "id" in [row[1] for row in result.fetchall()]:
+                await conn.execute(text("""
+                    DELETE FROM alert_throttle WHERE id NOT IN (
+                        SELECT MAX(id) FROM alert_throttle GROUP BY miner_id, alert_type
+                    )
+                """))
+                await conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS uq_alert_throttle_miner_type 
+                    ON alert_throttle(miner_id, alert_type)
+                """))
+                print("✓ Created unique index on alert_throttle(miner_id, alert_type)")
+        except Exception as e:
+            print(f"⚠️  Could not create unique index on alert_throttle: {e}")
+    
+    # Migration 40: Move telemetry JSON payload into telemetry_extras (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            result = await conn.execute(text("PRAGMA table_info(telemetry)"))
+            columns = [row[1] for row in result.fetchall()]
+            
+            if "data" in columns:
+                print("📝 Moving telemetry.data into telemetry_extras...")
+                await conn.execute(text("""
+                    INSERT OR IGNORE INTO telemetry_extras (telemetry_id, data)
+                    SELECT id, data FROM telemetry WHERE data IS NOT NULL
+                """))
+                await conn.execute(text("ALTER TABLE telemetry DROP COLUMN data"))
+                print("✓ Moved telemetry.data into telemetry_extras")
+        except Exception as e:
+            print(f"⚠️  Could not move telemetry.data into telemetry_extras: {e}")
+    
+    # Migration 41: Populate strategy_pools / strategy_miners from the pool_strategies JSON lists (Oct 2026)
     async with engine.begin() as conn:
         try:
+            # The JSON lists can still name deleted pools/miners; skip ids the FKs would reject
             await conn.execute(text("""
-                ALTER TABLE homeassistant_devices 
-                ADD COLUMN last_off_command_timestamp DATETIME
+                INSERT OR IGNORE INTO strategy_pools (strategy_id, pool_id, position)
+                SELECT s.id, j.value, j.key
+                FROM pool_strategies s, json_each(s.pool_ids) j
+                WHERE j.value IN (SELECT id FROM pools)
             """))
-            print("✓ Added last_off_command_timestamp column to homeassistant_devices")
-        except Exception:
-            pass  # Column already exists
+            await conn.execute(text("""
+                INSERT OR IGNORE INTO strategy_miners (strategy_id, miner_id)
+                SELECT s.id, j.value
+                FROM pool_strategies s, json_each(s.miner_ids) j
+                WHERE s.miner_ids IS NOT NULL
+                  AND j.value IN (SELECT id FROM miners)
+            """))
+            print("✓ Populated strategy_pools and strategy_miners")
+        except Exception as e:
+            print(f"⚠️  Could not populate strategy join tables: {e}")
     
-    # Migration 38: Add current_band_sort_order to agile_strategy for proper band transition detection (29 Jan 2026)
+    # Migration 42: Rebuild miner_pool_slots and alert_throttle as WITHOUT ROWID tables keyed on their natural key (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            result = await conn.execute(text("PRAGMA table_info(miner_pool_slots)"))
+            if "id" in [row[1] for row in result.fetchall()]:
+                print("📝 Rebuilding miner_pool_slots as WITHOUT ROWID...")
+                await conn.execute(text("""
+                    CREATE TABLE miner_pool_slots_new (
+                        miner_id INTEGER NOT NULL,
+                        slot_number INTEGER NOT NULL,
+                        pool_id INTEGER,
+                        pool_url VARCHAR(255) NOT NULL,
+                        pool_port INTEGER NOT NULL,
+                        pool_user VARCHAR(255) NOT NULL,
+                        is_active BOOLEAN NOT NULL,
+                        last_seen DATETIME NOT NULL,
+                        PRIMARY KEY (miner_id, slot_number)
+                    ) WITHOUT ROWID
+                """))
+                await conn.execute(text("""
+                    INSERT OR REPLACE INTO miner_pool_slots_new
+                        (miner_id, slot_number, pool_id, pool_url, pool_port, pool_user, is_active, last_seen)
+                    SELECT miner_id, slot_number, pool_id, pool_url, pool_port, pool_user,
+                           COALESCE(is_active, 0), COALESCE(last_seen, CURRENT_TIMESTAMP)
+                    FROM miner_pool_slots ORDER BY id
+                """))
+                await conn.execute(text("DROP TABLE miner_pool_slots"))
+                await conn.execute(text("ALTER TABLE miner_pool_slots_new RENAME TO miner_pool_slots"))
+                print("✓ Rebuilt miner_pool_slots as WITHOUT ROWID")
+        except Exception as e:
+            print(f"⚠️  Could not rebuild miner_pool_slots: {e}")
+    
+    async with engine.begin() as conn:
+        try:
+            result = await conn.execute(text("PRAGMA table_info(alert_throttle)"))
+            if "id" in [row[1] for row in result.fetchall()]:
+                print("📝 Rebuilding alert_throttle as WITHOUT ROWID...")
+                await conn.execute(text("""
+                    CREATE TABLE alert_throttle_new (
+                        miner_id INTEGER NOT NULL,
+                        alert_type VARCHAR(50) NOT NULL,
+                        last_sent DATETIME NOT NULL,
+                        send_count INTEGER NOT NULL,
+                        PRIMARY KEY (miner_id, alert_type)
+                    ) WITHOUT ROWID
+                """))
+                await conn.execute(text("""
+                    INSERT OR REPLACE INTO alert_throttle_new (miner_id, alert_type, last_sent, send_count)
+                    SELECT miner_id, alert_type, last_sent, COALESCE(send_count, 1)
+                    FROM alert_throttle ORDER BY id
+                """))
+                await conn.execute(text("DROP TABLE alert_throttle"))
+                await conn.execute(text("ALTER TABLE alert_throttle_new RENAME TO alert_throttle"))
+                print("✓ Rebuilt alert_throttle as WITHOUT ROWID")
+        except Exception as e:
+            print(f"⚠️  Could not rebuild alert_throttle: {e}")
+    
+    # Migration 43: Covering / composite indexes for per-miner and per-pool time ranges (Oct 2026)
     async with engine.begin() as conn:
         try:
             await conn.execute(text("""
-                ALTER TABLE agile_strategy 
-                ADD COLUMN current_band_sort_order INTEGER
+                CREATE INDEX IF NOT EXISTS ix_telemetry_miner_ts_cover 
+                ON telemetry(miner_id, timestamp, hashrate, temperature, power_watts)
             """))
-            print("✓ Added current_band_sort_order column to agile_strategy")
-        except Exception:
-            pass  # Column already exists
\ No newline at end of file
+            # Superseded by the covering index (same leading columns)
+            await conn.execute(text("DROP INDEX IF EXISTS ix_telemetry_miner_timestamp"))
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_health_scores_miner_ts_score 
+                ON health_scores(miner_id, timestamp, overall_score)
+            """))
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_pool_health_pool_ts 
+                ON pool_health(pool_id, timestamp)
+            """))
+            print("✓ Created covering indexes on telemetry, health_scores and pool_health")
+        except Exception as e:
+            print(f"⚠️  Could not create covering indexes: {e}")
+    
+    # Migration 44: Descending covering index for the high diff leaderboard (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_high_diff_lb 
+                ON high_diff_shares(difficulty DESC, timestamp DESC, miner_name, miner_type, coin, pool_name)
+            """))
+            await conn.execute(text("DROP INDEX IF EXISTS idx_difficulty_timestamp"))
+            print("✓ Created descending leaderboard index on high_diff_shares")
+        except Exception as e:
+            print(f"⚠️  Could not create leaderboard index: {e}")
+    
+    # Migration 45: Composite lookup indexes for stats rollups and blocks_found (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            # Databases created via create_all never got the unique indexes from
+            # migrations 16-18 if duplicates had already crept in; keep the newest row
+            for table, key in (
+                ("daily_miner_stats", "miner_id, date"),
+                ("daily_pool_stats", "pool_id, date"),
+                ("monthly_miner_stats", "miner_id, year, month"),
+            ):
+                await conn.execute(text(f"""
+                    DELETE FROM {table} 
+                    WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key})
+                """))
+                await conn.execute(text(f"""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_unique 
+                    ON {table}({key})
+                """))
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_blocks_found_miner_ts 
+                ON blocks_found(miner_id, timestamp)
+            """))
+            print("✓ Created composite lookup indexes on stats tables and blocks_found")
+        except Exception as e:
+            print(f"⚠️  Could not create composite lookup indexes: {e}")
+    
+    # Migration 46: Promote best diff out of telemetry JSON into a typed column (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            result = await conn.execute(text("PRAGMA table_info(telemetry)"))
+            if "best_diff" not in [row[1] for row in result.fetchall()]:
+                await conn.execute(text("ALTER TABLE telemetry ADD COLUMN best_diff FLOAT"))
+                # Numeric values only; suffixed strings ("130.46 k") are filled by new writes
+                await conn.execute(text("""
+                    UPDATE telemetry SET best_diff = (
+                        SELECT json_extract(e.data, '$.' || CASE m.miner_type
+                                   WHEN 'avalon_nano' THEN 'best_share'
+                                   WHEN 'nmminer' THEN 'best_share_diff'
+                                   ELSE 'best_session_diff' END)
+                        FROM telemetry_extras e, miners m
+                        WHERE e.telemetry_id = telemetry.id AND m.id = telemetry.miner_id
+                          AND m.miner_type IN ('bitaxe', 'nerdqaxe', 'avalon_nano', 'nmminer')
+                          AND json_type(e.data, '$.' || CASE m.miner_type
+                                   WHEN 'avalon_nano' THEN 'best_share'
+                                   WHEN 'nmminer' THEN 'best_share_diff'
+                                   ELSE 'best_session_diff' END) IN ('integer', 'real')
+                    )
+                """))
+                print("✓ Added best_diff column to telemetry")
+        except Exception as e:
+            print(f"⚠️  Could not add best_diff column to telemetry: {e}")
+    
+    # Migration 47: Store telemetry/event/health score timestamps as unix epoch integers (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            for table in ("telemetry", "events", "health_scores"):
+                result = await conn.execute(text(f"""
+                    UPDATE {table} 
+                    SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER) 
+                    WHERE typeof(timestamp) = 'text'
+                """))
+                if result.rowcount:
+                    print(f"✓ Converted {result.rowcount} {table} timestamps to epoch seconds")
+        except Exception as e:
+            print(f"⚠️  Could not convert timestamps to epoch seconds: {e}")
+    
+    # Migration 48: Foreign keys on link tables + drop single-column indexes covered by composites (Oct 2026)
+    # SQLite can't add a constraint in place: copy rows out, recreate from the model, copy back
+    for table_name in (
+        "miner_pool_slots", "strategy_pools", "strategy_miners",
+        "miner_strategy", "agile_strategy_bands", "dashboard_widgets",
+    ):
+        async with engine.begin() as conn:
+            try:
+                result = await conn.execute(text(f"PRAGMA foreign_key_list({table_name})"))
+                if result.fetchall():
+                    continue
+                
+                table = Base.metadata.tables[table_name]
+                result = await conn.execute(text(f"PRAGMA table_info({table_name})"))
+                existing = {row[1] for row in result.fetchall()}
+                columns = ", ".join(c.name for c in table.columns if c.name in existing)
+                
+                # Orphans would fail the new constraints (foreign_keys is ON for this connection)
+                orphan_filter = " AND ".join(
+                    f"({fk.parent.name} IS NULL OR {fk.parent.name} IN "
+                    f"(SELECT {fk.column.name} FROM {fk.column.table.name}))"
+                    for fk in table.foreign_keys
+                )
+                
+                await conn.execute(text(f"CREATE TEMP TABLE _fk_copy AS SELECT * FROM {table_name}"))
+                await conn.execute(text(f"DROP TABLE {table_name}"))
+                await conn.run_sync(table.create)
+                await conn.execute(text(f"""
+                    INSERT INTO {table_name} ({columns}) 
+                    SELECT {columns} FROM _fk_copy WHERE {orphan_filter}
+                """))
+                await conn.execute(text("DROP TABLE _fk_copy"))
+                # DROP TABLE took the updated_at trigger init_db created with it
+                await create_updated_at_trigger(conn, table)
+                print(f"✓ Rebuilt {table_name} with foreign keys")
+            except Exception as e:
+                print(f"⚠️  Could not add foreign keys to {table_name}: {e}")
+    
+    async with engine.begin() as conn:
+        try:
+            for index_name in (
+                "ix_telemetry_miner_id", "ix_health_scores_miner_id",
+                "ix_telemetry_hourly_miner_id", "ix_telemetry_daily_miner_id",
+                "ix_pool_health_pool_id", "ix_pool_health_hourly_pool_id", "ix_pool_health_daily_pool_id",
+                "ix_daily_miner_stats_miner_id", "idx_daily_miner_stats_miner_id",
+                "ix_daily_pool_stats_pool_id", "idx_daily_pool_stats_pool_id",
+                "ix_monthly_miner_stats_miner_id", "idx_monthly_miner_stats_miner_id",
+                "ix_high_diff_shares_difficulty", "idx_high_diff_difficulty",
+                "ix_blocks_found_miner_id", "idx_blocks_found_miner_id",
+                "ix_miner_strategy_miner_id",
+            ):
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            print("✓ Dropped single-column indexes covered by composite indexes")
+        except Exception as e:
+            print(f"⚠️  Could not drop redundant indexes: {e}")
+    
+    # Migration 49: Store hashrate_unit as a small integer code (Oct 2026)
+    # Codes match core.database.Unit; unrecognised labels are left as text
+    async with engine.begin() as conn:
+        try:
+            for table_name in ("telemetry", "telemetry_rollup"):
+                await conn.execute(text(f"""
+                    UPDATE {table_name}
+                    SET hashrate_unit = CASE upper(hashrate_unit)
+                        WHEN 'H/S' THEN 0
+                        WHEN 'KH/S' THEN 1
+                        WHEN 'MH/S' THEN 2
+                        WHEN 'GH/S' THEN 3
+                        WHEN 'TH/S' THEN 4
+                        WHEN 'PH/S' THEN 5
+                        ELSE hashrate_unit
+                    END
+                    WHERE typeof(hashrate_unit) = 'text' AND hashrate_unit GLOB '*H/[sS]'
+                """))
+            print("✓ Converted hashrate_unit to unit codes")
+        except Exception as e:
+            print(f"⚠️  Could not convert hashrate_unit to unit codes: {e}")
+    
+    # Migration 50: Composite region/slot index on energy_prices (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_energy_prices_region_slot 
+                ON energy_prices(region, valid_from, valid_to)
+            """))
+            await conn.execute(text("DROP INDEX IF EXISTS ix_energy_prices_region"))
+            print("✓ Created idx_energy_prices_region_slot index")
+        except Exception as e:
+            print(f"⚠️  Could not create energy_prices slot index: {e}")
+    
+    # Migration 51: Per-miner difficulty index on high_diff_shares (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_high_diff_miner_diff 
+                ON high_diff_shares(miner_id, difficulty DESC)
+            """))
+            await conn.execute(text("DROP INDEX IF EXISTS ix_high_diff_shares_miner_id"))
+            print("✓ Created idx_high_diff_miner_diff index")
+        except Exception as e:
+            print(f"⚠️  Could not create high_diff_shares miner index: {e}")
+    
+    # Migration 52: Metric lookup index without entity_id in the prefix (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_metric_period_ts 
+                ON metrics(metric_type, entity_type, period, timestamp, entity_id)
+            """))
+            print("✓ Created idx_metric_period_ts index")
+        except Exception as e:
+            print(f"⚠️  Could not create metrics period index: {e}")
+    
+    # Migration 53: Sufficient statistics on telemetry_rollup for hourly metrics (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            for column_name, column_type in (
+                ("min_hashrate", "REAL"),
+                ("max_hashrate", "REAL"),
+                ("hashrate_samples", "INTEGER"),
+                ("min_temperature", "REAL"),
+                ("temperature_samples", "INTEGER"),
+                ("power_samples", "INTEGER"),
+                ("powered_samples", "INTEGER"),
+                ("shares_accepted", "INTEGER"),
+                ("shares_rejected", "INTEGER"),
+            ):
+                # Existing buckets are recomputed once price_bucket exists (migration 55)
+                await _add_column(conn, "telemetry_rollup", column_name, column_type)
+            print("✓ Added sufficient statistics columns to telemetry_rollup")
+        except Exception as e:
+            print(f"⚠️  Could not extend telemetry_rollup: {e}")
+    
+    # Migration 54: Numeric sufficient statistics columns on metrics (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            added = False
+            for column_name, column_type in (
+                ("kwh", "REAL"),
+                ("cost_pence", "REAL"),
+                ("avg_price_pence", "REAL"),
+                ("value_avg", "REAL"),
+                ("value_min", "REAL"),
+                ("value_max", "REAL"),
+                ("sample_count", "INTEGER"),
+                ("shares_accepted", "INTEGER"),
+                ("shares_rejected", "INTEGER"),
+            ):
+                if await _add_column(conn, "metrics", column_name, column_type):
+                    added = True
+            
+            if added:
+                # Backfill from value_json so daily rollups spanning the upgrade stay complete
+                await conn.execute(text("""
+                    UPDATE metrics SET
+                        kwh = json_extract(value_json, '$.kwh'),
+                        cost_pence = COALESCE(json_extract(value_json, '$.cost_pence'),
+                                              json_extract(value_json, '$.cost_gbp') * 100),
+                        avg_price_pence = json_extract(value_json, '$.avg_price_pence'),
+                        sample_count = json_extract(value_json, '$.records')
+                    WHERE metric_type = 'energy_cost' AND entity_type = 'miner'
+                """))
+                await conn.execute(text("""
+                    UPDATE metrics SET
+                        value_avg = json_extract(value_json, '$.avg'),
+                        value_min = json_extract(value_json, '$.min'),
+                        value_max = json_extract(value_json, '$.max'),
+                        sample_count = json_extract(value_json, '$.records')
+                    WHERE metric_type IN ('hashrate', 'temperature') AND entity_type = 'miner'
+                """))
+                await conn.execute(text("""
+                    UPDATE metrics SET
+                        shares_accepted = json_extract(value_json, '$.shares_accepted'),
+                        shares_rejected = json_extract(value_json, '$.shares_rejected')
+                    WHERE metric_type = 'reject_rate' AND entity_type = 'miner'
+                """))
+            print("✓ Added numeric statistics columns to metrics")
+        except Exception as e:
+            print(f"⚠️  Could not add numeric columns to metrics: {e}")
+    
+    # Migration 55: Half-hour price slot key on telemetry_rollup (Oct 2026)
+    async with engine.begin() as conn:
+        try:
+            if await _add_column(conn, "telemetry_rollup", "price_bucket", "DATETIME"):
+                await conn.execute(text("""
+                    UPDATE telemetry_rollup SET price_bucket = strftime(
+                        '%Y-%m-%d %H:%M:%S',
+                        (CAST(strftime('%s', bucket_start) AS INTEGER) / 1800) * 1800,
+                        'unixepoch'
+                    ) || '.000000'
+                """))
+                
+                # Recompute the last day of buckets so hourly metrics have every rollup column
+                from datetime import datetime, timedelta
+                from core.aggregation import _REFRESH_ROLLUP_SQL, ROLLUP_BUCKET_SECONDS
+                await conn.execute(
+                    _REFRESH_ROLLUP_SQL,
+                    {"bucket": ROLLUP_BUCKET_SECONDS, "since": datetime.utcnow() - timedelta(days=1), "until": None}
+                )
+            print("✓ Added price_bucket column to telemetry_rollup")
+        except Exception as e:
+            print(f"⚠️  Could not add price_bucket to telemetry_rollup: {e}")
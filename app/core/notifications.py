@@ -64,9 +64,9 @@ class NotificationService:
                 timestamp=datetime.utcnow(),
                 channel_type=channel_type,
                 alert_type=alert_type,
-                message=message,
+                message=message[:1000],
                 success=success,
-                error=error
+                error=error[:500] if error else None
             )
             db.add(log)
             await db.commit()
@@ -173,23 +173,20 @@ async def ensure_default_alerts():
     Adds any missing alert types during startup.
     """
     from core.database import AlertConfig
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
     
     async with AsyncSessionLocal() as db:
         try:
-            # Get existing alert types
-            result = await db.execute(select(AlertConfig))
-            existing_alerts = result.scalars().all()
-            existing_types = {alert.alert_type for alert in existing_alerts}
-            
-            # Add missing alert types
-            for default_alert in DEFAULT_ALERT_TYPES:
-                if default_alert["alert_type"] not in existing_types:
-                    new_alert = AlertConfig(
-                        alert_type=default_alert["alert_type"],
-                        config=default_alert["config"],
-                        enabled=default_alert["enabled"]
-                    )
-                    db.add(new_alert)
+            # Insert missing alert types; existing rows (and user edits) are left alone
+            stmt = sqlite_insert(AlertConfig).values([
+                {
+                    "alert_type": default_alert["alert_type"],
+                    "config": default_alert["config"],
+                    "enabled": default_alert["enabled"]
+                }
+                for default_alert in DEFAULT_ALERT_TYPES
+            ]).on_conflict_do_nothing(index_elements=["alert_type"])
+            await db.execute(stmt)
             
             await db.commit()
         except Exception as e:
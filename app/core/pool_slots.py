@@ -4,6 +4,7 @@ Service to sync Avalon Nano miner pool slots to database
 import logging
 from datetime import datetime
 from sqlalchemy import select, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import Miner, Pool, MinerPoolSlot
 from adapters.avalon_nano import AvalonNanoAdapter
@@ -98,38 +99,29 @@ async def sync_avalon_nano_pool_slots(db: AsyncSession):
                 if pool_key in all_pools:
                     matched_pool_id = all_pools[pool_key].id
                 
-                # Check if slot already exists
-                existing_slot_result = await db.execute(
-                    select(MinerPoolSlot).where(
-                        and_(
-                            MinerPoolSlot.miner_id == miner.id,
-                            MinerPoolSlot.slot_number == slot_number
-                        )
-                    )
+                # Insert or update the slot in one statement (unique on miner_id + slot_number)
+                stmt = sqlite_insert(MinerPoolSlot).values(
+                    miner_id=miner.id,
+                    slot_number=slot_number,
+                    pool_id=matched_pool_id,
+                    pool_url=pool_host,
+                    pool_port=pool_port,
+                    pool_user=pool_user,
+                    is_active=is_active,
+                    last_seen=datetime.utcnow()
                 )
-                existing_slot = existing_slot_result.scalar_one_or_none()
-                
-                if existing_slot:
-                    # Update existing slot
-                    existing_slot.pool_id = matched_pool_id
-                    existing_slot.pool_url = pool_host
-                    existing_slot.pool_port = pool_port
-                    existing_slot.pool_user = pool_user
-                    existing_slot.is_active = is_active
-                    existing_slot.last_seen = datetime.utcnow()
-                else:
-                    # Create new slot
-                    new_slot = MinerPoolSlot(
-                        miner_id=miner.id,
-                        slot_number=slot_number,
-                        pool_id=matched_pool_id,
-                        pool_url=pool_host,
-                        pool_port=pool_port,
-                        pool_user=pool_user,
-                        is_active=is_active,
-                        last_seen=datetime.utcnow()
-                    )
-                    db.add(new_slot)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["miner_id", "slot_number"],
+                    set_={
+                        "pool_id": stmt.excluded.pool_id,
+                        "pool_url": stmt.excluded.pool_url,
+                        "pool_port": stmt.excluded.pool_port,
+                        "pool_user": stmt.excluded.pool_user,
+                        "is_active": stmt.excluded.is_active,
+                        "last_seen": stmt.excluded.last_seen
+                    }
+                )
+                await db.execute(stmt)
                 
                 logger.debug(f"Synced slot {slot_number} for miner {miner.id}: {pool_host}:{pool_port} (matched: {matched_pool_id}, active: {is_active})")
             
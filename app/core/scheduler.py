@@ -4,6 +4,7 @@ APScheduler for periodic tasks
 import logging
 import asyncio
 import aiohttp
+from collections import defaultdict
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
@@ -16,6 +17,9 @@ from core.database import EnergyPrice, Telemetry, Miner
 
 logger = logging.getLogger(__name__)
 
+# Max miners polled at once during telemetry collection
+POLL_CONCURRENCY = 8
+
 
 class SchedulerService:
     """Scheduler service wrapper"""
@@ -25,6 +29,11 @@ class SchedulerService:
         self.nmminer_listener = None
         self.nmminer_adapters = {}  # Shared adapter registry for NMMiner devices
         
+        # Alert throttle state lives in memory; alert_throttle is a periodic snapshot
+        self.alert_last_sent = {}  # (miner_id, alert_type) -> last sent time
+        self.alert_sends_pending = defaultdict(int)  # (miner_id, alert_type) -> sends not yet flushed
+        self.alert_throttle_loaded = False
+        
         # Initialize cloud service
         cloud_config = app_config.get("cloud", {})
         init_cloud_service(cloud_config)
@@ -81,6 +90,13 @@ class SchedulerService:
             name="Check for alert conditions"
         )
         
+        self.scheduler.add_job(
+            self._flush_alert_throttle,
+            IntervalTrigger(seconds=60),
+            id="flush_alert_throttle",
+            name="Flush alert throttle counters"
+        )
+        
         self.scheduler.add_job(
             self._record_health_scores,
             IntervalTrigger(hours=1),
@@ -149,6 +165,48 @@ class SchedulerService:
             name="Optimize database (VACUUM)"
         )
         
+        self.scheduler.add_job(
+            self._purge_old_notification_logs,
+            IntervalTrigger(days=1),
+            id="purge_old_notification_logs",
+            name="Purge notification logs older than 30 days"
+        )
+        
+        self.scheduler.add_job(
+            self._purge_old_audit_logs,
+            IntervalTrigger(days=1),
+            id="purge_old_audit_logs",
+            name="Purge audit logs older than 90 days"
+        )
+        
+        self.scheduler.add_job(
+            self._incremental_vacuum,
+            CronTrigger(hour=3, minute=30),
+            id="incremental_vacuum",
+            name="Reclaim free pages (incremental VACUUM)"
+        )
+        
+        self.scheduler.add_job(
+            self._optimize_database,
+            CronTrigger(hour=3, minute=45),
+            id="optimize_database",
+            name="Refresh query planner statistics (PRAGMA optimize)"
+        )
+        
+        self.scheduler.add_job(
+            self._checkpoint_wal,
+            IntervalTrigger(minutes=5),
+            id="checkpoint_wal",
+            name="Checkpoint the SQLite WAL (passive)"
+        )
+        
+        self.scheduler.add_job(
+            self._refresh_telemetry_rollup,
+            IntervalTrigger(minutes=5),
+            id="refresh_telemetry_rollup",
+            name="Refresh 5-minute telemetry rollup"
+        )
+        
         self.scheduler.add_job(
             self._aggregate_daily_stats,
             IntervalTrigger(hours=24),
@@ -622,7 +680,8 @@ class SchedulerService:
     
     async def _collect_telemetry(self):
         """Collect telemetry from all miners"""
-        from core.database import AsyncSessionLocal, Miner, Telemetry, Event, Pool, MinerStrategy, EnergyPrice, AgileStrategy
+        from core.database import AsyncSessionLocal, get_write_db, write_lock, bulk_insert, Miner, Telemetry, TelemetryExtras, Event, Pool, MinerStrategy, EnergyPrice, AgileStrategy
+        from core.high_diff_tracker import extract_best_diff
         from adapters import create_adapter
         from sqlalchemy import select, String
         
@@ -644,27 +703,27 @@ class SchedulerService:
                 
                 print(f"📊 Found {len(miners)} enabled miners")
                 
-                for miner in miners:
-                    try:
-                        print(f"📡 Collecting telemetry from {miner.name} ({miner.miner_type})")
-                        
-                        # Create adapter
-                        adapter = create_adapter(
-                            miner.miner_type,
-                            miner.id,
-                            miner.name,
-                            miner.ip_address,
-                            miner.port,
-                            miner.config
-                        )
-                        
-                        if not adapter:
-                            continue
-                        
-                        # Skip NMMiner - it uses passive UDP listening
-                        if miner.miner_type == "nmminer":
-                            continue
-                        
+                poll_sem = asyncio.Semaphore(POLL_CONCURRENCY)
+                
+                async def poll_miner(miner):
+                    """Fetch telemetry from one miner. Returns (skipped, telemetry)."""
+                    print(f"📡 Collecting telemetry from {miner.name} ({miner.miner_type})")
+                    
+                    # Create adapter
+                    adapter = create_adapter(
+                        miner.miner_type,
+                        miner.id,
+                        miner.name,
+                        miner.ip_address,
+                        miner.port,
+                        miner.config
+                    )
+                    
+                    # Skip NMMiner - it uses passive UDP listening
+                    if not adapter or miner.miner_type == "nmminer":
+                        return True, None
+                    
+                    async with poll_sem:
                         # Optimization: If Agile is OFF, ping first before attempting full telemetry
                         # This avoids long timeout waits for miners that are powered off
                         if agile_in_off_state:
@@ -672,224 +731,209 @@ class SchedulerService:
                                 is_online = await asyncio.wait_for(adapter.is_online(), timeout=2.0)
                                 if not is_online:
                                     print(f"💤 {miner.name} offline (ping failed) - skipping telemetry")
-                                    continue
+                                    return True, None
                             except asyncio.TimeoutError:
                                 print(f"💤 {miner.name} ping timeout - skipping telemetry")
-                                continue
-                        
-                        # Get telemetry
-                        telemetry = await adapter.get_telemetry()
+                                return True, None
                         
-                        if telemetry:
-                            # Track high difficulty shares (ASIC miners only)
-                            if miner.miner_type in ["avalon_nano", "bitaxe", "nerdqaxe"] and telemetry.extra_data:
-                                from core.high_diff_tracker import track_high_diff_share
-                                
-                                # Extract best diff based on miner type
-                                current_best_diff = None
-                                if miner.miner_type in ["bitaxe", "nerdqaxe"]:
-                                    current_best_diff = telemetry.extra_data.get("best_session_diff")
-                                elif miner.miner_type == "avalon_nano":
-                                    current_best_diff = telemetry.extra_data.get("best_share")
-                                
-                                if current_best_diff:
-                                    # Get previous best from last telemetry reading
-                                    prev_result = await db.execute(
-                                        select(Telemetry)
-                                        .where(Telemetry.miner_id == miner.id)
-                                        .order_by(Telemetry.timestamp.desc())
-                                        .limit(1)
-                                    )
-                                    prev_telemetry = prev_result.scalar_one_or_none()
+                        return False, await adapter.get_telemetry()
+                
+                # Poll miners concurrently; results are written below on this one session,
+                # holding write_lock only for the write phase (not while waiting on miners)
+                polled = await asyncio.gather(*(poll_miner(m) for m in miners), return_exceptions=True)
+                
+                # Rows are buffered and inserted in one statement after the loop
+                telemetry_rows = []
+                telemetry_extras = []
+                
+                async with write_lock:
+                    for miner, outcome in zip(miners, polled):
+                        try:
+                            if isinstance(outcome, Exception):
+                                raise outcome
+                            
+                            skipped, telemetry = outcome
+                            if skipped:
+                                continue
+                            
+                            if telemetry:
+                                # Track high difficulty shares (ASIC miners only)
+                                if miner.miner_type in ["avalon_nano", "bitaxe", "nerdqaxe"] and telemetry.extra_data:
+                                    from core.high_diff_tracker import track_high_diff_share, parse_difficulty, BEST_DIFF_KEYS
                                     
-                                    previous_best = None
-                                    if prev_telemetry and prev_telemetry.data:
-                                        if miner.miner_type in ["bitaxe", "nerdqaxe"]:
-                                            previous_best = prev_telemetry.data.get("best_session_diff")
-                                        elif miner.miner_type == "avalon_nano":
-                                            previous_best = prev_telemetry.data.get("best_share")
+                                    # Extract best diff based on miner type
+                                    current_best_diff = telemetry.extra_data.get(BEST_DIFF_KEYS[miner.miner_type])
                                     
-                                    # Only track if this is a new personal best (ensure numeric comparison)
-                                    try:
-                                        # Parse values that may have unit suffixes (e.g., "130.46 k" = 130460)
-                                        def parse_difficulty(value):
-                                            if value is None:
-                                                return None
-                                            if isinstance(value, (int, float)):
-                                                return float(value)
-                                            
-                                            # Handle string values with unit suffixes
-                                            value_str = str(value).strip().lower()
-                                            multipliers = {
-                                                'k': 1_000,
-                                                'm': 1_000_000,
-                                                'g': 1_000_000_000,
-                                                't': 1_000_000_000_000
-                                            }
-                                            
-                                            for suffix, multiplier in multipliers.items():
-                                                if suffix in value_str:
-                                                    # Extract numeric part and multiply
-                                                    num_str = value_str.replace(suffix, '').strip()
-                                                    return float(num_str) * multiplier
-                                            
-                                            # No suffix, just convert to float
-                                            return float(value_str)
-                                        
-                                        current_val = parse_difficulty(current_best_diff)
-                                        previous_val = parse_difficulty(previous_best)
+                                    if current_best_diff:
+                                        # Get previous best from last telemetry reading (typed column, no JSON load)
+                                        prev_result = await db.execute(
+                                            select(Telemetry.best_diff)
+                                            .where(Telemetry.miner_id == miner.id)
+                                            .order_by(Telemetry.timestamp.desc())
+                                            .limit(1)
+                                        )
+                                        previous_best = prev_result.scalar_one_or_none()
                                         
-                                        if previous_val is None or current_val > previous_val:
-                                            # Get network difficulty if available
-                                            network_diff = telemetry.extra_data.get("network_difficulty")
+                                        # Only track if this is a new personal best (ensure numeric comparison)
+                                        try:
+                                            current_val = parse_difficulty(current_best_diff)
+                                            previous_val = previous_best
                                             
-                                            # Get pool name from active pool (parse like dashboard.py does)
-                                            pool_name = "Unknown Pool"
-                                            if telemetry.pool_in_use:
-                                                pool_str = telemetry.pool_in_use
-                                                # Remove protocol
-                                                if '://' in pool_str:
-                                                    pool_str = pool_str.split('://')[1]
-                                                # Extract host and port
-                                                if ':' in pool_str:
-                                                    parts = pool_str.split(':')
-                                                    host = parts[0]
-                                                    try:
-                                                        port = int(parts[1])
-                                                        # Look up pool by host and port
-                                                        pool_result = await db.execute(
-                                                            select(Pool).where(
-                                                                Pool.url == host,
-                                                                Pool.port == port
+                                            if previous_val is None or current_val > previous_val:
+                                                # Get network difficulty if available
+                                                network_diff = telemetry.extra_data.get("network_difficulty")
+                                                
+                                                # Get pool name from active pool (parse like dashboard.py does)
+                                                pool_name = "Unknown Pool"
+                                                if telemetry.pool_in_use:
+                                                    pool_str = telemetry.pool_in_use
+                                                    # Remove protocol
+                                                    if '://' in pool_str:
+                                                        pool_str = pool_str.split('://')[1]
+                                                    # Extract host and port
+                                                    if ':' in pool_str:
+                                                        parts = pool_str.split(':')
+                                                        host = parts[0]
+                                                        try:
+                                                            port = int(parts[1])
+                                                            # Look up pool by host and port
+                                                            pool_result = await db.execute(
+                                                                select(Pool).where(
+                                                                    Pool.url == host,
+                                                                    Pool.port == port
+                                                                )
                                                             )
-                                                        )
-                                                        pool = pool_result.scalar_one_or_none()
-                                                        if pool:
-                                                            pool_name = pool.name
-                                                    except (ValueError, IndexError):
-                                                        pass
-                                            
-                                            await track_high_diff_share(
-                                                db=db,
-                                                miner_id=miner.id,
-                                                miner_name=miner.name,
-                                                miner_type=miner.miner_type,
-                                                pool_name=pool_name,
-                                                difficulty=current_best_diff,
-                                                network_difficulty=network_diff,
-                                                hashrate=telemetry.hashrate,
-                                                hashrate_unit=telemetry.extra_data.get("hashrate_unit", "GH/s"),
-                                                miner_mode=miner.current_mode,
-                                                previous_best=previous_best
-                                            )
-                                    except (ValueError, TypeError) as e:
-                                        logger.warning(f"Invalid difficulty value for {miner.name}: current={current_best_diff}, previous={previous_best}")
-                            
-                            # Update miner's current_mode if detected in telemetry
-                            # BUT: Skip if miner is enrolled in Agile Solo Strategy (strategy owns mode)
-                            if telemetry.extra_data and "current_mode" in telemetry.extra_data:
-                                detected_mode = telemetry.extra_data["current_mode"]
-                                if detected_mode and miner.current_mode != detected_mode:
-                                    # Check if miner is enrolled in strategy
-                                    strategy_result = await db.execute(
-                                        select(MinerStrategy)
-                                        .where(MinerStrategy.miner_id == miner.id)
-                                        .where(MinerStrategy.strategy_enabled == True)
-                                    )
-                                    enrolled_in_strategy = strategy_result.scalar_one_or_none()
-                                    
-                                    if enrolled_in_strategy:
-                                        print(f"⚠️ {miner.name} enrolled in strategy - ignoring telemetry mode {detected_mode} (keeping {miner.current_mode})")
-                                    else:
-                                        miner.current_mode = detected_mode
-                                        print(f"📝 Updated {miner.name} mode to: {detected_mode}")
-                            
-                            # Update firmware version if detected
-                            if telemetry.extra_data:
-                                version = telemetry.extra_data.get("version") or telemetry.extra_data.get("firmware")
-                                if version and miner.firmware_version != version:
-                                    miner.firmware_version = version
-                                    print(f"📝 Updated {miner.name} firmware to: {version}")
-                            
-                            # Save to database
-                            # Extract hashrate_unit from extra_data if present (XMRig = KH/s, ASICs = GH/s)
-                            hashrate_unit = "GH/s"  # Default for ASIC miners
-                            if telemetry.extra_data and "hashrate_unit" in telemetry.extra_data:
-                                hashrate_unit = telemetry.extra_data["hashrate_unit"]
-                            
-                            # Calculate energy cost if we have power data
-                            energy_cost = None
-                            if telemetry.power_watts is not None and telemetry.power_watts > 0:
-                                try:
-                                    # Query Agile price for this timestamp
-                                    price_query = select(EnergyPrice).where(
-                                        EnergyPrice.valid_from <= telemetry.timestamp,
-                                        EnergyPrice.valid_to > telemetry.timestamp
-                                    ).limit(1)
-                                    result = await db.execute(price_query)
-                                    price_row = result.scalar_one_or_none()
-                                    
-                                    if price_row:
-                                        # Calculate cost for 1 minute: (watts / 60 / 1000) * price_pence
-                                        # Result is in pence
-                                        energy_cost = (telemetry.power_watts / 60.0 / 1000.0) * price_row.price_pence
-                                except Exception as e:
-                                    print(f"⚠️ Could not calculate energy cost: {e}")
-                            
-                            db_telemetry = Telemetry(
-                                miner_id=miner.id,
-                                timestamp=telemetry.timestamp,
-                                hashrate=telemetry.hashrate,
-                                hashrate_unit=hashrate_unit,
-                                temperature=telemetry.temperature,
-                                power_watts=telemetry.power_watts,
-                                energy_cost=energy_cost,
-                                shares_accepted=telemetry.shares_accepted,
-                                shares_rejected=telemetry.shares_rejected,
-                                pool_in_use=telemetry.pool_in_use,
-                                mode=miner.current_mode,
-                                data=telemetry.extra_data
-                            )
-                            db.add(db_telemetry)
-                        else:
-                            # Log offline event
+                                                            pool = pool_result.scalar_one_or_none()
+                                                            if pool:
+                                                                pool_name = pool.name
+                                                        except (ValueError, IndexError):
+                                                            pass
+                                                
+                                                await track_high_diff_share(
+                                                    db=db,
+                                                    miner_id=miner.id,
+                                                    miner_name=miner.name,
+                                                    miner_type=miner.miner_type,
+                                                    pool_name=pool_name,
+                                                    difficulty=current_best_diff,
+                                                    network_difficulty=network_diff,
+                                                    hashrate=telemetry.hashrate,
+                                                    hashrate_unit=telemetry.extra_data.get("hashrate_unit", "GH/s"),
+                                                    miner_mode=miner.current_mode,
+                                                    previous_best=previous_best
+                                                )
+                                        except (ValueError, TypeError) as e:
+                                            logger.warning(f"Invalid difficulty value for {miner.name}: current={current_best_diff}, previous={previous_best}")
+                                
+                                # Update miner's current_mode if detected in telemetry
+                                # BUT: Skip if miner is enrolled in Agile Solo Strategy (strategy owns mode)
+                                if telemetry.extra_data and "current_mode" in telemetry.extra_data:
+                                    detected_mode = telemetry.extra_data["current_mode"]
+                                    if detected_mode and miner.current_mode != detected_mode:
+                                        # Check if miner is enrolled in strategy
+                                        strategy_result = await db.execute(
+                                            select(MinerStrategy)
+                                            .where(MinerStrategy.miner_id == miner.id)
+                                            .where(MinerStrategy.strategy_enabled == True)
+                                        )
+                                        enrolled_in_strategy = strategy_result.scalar_one_or_none()
+                                        
+                                        if enrolled_in_strategy:
+                                            print(f"⚠️ {miner.name} enrolled in strategy - ignoring telemetry mode {detected_mode} (keeping {miner.current_mode})")
+                                        else:
+                                            miner.current_mode = detected_mode
+                                            print(f"📝 Updated {miner.name} mode to: {detected_mode}")
+                                
+                                # Update firmware version if detected
+                                if telemetry.extra_data:
+                                    version = telemetry.extra_data.get("version") or telemetry.extra_data.get("firmware")
+                                    if version and miner.firmware_version != version:
+                                        miner.firmware_version = version
+                                        print(f"📝 Updated {miner.name} firmware to: {version}")
+                                
+                                # Save to database
+                                # Extract hashrate_unit from extra_data if present (XMRig = KH/s, ASICs = GH/s)
+                                hashrate_unit = "GH/s"  # Default for ASIC miners
+                                if telemetry.extra_data and "hashrate_unit" in telemetry.extra_data:
+                                    hashrate_unit = telemetry.extra_data["hashrate_unit"]
+                                
+                                # Calculate energy cost if we have power data
+                                energy_cost = None
+                                if telemetry.power_watts is not None and telemetry.power_watts > 0:
+                                    try:
+                                        # Query Agile price for this timestamp
+                                        price_query = select(EnergyPrice).where(
+                                            EnergyPrice.valid_from <= telemetry.timestamp,
+                                            EnergyPrice.valid_to > telemetry.timestamp
+                                        ).limit(1)
+                                        result = await db.execute(price_query)
+                                        price_row = result.scalar_one_or_none()
+                                        
+                                        if price_row:
+                                            # Calculate cost for 1 minute: (watts / 60 / 1000) * price_pence
+                                            # Result is in pence
+                                            energy_cost = (telemetry.power_watts / 60.0 / 1000.0) * price_row.price_pence
+                                    except Exception as e:
+                                        print(f"⚠️ Could not calculate energy cost: {e}")
+                                
+                                telemetry_rows.append({
+                                    "miner_id": miner.id,
+                                    "timestamp": telemetry.timestamp,
+                                    "hashrate": telemetry.hashrate,
+                                    "hashrate_unit": hashrate_unit,
+                                    "temperature": telemetry.temperature,
+                                    "power_watts": telemetry.power_watts,
+                                    "energy_cost": energy_cost,
+                                    "shares_accepted": telemetry.shares_accepted,
+                                    "shares_rejected": telemetry.shares_rejected,
+                                    "pool_in_use": telemetry.pool_in_use,
+                                    "mode": miner.current_mode,
+                                    "best_diff": extract_best_diff(miner.miner_type, telemetry.extra_data)
+                                })
+                                telemetry_extras.append(telemetry.extra_data)
+                            else:
+                                # Log offline event
+                                event = Event(
+                                    event_type="warning",
+                                    source=f"miner_{miner.id}",
+                                    message=f"Failed to get telemetry from {miner.name}"
+                                )
+                                db.add(event)
+                        
+                        except Exception as e:
+                            print(f"⚠️ Error collecting telemetry from miner {miner.id}: {e}")
+                            # Log miner connection error
                             event = Event(
-                                event_type="warning",
+                                event_type="error",
                                 source=f"miner_{miner.id}",
-                                message=f"Failed to get telemetry from {miner.name}"
+                                message=f"Error collecting telemetry from {miner.name}: {str(e)}"
                             )
                             db.add(event)
                     
-                    except Exception as e:
-                        print(f"⚠️ Error collecting telemetry from miner {miner.id}: {e}")
-                        # Log miner connection error
-                        event = Event(
-                            event_type="error",
-                            source=f"miner_{miner.id}",
-                            message=f"Error collecting telemetry from {miner.name}: {str(e)}"
-                        )
-                        db.add(event)
+                    telemetry_ids = await bulk_insert(db, Telemetry, telemetry_rows, returning=Telemetry.id)
+                    await bulk_insert(db, TelemetryExtras, [
+                        {"telemetry_id": telemetry_id, "data": data}
+                        for telemetry_id, data in zip(telemetry_ids, telemetry_extras)
+                        if data
+                    ])
                     
-                    # Stagger requests to avoid overwhelming miners
-                    await asyncio.sleep(0.1)
-                
-                # Commit with retry logic for database locks
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        await db.commit()
-                        break
-                    except Exception as commit_error:
-                        if "database is locked" in str(commit_error) and attempt < max_retries - 1:
-                            print(f"Database locked, retrying commit (attempt {attempt + 1}/{max_retries})...")
-                            await asyncio.sleep(0.5 * (attempt + 1))  # Exponential backoff
-                            await db.rollback()
-                        else:
-                            raise
+                    # Commit with retry logic for database locks
+                    max_retries = 3
+                    for attempt in range(max_retries):
+                        try:
+                            await db.commit()
+                            break
+                        except Exception as commit_error:
+                            if "database is locked" in str(commit_error) and attempt < max_retries - 1:
+                                print(f"Database locked, retrying commit (attempt {attempt + 1}/{max_retries})...")
+                                await asyncio.sleep(0.5 * (attempt + 1))  # Exponential backoff
+                                await db.rollback()
+                            else:
+                                raise
         
                 # Log successful collection
                 print(f"✅ Telemetry collection completed: {len(miners)} miners")
-                async with AsyncSessionLocal() as db:
+                async with get_write_db() as db:
                     event = Event(
                         event_type="info",
                         source="telemetry",
@@ -901,7 +945,7 @@ class SchedulerService:
         except Exception as e:
             print(f"❌ Error in telemetry collection: {e}")
             # Log system error
-            async with AsyncSessionLocal() as db:
+            async with get_write_db() as db:
                 event = Event(
                     event_type="error",
                     source="scheduler",
@@ -1682,7 +1726,7 @@ class SchedulerService:
         
         This reduces AI context size by 56x (hourly) to 789x (daily).
         """
-        from core.database import AsyncSessionLocal, Telemetry, TelemetryHourly, TelemetryDaily, Miner
+        from core.database import AsyncSessionLocal, archive_telemetry, prune_old, Telemetry, TelemetryExtras, TelemetryHourly, TelemetryDaily, TelemetryRollup, Miner
         from sqlalchemy import delete
         
         try:
@@ -1876,23 +1920,32 @@ class SchedulerService:
                 print(f"✅ Created {hourly_count} hourly and {daily_count} daily aggregates for {yesterday}")
                 
                 # ========== PRUNE OLD DATA ==========
-                # Prune raw telemetry older than 7 days
+                # Prune raw telemetry older than 7 days, archiving it (and its extras) first
                 cutoff_raw = datetime.utcnow() - timedelta(days=7)
-                result = await db.execute(
-                    delete(Telemetry).where(Telemetry.timestamp < cutoff_raw)
-                )
-                await db.commit()
-                pruned_raw = result.rowcount
+                archived_raw = await archive_telemetry(cutoff_raw)
+                if archived_raw > 0:
+                    print(f"📦 Archived {archived_raw} telemetry records older than 7 days")
+                
+                pruned_raw = await prune_old(db, Telemetry, Telemetry.timestamp, cutoff_raw)
                 if pruned_raw > 0:
                     print(f"🗑️ Pruned {pruned_raw} raw telemetry records older than 7 days")
                 
-                # Prune hourly aggregates older than 30 days
-                cutoff_hourly = datetime.utcnow() - timedelta(days=30)
-                result = await db.execute(
-                    delete(TelemetryHourly).where(TelemetryHourly.hour_start < cutoff_hourly)
+                # Drop extras whose telemetry row is gone (ids only grow, so compare to the oldest survivor)
+                oldest_id = select(func.min(Telemetry.id)).scalar_subquery()
+                await db.execute(
+                    delete(TelemetryExtras).where(TelemetryExtras.telemetry_id < func.coalesce(oldest_id, 2**62))
+                )
+                await db.commit()
+                
+                # Rollup buckets follow raw retention (hourly aggregates cover older charts)
+                await db.execute(
+                    delete(TelemetryRollup).where(TelemetryRollup.bucket_start < cutoff_raw)
                 )
                 await db.commit()
-                pruned_hourly = result.rowcount
+                
+                # Prune hourly aggregates older than 30 days
+                cutoff_hourly = datetime.utcnow() - timedelta(days=30)
+                pruned_hourly = await prune_old(db, TelemetryHourly, TelemetryHourly.hour_start, cutoff_hourly)
                 if pruned_hourly > 0:
                     print(f"🗑️ Pruned {pruned_hourly} hourly aggregates older than 30 days")
                 
@@ -1903,24 +1956,29 @@ class SchedulerService:
             print(f"❌ Telemetry aggregation failed: {e}")
     
     async def _purge_old_telemetry(self):
-        """Purge telemetry data older than 30 days (increased for long-term analytics)"""
-        from core.database import AsyncSessionLocal, Telemetry
+        """Archive then purge raw telemetry past the 7-day retention (backstop for _aggregate_telemetry's prune)"""
+        from core.database import AsyncSessionLocal, archive_telemetry, prune_old, Telemetry, TelemetryExtras
         from sqlalchemy import delete
         
         try:
-            cutoff_time = datetime.utcnow() - timedelta(days=30)
+            cutoff_time = datetime.utcnow() - timedelta(days=7)
+            
+            # Move expiring rows to the cold archive first; if this fails, keep them
+            archived_count = await archive_telemetry(cutoff_time)
+            if archived_count > 0:
+                print(f"📦 Archived {archived_count} telemetry records older than 7 days")
             
             async with AsyncSessionLocal() as db:
-                # Delete old telemetry records
-                result = await db.execute(
-                    delete(Telemetry)
-                    .where(Telemetry.timestamp < cutoff_time)
+                # Delete old telemetry records in bounded chunks
+                deleted_count = await prune_old(db, Telemetry, Telemetry.timestamp, cutoff_time)
+                oldest_id = select(func.min(Telemetry.id)).scalar_subquery()
+                await db.execute(
+                    delete(TelemetryExtras).where(TelemetryExtras.telemetry_id < func.coalesce(oldest_id, 2**62))
                 )
                 await db.commit()
                 
-                deleted_count = result.rowcount
                 if deleted_count > 0:
-                    print(f"🗑️ Purged {deleted_count} telemetry records older than 30 days")
+                    print(f"🗑️ Purged {deleted_count} telemetry records older than 7 days")
         
         except Exception as e:
             print(f"❌ Failed to purge old telemetry: {e}")
@@ -1942,6 +2000,16 @@ class SchedulerService:
             logger.error(f"Failed to aggregate daily stats: {e}", exc_info=True)
             print(f"❌ Daily stats aggregation failed: {e}")
     
+    async def _refresh_telemetry_rollup(self):
+        """Fold new telemetry into the 5-minute rollup used by charts"""
+        from core.aggregation import refresh_telemetry_rollup
+        
+        try:
+            buckets = await refresh_telemetry_rollup()
+            logger.debug(f"Telemetry rollup refreshed ({buckets} buckets)")
+        except Exception as e:
+            logger.error(f"Failed to refresh telemetry rollup: {e}", exc_info=True)
+    
     async def _log_system_summary(self):
         """Log system status summary every 6 hours"""
         from core.database import AsyncSessionLocal, Event, Miner, Telemetry
@@ -2094,20 +2162,13 @@ class SchedulerService:
     
     async def _purge_old_events(self):
         """Purge events older than 30 days"""
-        from core.database import AsyncSessionLocal, Event
-        from sqlalchemy import delete
+        from core.database import AsyncSessionLocal, prune_old, Event
         
         try:
             cutoff_time = datetime.utcnow() - timedelta(days=30)
             
             async with AsyncSessionLocal() as db:
-                result = await db.execute(
-                    delete(Event)
-                    .where(Event.timestamp < cutoff_time)
-                )
-                await db.commit()
-                
-                deleted_count = result.rowcount
+                deleted_count = await prune_old(db, Event, Event.timestamp, cutoff_time)
                 if deleted_count > 0:
                     print(f"🗑️ Purged {deleted_count} events older than 30 days")
         
@@ -2260,24 +2321,68 @@ class SchedulerService:
     async def _vacuum_database(self):
         """Run VACUUM to optimize SQLite database"""
         from core.database import engine
+        from sqlalchemy import text
         
         try:
             async with engine.begin() as conn:
-                await conn.execute("VACUUM")
+                await conn.execute(text("VACUUM"))
             
             print(f"✨ Database optimized (VACUUM completed)")
         
         except Exception as e:
             print(f"❌ Failed to vacuum database: {e}")
     
+    async def _incremental_vacuum(self):
+        """Return free pages left behind by purges to the filesystem"""
+        from core.database import engine
+        from sqlalchemy import text
+        
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("PRAGMA incremental_vacuum"))
+            
+            print("✨ Incremental VACUUM complete")
+        
+        except Exception as e:
+            print(f"❌ Failed to run incremental vacuum: {e}")
+    
+    async def _optimize_database(self):
+        """Keep SQLite planner statistics current so composite/covering indexes get chosen"""
+        from core.database import analyze_db
+        
+        try:
+            await analyze_db()
+            print("📊 PRAGMA optimize complete")
+        
+        except Exception as e:
+            print(f"❌ Failed to run PRAGMA optimize: {e}")
+    
+    async def _checkpoint_wal(self):
+        """Fold the WAL back into the database off the write path so it stays small"""
+        from core.database import checkpoint_wal
+        
+        try:
+            busy, wal_pages, checkpointed = await checkpoint_wal()
+            if busy:
+                logger.debug(f"WAL checkpoint partial ({checkpointed}/{wal_pages} pages) - readers active")
+        
+        except Exception as e:
+            logger.warning(f"Failed to checkpoint WAL: {e}")
+    
     async def _check_alerts(self):
         """Check for alert conditions and send notifications"""
         from core.database import AsyncSessionLocal, Miner, Telemetry, AlertConfig, AlertThrottle
         from core.notifications import send_alert
-        from sqlalchemy import and_
         
         try:
             async with AsyncSessionLocal() as db:
+                # Seed throttle state from the last snapshot so a restart doesn't resend everything
+                if not self.alert_throttle_loaded:
+                    result = await db.execute(select(AlertThrottle.miner_id, AlertThrottle.alert_type, AlertThrottle.last_sent))
+                    for miner_id, alert_type, last_sent in result.all():
+                        self.alert_last_sent.setdefault((miner_id, alert_type), last_sent)
+                    self.alert_throttle_loaded = True
+                
                 # Get enabled alert configs
                 result = await db.execute(
                     select(AlertConfig).where(AlertConfig.enabled == True)
@@ -2394,38 +2499,24 @@ class SchedulerService:
                             cooldown_minutes = alert_config.config.get("cooldown_minutes", 60)
                             
                             # Check if we recently sent this alert for this miner
-                            result = await db.execute(
-                                select(AlertThrottle).where(
-                                    and_(
-                                        AlertThrottle.miner_id == miner.id,
-                                        AlertThrottle.alert_type == alert_config.alert_type
-                                    )
-                                )
-                            )
-                            throttle = result.scalar_one_or_none()
+                            throttle_key = (miner.id, alert_config.alert_type)
+                            last_sent = self.alert_last_sent.get(throttle_key)
                             
                             should_send = False
-                            if not throttle:
+                            if last_sent is None:
                                 # First time sending this alert
                                 should_send = True
-                                throttle = AlertThrottle(
-                                    miner_id=miner.id,
-                                    alert_type=alert_config.alert_type,
-                                    last_sent=datetime.utcnow(),
-                                    send_count=1
-                                )
-                                db.add(throttle)
                             else:
                                 # Check if cooldown period has passed
-                                time_since_last = (datetime.utcnow() - throttle.last_sent).total_seconds() / 60
+                                time_since_last = (datetime.utcnow() - last_sent).total_seconds() / 60
                                 if time_since_last >= cooldown_minutes:
                                     should_send = True
-                                    throttle.last_sent = datetime.utcnow()
-                                    throttle.send_count += 1
                             
                             if should_send:
+                                # Recorded in memory; _flush_alert_throttle persists it
+                                self.alert_last_sent[throttle_key] = datetime.utcnow()
+                                self.alert_sends_pending[throttle_key] += 1
                                 await send_alert(message, alert_config.alert_type)
-                                await db.commit()
                                 print(f"🔔 Alert sent: {alert_config.alert_type} for {miner.name}")
                             else:
                                 print(f"⏳ Alert throttled: {alert_config.alert_type} for {miner.name} (cooldown: {cooldown_minutes}min)")
@@ -2435,6 +2526,42 @@ class SchedulerService:
             import traceback
             traceback.print_exc()
     
+    async def _flush_alert_throttle(self):
+        """Persist alert sends accumulated since the last flush"""
+        from core.database import AsyncSessionLocal, AlertThrottle
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        
+        if not self.alert_sends_pending:
+            return
+        
+        pending, self.alert_sends_pending = self.alert_sends_pending, defaultdict(int)
+        
+        try:
+            stmt = sqlite_insert(AlertThrottle).values([
+                {
+                    "miner_id": miner_id,
+                    "alert_type": alert_type,
+                    "last_sent": self.alert_last_sent[(miner_id, alert_type)],
+                    "send_count": count
+                }
+                for (miner_id, alert_type), count in pending.items()
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["miner_id", "alert_type"],
+                set_={
+                    "last_sent": func.max(AlertThrottle.last_sent, stmt.excluded.last_sent),
+                    "send_count": AlertThrottle.send_count + stmt.excluded.send_count
+                }
+            )
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt)
+                await db.commit()
+        except Exception as e:
+            # Keep the counts for the next flush
+            for key, count in pending.items():
+                self.alert_sends_pending[key] += count
+            logger.warning(f"Failed to flush alert throttle: {e}")
+    
     async def _record_health_scores(self):
         """Record health scores for all active miners"""
         from core.database import AsyncSessionLocal
@@ -2758,101 +2885,79 @@ class SchedulerService:
     
     async def _purge_old_pool_health(self):
         """Purge raw pool health data older than 7 days (aggregated data retained longer)"""
-        from core.database import AsyncSessionLocal, PoolHealth, PoolHealthHourly
-        from sqlalchemy import delete
+        from core.database import AsyncSessionLocal, prune_old, PoolHealth, PoolHealthHourly
         
         try:
             async with AsyncSessionLocal() as db:
                 # Purge raw data older than 7 days
                 raw_cutoff = datetime.utcnow() - timedelta(days=7)
-                raw_result = await db.execute(
-                    delete(PoolHealth).where(PoolHealth.timestamp < raw_cutoff)
-                )
+                raw_deleted = await prune_old(db, PoolHealth, PoolHealth.timestamp, raw_cutoff)
                 
                 # Purge hourly aggregates older than 30 days
                 hourly_cutoff = datetime.utcnow() - timedelta(days=30)
-                hourly_result = await db.execute(
-                    delete(PoolHealthHourly).where(PoolHealthHourly.hour_start < hourly_cutoff)
-                )
+                hourly_deleted = await prune_old(db, PoolHealthHourly, PoolHealthHourly.hour_start, hourly_cutoff)
                 
-                await db.commit()
-                print(f"🗑️ Purged {raw_result.rowcount} raw pool health records (>7d), {hourly_result.rowcount} hourly aggregates (>30d)")
+                print(f"🗑️ Purged {raw_deleted} raw pool health records (>7d), {hourly_deleted} hourly aggregates (>30d)")
         
         except Exception as e:
             print(f"❌ Failed to purge old pool health data: {e}")
     
     async def _purge_old_miner_analytics(self):
         """Purge hourly miner analytics older than 30 days (daily aggregates retained forever)"""
-        from core.database import AsyncSessionLocal, HourlyMinerAnalytics
-        from sqlalchemy import delete
+        from core.database import AsyncSessionLocal, prune_old, HourlyMinerAnalytics
         
         try:
             async with AsyncSessionLocal() as db:
                 # Purge hourly data older than 30 days (daily aggregates kept forever)
                 hourly_cutoff = datetime.utcnow() - timedelta(days=30)
-                hourly_result = await db.execute(
-                    delete(HourlyMinerAnalytics).where(HourlyMinerAnalytics.hour_start < hourly_cutoff)
-                )
+                hourly_deleted = await prune_old(db, HourlyMinerAnalytics, HourlyMinerAnalytics.hour_start, hourly_cutoff)
                 
-                await db.commit()
-                print(f"🗑️ Purged {hourly_result.rowcount} hourly miner analytics records (>30d)")
+                print(f"🗑️ Purged {hourly_deleted} hourly miner analytics records (>30d)")
         
         except Exception as e:
             print(f"❌ Failed to purge old miner analytics data: {e}")
     
     async def _purge_old_audit_logs(self):
         """Purge audit logs older than 90 days"""
-        from core.database import AsyncSessionLocal, AuditLog
-        from sqlalchemy import delete
+        from core.database import AsyncSessionLocal, prune_old, AuditLog
         
         try:
             async with AsyncSessionLocal() as db:
                 cutoff = datetime.utcnow() - timedelta(days=90)
-                result = await db.execute(
-                    delete(AuditLog).where(AuditLog.timestamp < cutoff)
-                )
+                deleted = await prune_old(db, AuditLog, AuditLog.timestamp, cutoff)
                 
-                await db.commit()
-                if result.rowcount > 0:
-                    print(f"🗑️ Purged {result.rowcount} audit log records (>90d)")
+                if deleted > 0:
+                    print(f"🗑️ Purged {deleted} audit log records (>90d)")
         
         except Exception as e:
             print(f"❌ Failed to purge old audit logs: {e}")
     
     async def _purge_old_notification_logs(self):
-        """Purge notification logs older than 90 days"""
-        from core.database import AsyncSessionLocal, NotificationLog
-        from sqlalchemy import delete
+        """Purge notification logs older than 30 days"""
+        from core.database import AsyncSessionLocal, prune_old, NotificationLog
         
         try:
             async with AsyncSessionLocal() as db:
-                cutoff = datetime.utcnow() - timedelta(days=90)
-                result = await db.execute(
-                    delete(NotificationLog).where(NotificationLog.timestamp < cutoff)
-                )
+                cutoff = datetime.utcnow() - timedelta(days=30)
+                deleted = await prune_old(db, NotificationLog, NotificationLog.timestamp, cutoff)
                 
-                await db.commit()
-                if result.rowcount > 0:
-                    print(f"🗑️ Purged {result.rowcount} notification log records (>90d)")
+                if deleted > 0:
+                    print(f"🗑️ Purged {deleted} notification log records (>30d)")
         
         except Exception as e:
             print(f"❌ Failed to purge old notification logs: {e}")
     
     async def _purge_old_health_scores(self):
         """Purge health scores older than 30 days"""
-        from core.database import AsyncSessionLocal, HealthScore
-        from sqlalchemy import delete
+        from core.database import AsyncSessionLocal, prune_old, HealthScore
         
         try:
             async with AsyncSessionLocal() as db:
                 cutoff = datetime.utcnow() - timedelta(days=30)
-                result = await db.execute(
-                    delete(HealthScore).where(HealthScore.timestamp < cutoff)
-                )
+                deleted = await prune_old(db, HealthScore, HealthScore.timestamp, cutoff)
                 
-                await db.commit()
-                if result.rowcount > 0:
-                    print(f"🗑️ Purged {result.rowcount} health score records (>30d)")
+                if deleted > 0:
+                    print(f"🗑️ Purged {deleted} health score records (>30d)")
         
         except Exception as e:
             print(f"❌ Failed to purge old health scores: {e}")
@@ -3754,11 +3859,11 @@ class SchedulerService:
     
     async def _validate_solopool_blocks(self):
         """Validate our block records against Solopool's confirmed blocks (hourly)"""
-        from core.solopool_validator import run_validation_for_all_coins
+        from core.solopool_validator import run_validation_in_executor
         
         try:
             logger.info("🔍 Starting hourly Solopool block validation...")
-            results = run_validation_for_all_coins(hours=24, dry_run=False)
+            results = await run_validation_in_executor(hours=24, dry_run=False)
             
             # Log summary
             for coin, result in results.items():
@@ -3888,11 +3993,8 @@ class SchedulerService:
                         energy_prices = price_result.scalars().all()
                         
                         # Helper to find price for timestamp
-                        def get_price(ts):
-                            for price in energy_prices:
-                                if price.valid_from <= ts < price.valid_to:
-                                    return price.price_pence
-                            return None
+                        from core.energy import price_lookup
+                        get_price = price_lookup(energy_prices)
                         
                         # Calculate cost for each miner
                         total_cost_pence = 0.0
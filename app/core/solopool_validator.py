@@ -13,9 +13,13 @@ import sqlite3
 import requests
 import os
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Validation is blocking HTTP + sqlite3 work; it runs here instead of on the event loop
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="solopool-validator")
+
 SOLOPOOL_BLOCKS_ENDPOINTS = {
     'DGB': 'https://dgb-sha.solopool.org/api/blocks',
     'BCH': 'https://bch.solopool.org/api/blocks',
@@ -167,7 +171,21 @@ def check_block_in_database(
         conn.close()
 
 
-def validate_and_fix_blocks(coin: str, hours: int = 24, dry_run: bool = False) -> Dict:
+def _spawn(coro, loop: Optional[asyncio.AbstractEventLoop]):
+    """Schedule a follow-up coroutine on the app's event loop from the worker thread"""
+    if loop is None:
+        # Standalone run (no app loop) - nothing to log or notify to
+        coro.close()
+        return
+    asyncio.run_coroutine_threadsafe(coro, loop)
+
+
+def validate_and_fix_blocks(
+    coin: str,
+    hours: int = 24,
+    dry_run: bool = False,
+    loop: Optional[asyncio.AbstractEventLoop] = None
+) -> Dict:
     """
     Main validation function: fetch Solopool blocks and reconcile with our database.
     
@@ -175,6 +193,7 @@ def validate_and_fix_blocks(coin: str, hours: int = 24, dry_run: bool = False) -
         coin: Coin symbol (DGB, BCH, BTC)
         hours: How many hours back to validate
         dry_run: If True, only report discrepancies without fixing
+        loop: App event loop for audit/event/notification follow-ups
     
     Returns:
         Dict with validation results: {
@@ -327,7 +346,7 @@ def validate_and_fix_blocks(coin: str, hours: int = 24, dry_run: bool = False) -
                                 )
                                 await audit_db.commit()
                         
-                        asyncio.create_task(_log_correction())
+                        _spawn(_log_correction(), loop)
                         
                         # Log system event for block correction
                         from core.database import AsyncSessionLocal, Event
@@ -340,18 +359,17 @@ def validate_and_fix_blocks(coin: str, hours: int = 24, dry_run: bool = False) -
                                 )
                                 event_db.add(event)
                                 await event_db.commit()
-                        asyncio.create_task(_log_system_event())
+                        _spawn(_log_system_event(), loop)
                         
-                        # Send notification for retroactively discovered blockation for retroactively discovered block
-                        import asyncio
+                        # Send notification for retroactively discovered block
                         from core.high_diff_tracker import _send_block_found_notification
-                        asyncio.create_task(_send_block_found_notification(
+                        _spawn(_send_block_found_notification(
                             miner_name=miner_name,
                             coin=coin,
                             pool_name=block.get('pool', 'Solopool.org'),
                             difficulty=share_diff,
                             network_difficulty=actual_network_diff
-                        ))
+                        ), loop)
                         
                     except Exception as e:
                         error_msg = f"Failed to fix share {share_id}: {e}"
@@ -361,13 +379,18 @@ def validate_and_fix_blocks(coin: str, hours: int = 24, dry_run: bool = False) -
     return results
 
 
-def run_validation_for_all_coins(hours: int = 24, dry_run: bool = False) -> Dict:
+def run_validation_for_all_coins(
+    hours: int = 24,
+    dry_run: bool = False,
+    loop: Optional[asyncio.AbstractEventLoop] = None
+) -> Dict:
     """
     Run validation across all supported coins.
     
     Args:
         hours: How many hours back to validate
         dry_run: If True, only report discrepancies without fixing
+        loop: App event loop for audit/event/notification follow-ups
     
     Returns:
         Dict mapping coin -> validation results
@@ -377,7 +400,7 @@ def run_validation_for_all_coins(hours: int = 24, dry_run: bool = False) -> Dict
     all_results = {}
     for coin in SOLOPOOL_BLOCKS_ENDPOINTS.keys():
         logger.info(f"Validating {coin}...")
-        all_results[coin] = validate_and_fix_blocks(coin, hours, dry_run)
+        all_results[coin] = validate_and_fix_blocks(coin, hours, dry_run, loop)
     
     # Summary
     total_checked = sum(r['checked'] for r in all_results.values())
@@ -392,6 +415,12 @@ def run_validation_for_all_coins(hours: int = 24, dry_run: bool = False) -> Dict
     return all_results
 
 
+async def run_validation_in_executor(hours: int = 24, dry_run: bool = False) -> Dict:
+    """Run run_validation_for_all_coins on the validator thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, run_validation_for_all_coins, hours, dry_run, loop)
+
+
 if __name__ == '__main__':
     # Run validation in dry-run mode
     logging.basicConfig(level=logging.INFO)
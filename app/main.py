@@ -3,9 +3,11 @@ Home Miner Manager v1.0.0 - Main Application Entry Point
 """
 import os
 import sys
+import asyncio
 import logging
 from pathlib import Path
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -29,7 +31,7 @@ logger.info("MAIN.PY MODULE LOADING")
 logger.info("=" * 60)
 
 from core.config import settings
-from core.database import init_db
+from core.database import init_db, analyze_db, get_schema_version, set_schema_version, SCHEMA_VERSION, ORJSON_AVAILABLE, telemetry_flusher
 from core.scheduler import scheduler
 from api import miners, pools, automation, dashboard, settings as settings_api, notifications, analytics, energy, pool_health, discovery, tuning, bulk, audit, strategy_pools, overview, agile_solo_strategy, leaderboard, cloud, health, ai
 
@@ -39,7 +41,9 @@ logger.info("All imports successful")
 app = FastAPI(
     title="Home Miner Manager",
     description="Modern ASIC Miner Management Platform",
-    version="1.0.0"
+    version="1.0.0",
+    # Same orjson fast path the JSON columns use, for API response bodies
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 # Add CSP middleware for GridStack (requires unsafe-eval)
@@ -64,16 +68,24 @@ async def startup_event():
     logger.info(f"🚀 Starting Home Miner Manager on port {settings.WEB_PORT}")
     
     try:
-        # Initialize database
-        logger.info("🗄️  Initializing database...")
-        await init_db()
-        logger.info("✅ Database initialized")
-        
-        # Run migrations
-        logger.info("🔄 Running database migrations...")
-        from core.migrations import run_migrations
-        await run_migrations()
-        logger.info("✅ Migrations completed")
+        # Initialize database (skipped when the file is already at the current schema version)
+        schema_version = await get_schema_version()
+        if schema_version == SCHEMA_VERSION:
+            logger.info(f"✅ Database schema up to date (version {schema_version})")
+        else:
+            logger.info(f"🗄️  Initializing database (schema version {schema_version} -> {SCHEMA_VERSION})...")
+            await init_db()
+            logger.info("✅ Database initialized")
+            
+            # Run migrations
+            logger.info("🔄 Running database migrations...")
+            from core.migrations import run_migrations
+            await run_migrations()
+            await set_schema_version(SCHEMA_VERSION)
+            logger.info("✅ Migrations completed")
+            
+            # Fresh planner stats so new/changed indexes are picked up straight away
+            await analyze_db(full=True)
         
         # Ensure default alert types exist
         logger.info("🔔 Syncing default alert types...")
@@ -81,6 +93,9 @@ async def startup_event():
         await ensure_default_alerts()
         logger.info("✅ Alert types synced")
         
+        # Start batched telemetry writer (before the scheduler starts NMMiner pushes)
+        app.state.telemetry_flusher = asyncio.create_task(telemetry_flusher())
+        
         # Start scheduler
         logger.info("⏰ Starting scheduler...")
         scheduler.start()
@@ -96,6 +111,28 @@ async def shutdown_event():
     """Application shutdown"""
     logger.info("🛑 Shutting down Home Miner Manager")
     scheduler.shutdown()
+    
+    from core.discovery import MinerDiscoveryService
+    await MinerDiscoveryService.aclose()
+    
+    from core.high_diff_tracker import close_session
+    await close_session()
+    
+    # Flusher drains whatever is still staged before exiting
+    flusher = getattr(app.state, "telemetry_flusher", None)
+    if flusher:
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
+    
+    # Readers are gone by now, so fold the WAL back in and truncate it
+    from core.database import checkpoint_wal
+    try:
+        await checkpoint_wal("TRUNCATE")
+    except Exception as e:
+        logger.warning(f"Failed to checkpoint WAL on shutdown: {e}")
 
 # Mount static files
 static_dir = Path(__file__).parent / "ui" / "static"